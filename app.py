@@ -1,39 +1,91 @@
+import os
+
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-from src.plots import plot_barh, plot_barv, plot_pizza
+from src.cache_graficos import grafico_em_cache
+from src.graficos import DIRETORIO_DASHBOARDS, GRAFICOS, especificacao_vega
+from src.indice_clientes import abrir_indice, buscar_cliente, construir_indice, gravar_indice, versao_atual
 
 st.set_page_config(layout="wide")
 st.title("📦 Dashboard UniGift")
 
-def render(func, *args, **kwargs):
-    plt.clf()
-    func(*args, **kwargs)
-    st.pyplot(plt.gcf())
+@st.cache_data(max_entries=32, show_spinner=False)
+def ler_csv(caminho, mtime):
+    # mtime entra só na chave do cache: um CSV regenerado invalida a entrada antiga
+    return pd.read_csv(caminho)
+
+def carregar_csv(nome):
+    caminho = os.path.join(DIRETORIO_DASHBOARDS, f"{nome}.csv")
+    return ler_csv(caminho, os.path.getmtime(caminho))
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def renderizar_png(nome, df):
+    # Memória primeiro; no disco, a imagem é identificada pelo hash dos dados e parâmetros
+    definicao = GRAFICOS[nome]
+    return grafico_em_cache(definicao["funcao"], df, formato="png", **definicao["parametros"])
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def especificacao(nome, df):
+    return especificacao_vega(nome, df)
+
+def render(nome):
+    # Cada gráfico declara no registro o CSV de que depende; só o do gráfico ativo é lido
+    df = carregar_csv(GRAFICOS[nome]["dados"])
+    if GRAFICOS[nome]["modo"] == "vega":
+        # O navegador desenha o gráfico: nenhum trabalho de renderização no servidor
+        st.vega_lite_chart(especificacao(nome, df), width="stretch", theme=None)
+    else:
+        st.image(renderizar_png(nome, df), width="stretch")
     st.markdown("---")
 
-# Dados
-transacoes = pd.read_csv("data/dashboards/transacoes.csv")
-media_preco = pd.read_csv("data/dashboards/media_preco.csv")
-top_vendas_pais = pd.read_csv("data/dashboards/top_vendas_pais.csv")
-margem_lucro = pd.read_csv("data/dashboards/margem_lucro.csv")
-preferencias = pd.read_csv("data/dashboards/preferencias.csv")
-proporcao_rfv = pd.read_csv("data/dashboards/proporcao_rfv.csv")
-faturamento_rfv = pd.read_csv("data/dashboards/faturamento_rfv.csv")
-migracoes_rfv = pd.read_csv("data/dashboards/migracoes_rfv.csv")
-retencao_rfv = pd.read_csv("data/dashboards/retencao_rfv.csv")
+CONSULTA_CLIENTES = "🔎 Consulta de clientes"
+
+@st.cache_resource(show_spinner=False)
+def carregar_indice(versao):
+    # Só mapeia os arquivos em memória; a versão muda quando o pipeline regrava o índice
+    return abrir_indice(versao=versao)
+
+def render_consulta():
+    st.subheader("Consulta de clientes")
+    versao = versao_atual()
+    if versao is None:
+        # Sem índice gerado pelo pipeline: monta um a partir do rfv.csv (sem histórico mensal)
+        try:
+            gravar_indice(construir_indice(carregar_csv("rfv")))
+        except OSError as erro:
+            st.info(f"Índice de clientes não encontrado e não foi possível gerá-lo ({erro}).")
+            return
+        versao = versao_atual()
+
+    indice = carregar_indice(versao)
+    customer_id = st.text_input("CustomerID", placeholder="ex: 12347")
+    if not customer_id:
+        return
+
+    resultado = buscar_cliente(indice, customer_id)
+    if resultado is None:
+        st.warning(f"Cliente {customer_id} não encontrado.")
+        return
+
+    cliente, historico = resultado
+    colunas = st.columns(4)
+    colunas[0].metric("Perfil", cliente["Profile"])
+    colunas[1].metric("Recência (dias)", int(cliente["Recency"]))
+    colunas[2].metric("Frequência", int(cliente["Frequency"]))
+    colunas[3].metric("Valor", f"£{cliente['Value']:,.2f}")
+    st.caption(f"Scores R/F/V: {cliente['RScore']}/{cliente['FScore']}/{cliente['VScore']} (RFV {cliente['RFV']})")
+    st.markdown("#### Histórico mensal")
+    if historico.empty:
+        st.caption("Histórico mensal indisponível: gere o índice completo com `python -m src.pipeline indice_clientes`.")
+    else:
+        st.dataframe(historico, hide_index=True)
 
 if "grafico_ativo" not in st.session_state:
     st.session_state.grafico_ativo = None
 
-graficos = {
-    "Média de produtos por transação": lambda: (
-        render(
-            plot_barh, transacoes,
-            col_categoria="Country", col_valor="Media",
-            titulo="Média de produtos por transação"
-        ),
-        st.markdown("""
+# Análise escrita exibida abaixo de cada gráfico do registro (src/graficos.py)
+analises = {
+    "Média de produtos por transação": """
 ### Com base nos dados analisados, podemos extrair alguns insights valiosos sobre o comportamento de compra internacional dos clientes da UniGift.
 
 ### 1. **Mercados com transações altamente concentradas**
@@ -78,16 +130,9 @@ Apesar das médias elevadas, é importante considerar que países com **poucas t
 ### 5. **Insight estratégico**
 
 A **média de produtos por transação** revela padrões ocultos de comportamento. Altas médias não significam necessariamente mercados consolidados, mas apontam **intenção de compra relevante**. Estratégias promocionais como frete grátis acima de determinado valor, kits personalizados ou campanhas “leve mais, pague menos” podem impulsionar ainda mais esse comportamento, especialmente em mercados onde o custo logístico é uma barreira.
-""")
-    ),
-
-    "Média de preços por país": lambda: (
-        render(
-            plot_barh, media_preco,
-            col_categoria="Country", col_valor="UnitPrice",
-            simbolo="£", titulo="Média de preços por país"
-        ),
-        st.markdown("""
+""",
+
+    "Média de preços por país": """
             Com base nos dados de preço médio por país da UniGift, observa-se que o **Brasil** apresenta a **maior média de preços unitários**, com **£3,29 por produto**, seguido de perto por **Líbano (£3,28)** e **Bahrein (£3,08)**. Estes valores estão consideravelmente acima da média de mercados mais consolidados, como o **Reino Unido**, onde o preço médio é **£2,19**.
 
 Essa discrepância de preços revela padrões de mercado, operacionais e estratégicos que merecem atenção. Abaixo, uma análise detalhada com insights:
@@ -129,17 +174,9 @@ A alta disposição a pagar em mercados como Brasil, Singapura e Austrália pode
 ### Conclusão
 
 A variação do preço médio por país vai além da simples precificação: ela reflete o grau de presença da marca, eficiência logística, carga tributária local e percepção de valor do consumidor em cada região. Países como Brasil e Líbano, embora ainda com baixo volume, demonstram **alto valor médio por item** — o que pode servir como indicativo estratégico de onde investir em expansão com maior retorno unitário.
-""")
-    ),
-
-    "Produto mais vendido em cada país": lambda: (
-        render(
-            plot_barh, top_vendas_pais,
-            col_categoria="Country", col_valor="Quantity",
-            col_rotulo="Description", decimais=False,
-            titulo="Produto mais vendido em cada país"
-        ),
-        st.markdown("""
+""",
+
+    "Produto mais vendido em cada país": """
         A análise do produto mais vendido em cada país revela padrões significativos de preferência regional, popularidade de determinadas linhas e pistas sobre a penetração da UniGift em diferentes mercados. A seguir, sintetizo os principais achados com base no gráfico de barras e no conjunto de dados fornecido:
 
 ---
@@ -175,17 +212,9 @@ A variação do preço médio por país vai além da simples precificação: ela
 - **Atenção aos mercados com baixa expressão volumétrica**: Países como RSA e Arábia Saudita, apesar de terem registrado vendas, apresentam baixo volume no item mais popular. Isso pode indicar presença marginal da marca, ou desafios logísticos ou culturais que merecem investigação.
 
 - **Análise de sazonalidade e funcionalidade dos produtos líderes**: Alguns itens (ex. *WRAP CHRISTMAS VILLAGE* em Malta ou *ZINC FOLKART SLEIGH BELLS* em Portugal) têm potencial sazonal. A UniGift pode ativar **campanhas promocionais específicas por estação** e adaptar o ciclo de estoque conforme essas tendências.
-        """)
-    ),
-
-    "Produtos com maior margem de lucro por país": lambda: (
-        render(
-            plot_barh, margem_lucro,
-            col_categoria="Country", col_valor="UnitPrice",
-            col_rotulo="Description", simbolo="£",
-            titulo="Produtos com maior margem de lucro por país"
-        ),
-        st.markdown("""
+        """,
+
+    "Produtos com maior margem de lucro por país": """
         A análise dos produtos com maior valor unitário por país sugere padrões de preferência local, estrutura de portfólio e possíveis diferenças operacionais na oferta da UniGift. Como o gráfico evidencia os itens mais caros registrados por país, é razoável tratá-los como **representantes de maior margem de lucro potencial**, assumindo que o custo de aquisição seja uniforme entre mercados.
 
 ---
@@ -234,16 +263,9 @@ A variação do preço médio por país vai além da simples precificação: ela
 - **Mercados como Brasil, Líbano, Arábia Saudita e República Tcheca possuem itens mais baratos como "maior margem"** — sinal de potencial não explorado na oferta de produtos de valor mais alto. Investir em ampliar o mix nesses locais pode desbloquear ganhos marginais.
 
 - **Produtos visualmente expressivos e com personalidade (relógios, quadros, buquês decorativos) demonstram apelo em mercados diversos**, e podem ser usados como itens de entrada para promover o catálogo completo.
-        """)
-    ),
-
-    "Produtos mais comprados por clientes VIP": lambda: (
-        render(
-            plot_barh, preferencias.head(50),
-            col_categoria="Description", col_valor="Quantity",
-            decimais=False, titulo="Produtos mais comprados por clientes VIP"
-        ),
-        st.markdown("""
+        """,
+
+    "Produtos mais comprados por clientes VIP": """
         A análise dos produtos mais comprados por clientes VIP revela preferências nítidas por itens que combinam apelo visual, funcionalidade no cotidiano e forte identidade estética. Esses padrões são relevantes para compreender o comportamento de compra de consumidores de maior valor para a UniGift.
 
 ---
@@ -309,17 +331,9 @@ Os produtos mais comprados por clientes VIP se concentram em quatro eixos:
 - Criar campanhas segmentadas com foco nesses temas, sobretudo para públicos com alto ticket médio
 - Estimular recompra oferecendo variações sazonais ou coleções renováveis (ex: novas cores de lunch bag ou padrões de cake cases)
 - Explorar kits temáticos personalizados como “gift boxes” para compradores VIP — combinando itens do top 50
-        """)
-    ),
-
-    "Distribuição de clientes por perfil RFV": lambda: (
-        render(
-            plot_pizza, proporcao_rfv,
-            col_categoria="Profile", col_valor="Proportion",
-            exibir_percentual=True,
-            titulo="Distribuição de clientes por perfil RFV"
-        ),
-        st.markdown("""
+        """,
+
+    "Distribuição de clientes por perfil RFV": """
         
         A distribuição de clientes por perfil RFV (Recência, Frequência e Valor) revela características centrais da base de clientes da UniGift. Considerando os dados:
 
@@ -375,17 +389,9 @@ Apenas 22,90% dos clientes estão classificados como VIP. Embora esse percentual
 
 Essa distribuição de perfis reforça que o crescimento sustentável da UniGift virá menos da aquisição em massa e mais da **evolução interna da base de clientes atual**.
         
-        """)
-    ),
-
-    "Faturamento Total Gerado por Perfil RFV": lambda: (
-        render(
-            plot_pizza, faturamento_rfv,
-            col_categoria="Profile", col_valor="Value",
-            simbolo="£", milhar=True, exibir_percentual=False,
-            titulo="Faturamento Total Gerado por Perfil RFV"
-        ),
-        st.markdown("""
+        """,
+
+    "Faturamento Total Gerado por Perfil RFV": """
         A análise do faturamento total gerado por perfil RFV revela como os diferentes grupos de clientes da UniGift contribuem financeiramente para o negócio. Mesmo com apenas três categorias (VIP, Emergentes e Churn), os dados apontam para dinâmicas comerciais distintas que ajudam a entender melhor onde estão os maiores valores e os maiores riscos.
 
 ---
@@ -439,18 +445,9 @@ Apesar de 35% dos clientes estarem classificados como Churn, sua participação
 - A segmentação RFV permite compreender o valor real de cada grupo e definir prioridades com base em impacto financeiro.
 - Consolidar um programa de fidelidade para Emergentes e fortalecer laços com os VIPs deve estar no centro da estratégia comercial.
 - As ações de reativação devem ser seletivas: o foco deve estar nos churns de alto valor e não na massa inativa como um todo.
-        """)
-    ),
-
-    "Evolução mensal de migração de clientes Emergentes para VIP": lambda: (
-        render(
-            plot_barv, migracoes_rfv,
-            col_categoria="Month", col_valor="NumMigrations",
-            usar_cores=False, decimais=False, log=True,
-            ordenar_por_valor=False,
-            titulo="Evolução mensal de migração de clientes Emergentes para VIP"
-        ),
-        st.markdown("""
+        """,
+
+    "Evolução mensal de migração de clientes Emergentes para VIP": """
         A análise da evolução mensal de migração de clientes Emergentes para VIP em 2011 revela tendências sazonais claras e padrões de engajamento que podem informar decisões estratégicas de fidelização. O volume total de migrações no ano foi de 456 clientes, e a variação entre os meses aponta para momentos-chave de conversão ao longo do tempo.
 
 ---
@@ -521,18 +518,9 @@ A curva de evolução da migração Emergente → VIP é fortemente afetada por
 - Há uma janela média de maturação de até 6 meses entre primeira compra e upgrade de perfil.
 - O quarto trimestre oferece o melhor momento para conversão, especialmente novembro.
 - É possível manter um ritmo constante de conversão com pequenas alavancas nos períodos de estabilidade.
-        """)
-    ),
-
-    "Retenção mensal de Clientes Churn": lambda: (
-        render(
-            plot_barv, retencao_rfv,
-            col_categoria="Month", col_valor="Clientes Churn",
-            exibir_percentual=True, ordenar_por_valor=False,
-            usar_cores=False,
-            titulo="Retenção mensal de Clientes Churn"
-        ),
-        st.markdown("""
+        """,
+
+    "Retenção mensal de Clientes Churn": """
         A análise da retenção mensal de clientes do perfil **Churn** — ou seja, clientes que deixaram de comprar ou reduziram drasticamente seu envolvimento com a UniGift — revela tendências que podem indicar riscos de evasão, bem como oportunidades de recuperação ou prevenção.
 
 ---
@@ -598,18 +586,9 @@ A curva de evolução da migração Emergente → VIP é fortemente afetada por
 ### **Conclusão**
 
 Embora o comportamento de churn tenha se mantido razoavelmente controlado no primeiro semestre, o último trimestre apresenta um risco claro de evasão em massa. Identificar antecipadamente perfis de risco, cruzar dados de recência com ticket médio e aplicar estratégias automatizadas de contenção pode preservar uma fatia valiosa da base e melhorar o custo de retenção por cliente.
-        """)
-    ),
-
-    "Retenção mensal de Clientes Emergentes": lambda: (
-        render(
-            plot_barv, retencao_rfv,
-            col_categoria="Month", col_valor="Clientes Emergentes",
-            exibir_percentual=True, ordenar_por_valor=False,
-            usar_cores=False,
-            titulo="Retenção mensal de Clientes Emergentes"
-        ),
-        st.markdown("""
+        """,
+
+    "Retenção mensal de Clientes Emergentes": """
         A análise da retenção mensal de **Clientes Emergentes** ao longo de 2011 evidencia a dinâmica de crescimento e transformação dessa base estratégica. Esses clientes representam um estágio intermediário no modelo RFV — entre perfis inativos e o status de Cliente VIP — e seu comportamento é um indicador importante de vitalidade comercial.
 
 ---
@@ -681,18 +660,9 @@ Acompanhar os dados dos perfis VIP e Churn ao longo do mesmo período revela:
 ### **Conclusão**
 
 A proporção de Clientes Emergentes serve como termômetro da **capacidade de renovação e crescimento do ciclo de valor** da UniGift. Seu fortalecimento entre março e novembro reflete um desempenho saudável, mas a queda acentuada em dezembro alerta para o risco de perdas se não houver acompanhamento contínuo. Entender como esses clientes se comportam e quais estímulos os movem ao longo da jornada é essencial para transformar um público promissor em fonte de receita recorrente e sustentável.
-        """)
-    ),
-
-    "Retenção mensal de Clientes VIP": lambda: (
-        render(
-            plot_barv, retencao_rfv,
-            col_categoria="Month", col_valor="Clientes VIP",
-            exibir_percentual=True, ordenar_por_valor=False,
-            usar_cores=False,
-            titulo="Retenção mensal de Clientes VIP"
-        ),
-        st.markdown("""
+        """,
+
+    "Retenção mensal de Clientes VIP": """
         A análise da retenção mensal de **Clientes VIP** ao longo de 2011 destaca flutuações relevantes em seu peso relativo na base de clientes da UniGift. Como esse perfil representa os consumidores com maior valor agregado — tanto em frequência quanto em valor de compra — monitorar sua estabilidade e evolução é essencial para sustentar o desempenho financeiro da empresa.
 
 ---
@@ -758,22 +728,21 @@ A proporção de Clientes Emergentes serve como termômetro da **capacidade de r
 ### **Conclusão**
 
 A base de Clientes VIP da UniGift se mostra robusta e responsiva a campanhas sazonais, atingindo seu melhor desempenho no trimestre final de 2011. Contudo, a oscilação após novembro reforça a importância de manter ativa a experiência VIP — não basta conquistar esse cliente, é essencial nutri-lo com estímulos personalizados, valor percebido e recompensas cíclicas para garantir sua permanência no topo da pirâmide de valor.
-        """)
-    )
+        """
 }
 
 # Sidebar
 st.sidebar.markdown("### 🧭 Navegação")
-for nome in graficos:
+for nome in GRAFICOS:
     if st.sidebar.button(nome):
         st.session_state.grafico_ativo = nome
 
+if st.sidebar.button(CONSULTA_CLIENTES):
+    st.session_state.grafico_ativo = CONSULTA_CLIENTES
+
 # Exibição
-if st.session_state.grafico_ativo:
-    resultado = graficos[st.session_state.grafico_ativo]
-    if isinstance(resultado, tuple):
-        for etapa in resultado:
-            if callable(etapa):
-                etapa()
-    else:
-        resultado()
+if st.session_state.grafico_ativo == CONSULTA_CLIENTES:
+    render_consulta()
+elif st.session_state.grafico_ativo:
+    render(st.session_state.grafico_ativo)
+    st.markdown(analises[st.session_state.grafico_ativo])
@@ -0,0 +1,96 @@
+"""
+Benchmark do criar_rfv vetorizado contra a implementação anterior
+(lambda no agg e Series.apply nos scores).
+
+Uso:
+    python -m benchmarks.bench_rfv
+    python -m benchmarks.bench_rfv --tamanhos 100000 1000000 20000000 --max-original 20000000
+
+Por padrão a versão anterior só é medida até 5M linhas (em 20M ela leva
+minutos e vários GB); use --max-original 20000000 para comparar as duas em 20M.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.funcoes import criar_rfv
+
+
+def criar_rfv_original(df, customer_col="CustomerID", date_col="InvoiceDate",
+                       invoice_col="InvoiceNo", quantity_col="Quantity", price_col="UnitPrice"):
+    # Cópia da versão anterior do criar_rfv, mantida apenas como referência
+    df["TotalPrice"] = df[quantity_col] * df[price_col]
+    data_ultima_transacao = df[date_col].max()
+    rfv = df.groupby(df[customer_col]).agg({
+        date_col: lambda x: (data_ultima_transacao - x.max()).days,
+        invoice_col: "nunique",
+        "TotalPrice": "sum"
+    }).reset_index()
+    rfv.columns = [customer_col, "Recency", "Frequency", "Value"]
+    rfv["RScore"] = pd.qcut(rfv["Recency"], q=3, labels=[3, 2, 1]).astype(int)
+
+    def get_fscore(f):
+        return 3 if f > 5 else 2 if f >= 3 else 1
+
+    rfv["FScore"] = rfv["Frequency"].apply(get_fscore)
+    rfv["VScore"] = pd.qcut(rfv["Value"], q=3, labels=[1, 2, 3]).astype(int)
+    rfv["RFV"] = rfv["RScore"] + rfv["FScore"] + rfv["VScore"]
+
+    def segmentar_cliente(score):
+        return "Clientes VIP" if score >= 8 else "Clientes Emergentes" if score >= 5 else "Clientes Churn"
+
+    rfv["Profile"] = rfv["RFV"].apply(segmentar_cliente)
+    return rfv
+
+
+def gerar_transacoes(linhas, seed=0):
+    # ~10 linhas por nota fiscal e ~50 linhas por cliente, como na base real
+    rng = np.random.default_rng(seed)
+    total_notas = max(linhas // 10, 1)
+    notas = rng.integers(0, total_notas, linhas)
+    minutos = rng.integers(0, 365 * 24 * 60, total_notas)
+    inicio = pd.Timestamp("2010-12-01")
+    return pd.DataFrame({
+        "InvoiceNo": notas,
+        "CustomerID": notas % max(linhas // 50, 100),
+        "InvoiceDate": inicio + pd.to_timedelta(minutos[notas], unit="min"),
+        "Quantity": rng.integers(1, 30, linhas),
+        "UnitPrice": rng.gamma(2, 1.5, linhas).round(2),
+    })
+
+
+def cronometrar(funcao, df, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(df.copy())
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do criar_rfv")
+    parser.add_argument("--tamanhos", type=int, nargs="+",
+                        default=[100_000, 1_000_000, 5_000_000, 20_000_000])
+    parser.add_argument("--max-original", type=int, default=5_000_000,
+                        help="maior tamanho em que a versão anterior também é medida "
+                             "(padrão 5M: em 20M só o vetorizado roda, a menos que se passe 20000000)")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'linhas':>12} {'clientes':>10} {'original (s)':>14} {'vetorizado (s)':>16} {'ganho':>8}")
+    for linhas in args.tamanhos:
+        df = gerar_transacoes(linhas)
+        clientes = df["CustomerID"].nunique()
+        novo = cronometrar(criar_rfv, df, args.repeticoes)
+        if linhas <= args.max_original:
+            original = cronometrar(criar_rfv_original, df, args.repeticoes)
+            print(f"{linhas:>12,} {clientes:>10,} {original:>14.3f} {novo:>16.3f} {original / novo:>7.1f}x")
+        else:
+            print(f"{linhas:>12,} {clientes:>10,} {'-':>14} {novo:>16.3f} {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
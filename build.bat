@@ -0,0 +1,2 @@
+python -m src.pipeline %*
+pause
\ No newline at end of file
@@ -0,0 +1,235 @@
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import tempfile
+from datetime import time
+
+import numpy as np
+import pandas as pd
+
+# Diretório padrão dos caches da base tratada
+DIRETORIO_CACHE = os.path.join("data", "clean", "cache")
+
+# Incrementar quando o formato em disco mudar
+VERSAO_FORMATO = 2
+
+########################################
+
+def hash_arquivo(caminho, tamanho_bloco=1 << 20):
+    """
+    Calcula o hash (BLAKE2b) do conteúdo de um arquivo, lendo-o em blocos.
+
+    Parâmetros:
+    - caminho: arquivo a ser lido
+    - tamanho_bloco: bytes lidos por vez
+
+    Retorna:
+    - string hexadecimal com o hash do conteúdo
+    """
+    h = hashlib.blake2b(digest_size=20)
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def chave_cache(caminho, funcao, parametros=None):
+    """
+    Gera a chave do cache a partir do conteúdo do arquivo de origem, do código
+    do módulo que faz a limpeza e dos parâmetros usados (ex: k do IQR).
+
+    Parâmetros:
+    - caminho: arquivo de origem
+    - funcao: função que gera o DataFrame a partir do arquivo
+    - parametros: dicionário com os parâmetros da limpeza
+
+    Retorna:
+    - string hexadecimal que identifica o resultado
+    """
+    with open(inspect.getsourcefile(funcao), "rb") as f:
+        codigo = hashlib.blake2b(f.read(), digest_size=20).hexdigest()
+
+    descricao = json.dumps({
+        "arquivo": hash_arquivo(caminho),
+        "funcao": f"{funcao.__module__}.{funcao.__qualname__}",
+        "codigo": codigo,
+        "parametros": parametros or {},
+        "versao": VERSAO_FORMATO,
+    }, sort_keys=True, default=str)
+    return hashlib.blake2b(descricao.encode(), digest_size=20).hexdigest()
+
+########################################
+
+def tipo_codigos(n_categorias):
+    """
+    Menor tipo inteiro para os códigos de n_categorias (o mesmo que o pandas
+    escolhe para um Categorical, para que from_codes não precise copiar).
+    """
+    for tipo in (np.int8, np.int16, np.int32):
+        if n_categorias < np.iinfo(tipo).max:
+            return tipo
+    return np.int64
+
+
+def salvar_colunar(df, diretorio):
+    """
+    Grava um DataFrame em formato colunar binário: um arquivo .npy por coluna
+    e um meta.json com os tipos. Colunas de texto viram códigos inteiros.
+
+    Parâmetros:
+    - df: DataFrame a ser gravado
+    - diretorio: diretório de destino (criado se não existir)
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    colunas = []
+
+    for i, coluna in enumerate(df.columns):
+        serie = df[coluna]
+        arquivo = f"{i}.npy"
+        meta = {"nome": coluna, "arquivo": arquivo}
+
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            meta["tipo"] = "categoria"
+            meta["categorias"] = [str(c) for c in serie.cat.categories]
+            dados = serie.cat.codes.to_numpy()
+        elif pd.api.types.is_datetime64_dtype(serie.dtype):
+            meta["tipo"] = "data"
+            meta["dtype"] = str(serie.dtype)
+            dados = serie.to_numpy().view(np.int64)
+        elif pd.api.types.is_numeric_dtype(serie.dtype) or pd.api.types.is_bool_dtype(serie.dtype):
+            meta["tipo"] = "numero"
+            dados = serie.to_numpy()
+        else:
+            # Texto, datetime.time ou outro dtype do pandas (ex: period[M], refeito a
+            # partir do texto na leitura): armazena códigos + valores únicos como
+            # string, em ordem crescente para que as categorias lidas já venham
+            # ordenadas. Colunas object com outros objetos (ex: números misturados
+            # com texto) voltariam como string na leitura, então são recusadas
+            try:
+                codigos, unicos = pd.factorize(serie, sort=True, use_na_sentinel=True)
+            except TypeError:
+                unicos = pd.unique(serie.dropna())
+            objeto = serie.dtype == object
+            meta["tipo"] = "hora" if objeto and len(unicos) and isinstance(unicos[0], time) else "texto"
+            tipo_esperado = time if meta["tipo"] == "hora" else str
+            if objeto and not all(isinstance(u, tipo_esperado) for u in unicos):
+                raise TypeError(
+                    f"Coluna {coluna!r}: valores de texto misturados com outros tipos "
+                    "não podem ser gravados no cache colunar"
+                )
+            meta["dtype"] = str(serie.dtype)
+            meta["categorias"] = [str(u) for u in unicos]
+            dados = codigos.astype(tipo_codigos(len(unicos)))
+
+        np.save(os.path.join(diretorio, arquivo), dados, allow_pickle=False)
+        colunas.append(meta)
+
+    with open(os.path.join(diretorio, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"versao": VERSAO_FORMATO, "linhas": len(df), "colunas": colunas}, f)
+
+
+def carregar_colunar(diretorio, texto_como_categoria=False):
+    """
+    Lê um DataFrame gravado por salvar_colunar. As colunas numéricas, de data e
+    os códigos das categorias são mapeados em memória (mmap) em vez de lidos.
+
+    Parâmetros:
+    - diretorio: diretório gerado por salvar_colunar
+    - texto_como_categoria: se True, as colunas de texto viram categorias sobre
+      os códigos mapeados, sem montar um array de objetos Python por coluna
+      (usado pelos processos do pipeline, que compartilham as mesmas páginas)
+
+    Retorna:
+    - DataFrame com as mesmas colunas e tipos do original (ou categorias no
+      lugar do texto, com texto_como_categoria)
+    """
+    with open(os.path.join(diretorio, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+
+    dados = {}
+    for coluna in meta["colunas"]:
+        # mmap_mode="c": leitura sob demanda, escritas ficam só na memória do processo
+        valores = np.load(os.path.join(diretorio, coluna["arquivo"]), mmap_mode="c", allow_pickle=False)
+        valores = np.asarray(valores)  # ndarray comum, ainda apoiado no mmap
+        tipo = coluna["tipo"]
+
+        if tipo == "categoria":
+            serie = pd.Categorical.from_codes(valores, categories=coluna["categorias"])
+        elif tipo == "data":
+            serie = valores.view(coluna["dtype"])
+        elif tipo == "numero":
+            serie = valores
+        elif tipo == "texto" and texto_como_categoria:
+            serie = pd.Categorical.from_codes(valores, categories=coluna["categorias"])
+        else:
+            unicos = pd.Index(coluna["categorias"], dtype=object)
+            if tipo == "hora":
+                unicos = pd.Index(pd.to_datetime(unicos, format="%H:%M:%S").time, dtype=object)
+            serie = unicos.take(valores, allow_fill=True, fill_value=np.nan).to_numpy()
+            if coluna["dtype"] != "object":
+                serie = pd.array(serie, dtype=coluna["dtype"])
+
+        dados[coluna["nome"]] = serie
+
+    return pd.DataFrame(dados, copy=False)
+
+########################################
+
+def garantir_cache(caminho, funcao, diretorio=None, **parametros):
+    """
+    Garante que funcao(caminho, **parametros) esteja gravado no cache, sem
+    carregar o DataFrame quando ele já existe.
+
+    Parâmetros:
+    - caminho: arquivo de origem (ex: data/raw/OnlineRetail.csv)
+    - funcao: função que gera o DataFrame a partir do arquivo
+    - diretorio: raiz do cache (default=DIRETORIO_CACHE)
+    - parametros: argumentos nomeados repassados para a função
+
+    Retorna:
+    - diretório do cache, pronto para carregar_colunar
+    """
+    diretorio = diretorio or DIRETORIO_CACHE
+    destino = os.path.join(diretorio, chave_cache(caminho, funcao, parametros))
+
+    if os.path.exists(os.path.join(destino, "meta.json")):
+        return destino
+
+    df = funcao(caminho, **parametros)
+
+    # Grava em diretório temporário e renomeia, para nunca deixar um cache pela metade
+    os.makedirs(diretorio, exist_ok=True)
+    temporario = tempfile.mkdtemp(dir=diretorio, prefix=".tmp-")
+    try:
+        salvar_colunar(df, temporario)
+        os.replace(temporario, destino)
+    except OSError:
+        shutil.rmtree(temporario, ignore_errors=True)
+        # Só é esperado se outro processo gravou o mesmo cache ao mesmo tempo;
+        # qualquer outra falha (disco cheio, permissão) é repassada
+        if not os.path.exists(os.path.join(destino, "meta.json")):
+            raise
+    except BaseException:
+        shutil.rmtree(temporario, ignore_errors=True)
+        raise
+
+    return destino
+
+
+def carregar_com_cache(caminho, funcao, diretorio=None, **parametros):
+    """
+    Retorna funcao(caminho, **parametros), reaproveitando o resultado gravado
+    em disco quando o arquivo de origem e os parâmetros não mudaram.
+
+    Parâmetros:
+    - caminho: arquivo de origem (ex: data/raw/OnlineRetail.csv)
+    - funcao: função que gera o DataFrame a partir do arquivo
+    - diretorio: raiz do cache (default=DIRETORIO_CACHE)
+    - parametros: argumentos nomeados repassados para a função
+
+    Retorna:
+    - DataFrame gerado pela função ou lido do cache
+    """
+    return carregar_colunar(garantir_cache(caminho, funcao, diretorio, **parametros))
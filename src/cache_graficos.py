@@ -0,0 +1,168 @@
+import hashlib
+import inspect
+import io
+import json
+import os
+import tempfile
+
+import matplotlib
+import pandas as pd
+
+# Diretório padrão das imagens pré-renderizadas
+DIRETORIO_GRAFICOS = os.path.join("data", "clean", "cache", "graficos")
+
+# Formatos de imagem aceitos (o app exibe png/svg; pdf é usado no relatório)
+FORMATOS = ("png", "svg", "pdf")
+
+# Tamanho máximo do cache de imagens em disco; acima dele, as imagens usadas
+# há mais tempo são apagadas
+LIMITE_CACHE_BYTES = 200 * 1024 * 1024
+
+########################################
+
+def hash_dados(df):
+    """
+    Hash do conteúdo de um DataFrame (valores, índice, nomes e tipos das colunas).
+
+    Parâmetros:
+    - df: DataFrame a ser identificado
+
+    Retorna:
+    - string hexadecimal com o hash dos dados
+    """
+    h = hashlib.blake2b(digest_size=20)
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    h.update(json.dumps([[str(c), str(t)] for c, t in df.dtypes.items()]).encode())
+    return h.hexdigest()
+
+
+def chave_grafico(funcao, df, formato="png", dpi=200, **kwargs):
+    """
+    Gera a chave da imagem a partir dos dados, dos parâmetros do gráfico, do
+    código do módulo de plots e da versão do matplotlib.
+
+    Parâmetros:
+    - funcao: função de plot (ex: plot_barh)
+    - df: DataFrame plotado
+    - formato: "png", "svg" ou "pdf"
+    - dpi: resolução usada no savefig
+    - kwargs: parâmetros repassados à função de plot
+
+    Retorna:
+    - string hexadecimal que identifica a imagem
+    """
+    with open(inspect.getsourcefile(funcao), "rb") as f:
+        codigo = hashlib.blake2b(f.read(), digest_size=20).hexdigest()
+
+    descricao = json.dumps({
+        "dados": hash_dados(df),
+        "funcao": f"{funcao.__module__}.{funcao.__qualname__}",
+        "codigo": codigo,
+        "parametros": kwargs,
+        "formato": formato,
+        "dpi": dpi,
+        "matplotlib": matplotlib.__version__,
+    }, sort_keys=True, default=str)
+    return hashlib.blake2b(descricao.encode(), digest_size=20).hexdigest()
+
+########################################
+
+def renderizar(funcao, df, formato="png", dpi=200, **kwargs):
+    """
+    Executa a função de plot e retorna a figura gerada como bytes.
+
+    Parâmetros:
+    - funcao: função de plot (ex: plot_barh)
+    - df: DataFrame plotado
+    - formato: "png", "svg" ou "pdf"
+    - dpi: resolução usada no savefig
+    - kwargs: parâmetros repassados à função de plot
+
+    Retorna:
+    - bytes da imagem
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: {formato}. Use um de {FORMATOS}")
+
+    # Cada chamada tem sua própria Figure (sem pyplot): threads não compartilham estado
+    fig = funcao(df, **kwargs)
+    try:
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=formato, dpi=dpi, bbox_inches="tight")
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+
+
+def limitar_cache(diretorio, limite_bytes=LIMITE_CACHE_BYTES, manter=None):
+    """
+    Apaga as imagens usadas há mais tempo (pela data de modificação, renovada
+    a cada leitura em grafico_em_cache) até o cache caber em limite_bytes.
+
+    Parâmetros:
+    - diretorio: raiz do cache
+    - limite_bytes: tamanho máximo do cache em bytes
+    - manter: caminho de uma imagem que nunca é apagada (a recém-gravada)
+
+    Retorna:
+    - número de imagens apagadas
+    """
+    imagens = []
+    for entrada in os.scandir(diretorio):
+        if entrada.is_file() and not entrada.name.startswith(".tmp-") and entrada.path != manter:
+            info = entrada.stat()
+            imagens.append((info.st_mtime, info.st_size, entrada.path))
+
+    total = sum(tamanho for _, tamanho, _ in imagens) + (os.path.getsize(manter) if manter else 0)
+    apagadas = 0
+    for _, tamanho, caminho in sorted(imagens):
+        if total <= limite_bytes:
+            break
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass  # Já apagada por outro processo
+        total -= tamanho
+        apagadas += 1
+    return apagadas
+
+
+def grafico_em_cache(funcao, df, formato="png", dpi=200, diretorio=None, limite_bytes=LIMITE_CACHE_BYTES, **kwargs):
+    """
+    Retorna a imagem do gráfico, lendo-a do disco quando os mesmos dados e
+    parâmetros já foram renderizados; senão renderiza e grava para as próximas.
+    A cada gravação, o cache é reduzido a limite_bytes (ver limitar_cache).
+
+    Parâmetros:
+    - funcao: função de plot (ex: plot_barh)
+    - df: DataFrame plotado
+    - formato: "png", "svg" ou "pdf"
+    - dpi: resolução usada no savefig
+    - diretorio: raiz do cache (default=DIRETORIO_GRAFICOS)
+    - limite_bytes: tamanho máximo do cache em disco (default=LIMITE_CACHE_BYTES)
+    - kwargs: parâmetros repassados à função de plot
+
+    Retorna:
+    - bytes da imagem
+    """
+    diretorio = diretorio or DIRETORIO_GRAFICOS
+    destino = os.path.join(diretorio, f"{chave_grafico(funcao, df, formato, dpi, **kwargs)}.{formato}")
+
+    try:
+        with open(destino, "rb") as f:
+            imagem = f.read()
+        os.utime(destino)  # Marca como usada recentemente
+        return imagem
+    except FileNotFoundError:
+        pass
+
+    imagem = renderizar(funcao, df, formato, dpi, **kwargs)
+
+    # Grava em arquivo temporário e renomeia, para nunca servir uma imagem pela metade
+    os.makedirs(diretorio, exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(dir=diretorio, prefix=".tmp-")
+    with os.fdopen(descritor, "wb") as f:
+        f.write(imagem)
+    os.replace(temporario, destino)
+    limitar_cache(diretorio, limite_bytes, manter=destino)
+    return imagem
@@ -1,27 +1,389 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
 import pandas as pd
 import numpy as np
 
 ########################################
 
-def calc_transacoes(df):
-    # Calcula a média de InvoiceNo por país individualmente
-    transacoes_unicas = df.groupby("Country")["InvoiceNo"].nunique().sort_values(ascending=False)
-    transacoes_unicas = pd.DataFrame(transacoes_unicas).reset_index().rename(columns={"InvoiceNo":"Unique"})
-    transacoes_totais = df.groupby("Country")["InvoiceNo"].value_counts().sort_values(ascending=False)
-    transacoes_totais = pd.DataFrame(transacoes_totais).reset_index().rename(columns={"count":"Total"})
-    transacoes_totais = transacoes_totais.groupby("Country")["Total"].sum().reset_index().sort_values(by="Total", ascending=False).reset_index().drop(columns=["index"])
-    transacoes = pd.DataFrame({"Country": transacoes_totais["Country"], "Unique": transacoes_unicas["Unique"], "Media": transacoes_totais["Total"] / transacoes_unicas["Unique"], "Total": transacoes_totais["Total"]})
-    return transacoes
+def calc_transacoes(df, chaves="Country", por_mes=False):
+    """
+    Estatísticas de transações por país em uma única passada vetorizada:
+    notas distintas, linhas, quantidade e faturamento, unidas pela chave.
+
+    Parâmetros:
+    - df: DataFrame com os dados de transações
+    - chaves: coluna (ou lista de colunas/Series) que define os grupos (default="Country")
+    - por_mes: se True, agrupa também pelo mês da compra (MonthReference)
+
+    Retorna:
+    - DataFrame com as chaves, Unique (notas distintas), Media (linhas por nota),
+      Total (linhas), Quantity e Revenue, do maior para o menor Total
+    """
+    chaves = [chaves] if isinstance(chaves, (str, pd.Series)) else list(chaves)
+    if por_mes:
+        chaves.append(df["InvoiceDate"].dt.to_period("M").rename("MonthReference"))
+
+    codigos, grupos = codificar_grupos(df, chaves)
+    n_grupos = len(grupos)
+
+    # Linhas com chave nula vão para um grupo extra, descartado no fim
+    indices = np.where(codigos >= 0, codigos, n_grupos)
+    notas, valores_notas = pd.factorize(df["InvoiceNo"])
+
+    # Notas distintas: pares (grupo, nota) únicos contados por grupo;
+    # notas nulas ficam fora, como no nunique/value_counts
+    com_nota = notas >= 0
+    pares = np.unique(indices[com_nota] * max(len(valores_notas), 1) + notas[com_nota])
+    unicas = np.bincount(pares // max(len(valores_notas), 1), minlength=n_grupos + 1)[:n_grupos]
+    total = np.bincount(indices[com_nota], minlength=n_grupos + 1)[:n_grupos]
+
+    quantidade = np.nan_to_num(df["Quantity"].to_numpy(dtype=np.float64))
+    faturamento = np.nan_to_num(quantidade * df["UnitPrice"].to_numpy(dtype=np.float64))
+    soma_quantidade = np.bincount(indices, weights=quantidade, minlength=n_grupos + 1)[:n_grupos]
+    soma_faturamento = np.bincount(indices, weights=faturamento, minlength=n_grupos + 1)[:n_grupos]
+    if pd.api.types.is_integer_dtype(df["Quantity"]):
+        soma_quantidade = soma_quantidade.astype(np.int64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        media = total / unicas
+
+    transacoes = grupos.assign(
+        Unique=unicas, Media=media, Total=total, Quantity=soma_quantidade, Revenue=soma_faturamento
+    )
+    return transacoes.sort_values(by="Total", ascending=False, kind="stable", ignore_index=True)
 
 ########################################
 
-def criar_rfv(
+def calc_media_preco(df):
+    """
+    Preço unitário médio de cada país, do maior para o menor.
+
+    Parâmetros:
+    - df: DataFrame com os dados de transações
+
+    Retorna:
+    - DataFrame com Country e UnitPrice
+    """
+    media = df.groupby("Country", observed=True)["UnitPrice"].mean().reset_index()
+    return media.sort_values(by="UnitPrice", ascending=False, ignore_index=True)
+
+########################################
+
+def calc_top_vendas_pais(df, k=1):
+    """
+    Produto mais vendido (maior quantidade somada) em cada país.
+
+    Parâmetros:
+    - df: DataFrame com os dados de transações
+    - k: número de produtos por país (default=1)
+
+    Retorna:
+    - DataFrame com Country, Quantity e Description, por país e do mais para o menos vendido
+    """
+    top = top_k_por_grupo(df, "Country", "Description", "Quantity", k=k)
+    top["Quantity"] = top["Quantity"].astype(df["Quantity"].dtype)
+    return top.sort_values(["Country", "Rank"], ignore_index=True)[["Country", "Quantity", "Description"]]
+
+########################################
+
+def calc_margem_lucro(df):
+    """
+    Produto de maior preço médio (maior margem) em cada país.
+
+    Parâmetros:
+    - df: DataFrame com os dados de transações
+
+    Retorna:
+    - DataFrame com Country, Description e UnitPrice, do maior para o menor preço;
+      em caso de empate no país, fica o produto que vem primeiro em ordem alfabética
+    """
+    # Categorias ordenadas: top_k_por_grupo desempata pela ordem dos códigos do item
+    descricao = df["Description"]
+    if isinstance(descricao.dtype, pd.CategoricalDtype):
+        descricao = descricao.cat.reorder_categories(descricao.cat.categories.sort_values())
+    else:
+        descricao = descricao.astype("category")
+
+    top = top_k_por_grupo(df.assign(Description=descricao), "Country", "Description", "UnitPrice", k=1, agregacao="mean")
+    top["Description"] = top["Description"].astype(df["Description"].dtype)
+    return top[["Country", "Description", "UnitPrice"]].sort_values(
+        by="UnitPrice", ascending=False, kind="stable", ignore_index=True
+    )
+
+########################################
+
+def calc_preferencias(df, n_clientes=10):
+    """
+    Produtos mais comprados pelos clientes com maior quantidade comprada.
+
+    Parâmetros:
+    - df: DataFrame com os dados de transações
+    - n_clientes: número de clientes considerados (default=10)
+
+    Retorna:
+    - DataFrame com Description e Quantity, do mais para o menos comprado
+    """
+    top_clientes = df.groupby("CustomerID")["Quantity"].sum().nlargest(n_clientes).index
+    df_top = df[df["CustomerID"].isin(top_clientes)]
+    preferencias = df_top.groupby("Description", observed=True)["Quantity"].sum()
+    return preferencias.sort_values(ascending=False).reset_index()
+
+########################################
+
+def codificar_grupos(df, chaves):
+    """
+    Converte uma ou mais colunas-chave em um código inteiro de grupo por linha,
+    sem passar pelo groupby (colunas categóricas usam os próprios códigos).
+
+    Parâmetros:
+    - df: DataFrame com os dados
+    - chaves: coluna (ou lista de colunas/Series) que define os grupos
+
+    Retorna:
+    - codigos: array int64 com o código do grupo de cada linha (-1 se alguma chave for nula)
+    - grupos: DataFrame com os valores das chaves de cada código, na ordem dos códigos
+    """
+    chaves = [chaves] if isinstance(chaves, (str, pd.Series)) else list(chaves)
+
+    codigos_chaves, valores_chaves, nomes = [], [], []
+    for chave in chaves:
+        serie = df[chave] if isinstance(chave, str) else pd.Series(chave, index=df.index)
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            codigos, valores = serie.cat.codes.to_numpy().astype(np.int64), serie.cat.categories
+        else:
+            codigos, valores = pd.factorize(serie)
+            codigos = codigos.astype(np.int64)
+        codigos_chaves.append(codigos)
+        valores_chaves.append(valores)
+        nomes.append(serie.name)
+
+    # Combina os códigos de cada chave em um único inteiro (base mista);
+    # linhas com alguma chave nula vão para o código extra "total"
+    tamanhos = [max(len(v), 1) for v in valores_chaves]
+    total = int(np.prod(tamanhos, dtype=object))
+    combinado = codigos_chaves[0]
+    nulos = combinado < 0
+    for codigos, tamanho in zip(codigos_chaves[1:], tamanhos[1:]):
+        nulos |= codigos < 0
+        combinado = combinado * tamanho + codigos
+    combinado = np.where(nulos, total, combinado)
+
+    # Renumera só os grupos presentes: por contagem quando o espaço de chaves é
+    # pequeno, senão por factorize (ordem de aparição)
+    if total <= max(len(df), 1 << 20):
+        contagem = np.bincount(combinado, minlength=total + 1)[:total]
+        presentes = np.flatnonzero(contagem)
+        tradutor = np.full(total + 1, -1, dtype=np.int64)
+        tradutor[presentes] = np.arange(len(presentes))
+        codigos = tradutor[combinado]
+    else:
+        codigos = np.full(len(df), -1, dtype=np.int64)
+        codigos_validos, presentes = pd.factorize(combinado[~nulos])
+        codigos[~nulos] = codigos_validos
+
+    # Decompõe o código combinado de volta nos valores de cada chave
+    grupos = {}
+    resto = np.asarray(presentes, dtype=np.int64)
+    for nome, valores, tamanho in reversed(list(zip(nomes, valores_chaves, tamanhos))):
+        resto, codigo_chave = np.divmod(resto, tamanho)
+        grupos[nome] = pd.Index(valores).take(codigo_chave)
+    grupos = pd.DataFrame({nome: grupos[nome] for nome in nomes})
+
+    return codigos, grupos
+
+
+def agregar_ponderado(df, chaves, col_valor, col_peso, mascara=None):
+    """
+    Calcula, em uma única passada vetorizada, a soma ponderada, a soma dos pesos
+    e a média ponderada de uma coluna para qualquer conjunto de chaves
+    (ex: "Country", ["Country", "Month"], "StockCode").
+
+    Parâmetros:
+    - df: DataFrame com os dados
+    - chaves: coluna (ou lista de colunas/Series) que define os grupos
+    - col_valor: coluna com os valores a serem ponderados (ex: UnitPrice)
+    - col_peso: coluna com os pesos (ex: Quantity)
+    - mascara: Series/array booleano opcional; linhas False não entram na conta
+
+    Retorna:
+    - resumo: DataFrame com as chaves, SomaPonderada, SomaPesos e MediaPonderada,
+      uma linha por grupo, na ordem dos códigos de grupo
+    - codigos: array com o código do grupo de cada linha de df (-1 para chave nula)
+    """
+    codigos, grupos = codificar_grupos(df, chaves)
+    n_grupos = len(grupos)
+
+    # Linhas fora da máscara recebem peso zero e nulos contam como zero (como no
+    # sum do pandas), evitando cópias filtradas dos arrays
+    pesos = df[col_peso].to_numpy(dtype=np.float64, copy=True)
+    if mascara is not None:
+        pesos *= np.asarray(mascara, dtype=bool)
+    np.nan_to_num(pesos, copy=False)
+    ponderados = np.nan_to_num(df[col_valor].to_numpy(dtype=np.float64) * pesos, copy=False)
+
+    # Linhas com chave nula vão para um grupo extra, descartado no fim
+    indices = np.where(codigos >= 0, codigos, n_grupos)
+    soma_ponderada = np.bincount(indices, weights=ponderados, minlength=n_grupos + 1)[:n_grupos]
+    soma_pesos = np.bincount(indices, weights=pesos, minlength=n_grupos + 1)[:n_grupos]
+
+    # Grupos sem peso (ex: todas as linhas fora da máscara) ficam com média nula
+    with np.errstate(divide="ignore", invalid="ignore"):
+        media = np.where(soma_pesos != 0, soma_ponderada / soma_pesos, np.nan)
+
+    resumo = grupos.assign(SomaPonderada=soma_ponderada, SomaPesos=soma_pesos, MediaPonderada=media)
+    return resumo, codigos
+
+
+def media_ponderada_por_linha(df, chaves, col_valor, col_peso, mascara=None):
+    """
+    Média ponderada do grupo de cada linha, propagada pelos códigos de grupo
+    (indexação direta de array, sem merge).
+
+    Parâmetros:
+    - os mesmos de agregar_ponderado
+
+    Retorna:
+    - Series alinhada ao índice de df com a média ponderada do grupo da linha
+    """
+    resumo, codigos = agregar_ponderado(df, chaves, col_valor, col_peso, mascara)
+    media = np.append(resumo["MediaPonderada"].to_numpy(), np.nan)
+    # Código -1 (chave nula) aponta para o NaN acrescentado no fim
+    return pd.Series(media[codigos], index=df.index)
+
+def top_k_por_grupo(df, chaves, col_item, col_metrica, k=1, agregacao="sum"):
+    """
+    Retorna os k itens de maior métrica em cada grupo (ex: os 10 produtos mais
+    vendidos por país) sem ordenar a tabela inteira: a métrica é agregada por
+    grupo × item com bincount e cada grupo usa seleção parcial (np.partition),
+    ordenando só os k escolhidos.
+
+    Parâmetros:
+    - df: DataFrame com os dados
+    - chaves: coluna (ou lista de colunas/Series) que define os grupos
+      (ex: "Country", ["Country", mes], perfil RFV mapeado por cliente)
+    - col_item: coluna dos itens ranqueados (ex: Description)
+    - col_metrica: coluna da métrica (ex: Quantity)
+    - k: número de itens por grupo
+    - agregacao: "sum" ou "mean" da métrica por grupo × item
+
+    Retorna:
+    - DataFrame com as chaves, col_item, col_metrica agregada e Rank (1 = maior),
+      na ordem dos grupos; empates na fronteira do k ficam com o item que aparece primeiro
+    """
+    if agregacao not in ("sum", "mean"):
+        raise ValueError("agregacao deve ser 'sum' ou 'mean'")
+    chaves = [chaves] if isinstance(chaves, (str, pd.Series)) else list(chaves)
+
+    # Agrega a métrica por grupo × item (linhas com chave ou item nulo ficam de fora)
+    codigos, pares = codificar_grupos(df, chaves + [col_item])
+    n_pares = len(pares)
+    indices = np.where(codigos >= 0, codigos, n_pares)
+    valores = df[col_metrica].to_numpy(dtype=np.float64)
+    validos = ~np.isnan(valores)
+    metrica = np.bincount(indices, weights=np.where(validos, valores, 0.0), minlength=n_pares + 1)[:n_pares]
+    if agregacao == "mean":
+        # Como no pandas, a média ignora os NaN: só linhas com valor entram no denominador
+        contagem = np.bincount(indices, weights=validos, minlength=n_pares + 1)[:n_pares]
+        with np.errstate(invalid="ignore"):
+            metrica = metrica / contagem
+    # Pares sem nenhum valor (média NaN) ficam por último no ranking
+    ranking = np.where(np.isnan(metrica), -np.inf, metrica)
+
+    # Agrupa os pares por grupo (ordenação estável só pelo código do grupo)
+    grupo_par, grupos = codificar_grupos(pares, list(pares.columns[:-1]))
+    ordem = np.argsort(grupo_par, kind="stable")
+    fim = np.cumsum(np.bincount(grupo_par, minlength=len(grupos)))
+    inicio = fim - np.bincount(grupo_par, minlength=len(grupos))
+
+    escolhidos = []
+    for a, b in zip(inicio, fim):
+        segmento = ordem[a:b]
+        valores_seg = ranking[segmento]
+        if len(segmento) > k:
+            # k-ésimo maior valor; completa com os empatados na ordem de aparição
+            limite = np.partition(valores_seg, len(segmento) - k)[len(segmento) - k]
+            maiores = np.flatnonzero(valores_seg > limite)
+            empatados = np.flatnonzero(valores_seg == limite)[:k - len(maiores)]
+            selecao = np.concatenate([maiores, empatados])
+        else:
+            selecao = np.arange(len(segmento))
+        # Ordena só os escolhidos: maior métrica primeiro, empates na ordem de aparição
+        selecao = selecao[np.lexsort((selecao, -valores_seg[selecao]))]
+        escolhidos.append(segmento[selecao])
+
+    escolhidos = np.concatenate(escolhidos) if escolhidos else np.array([], dtype=np.int64)
+    top = pares.iloc[escolhidos].reset_index(drop=True)
+    top[col_metrica] = metrica[escolhidos]
+    top["Rank"] = top.groupby(list(top.columns[:len(chaves)]), sort=False).cumcount() + 1
+    return top
+
+########################################
+
+def executar_por_cliente(funcao, df, n_processos=None, customer_col="CustomerID", **parametros):
+    """
+    Divide as transações em fatias pelo hash do cliente e executa funcao em
+    cada fatia num pool de processos. Como cada cliente cai em uma única
+    fatia, os agregados por cliente de cada processo já são finais.
+
+    Parâmetros:
+    - funcao: função de agregação, chamada como funcao(fatia, customer_col=..., **parametros)
+    - df: DataFrame com os dados de transações
+    - n_processos: número de processos (default: número de núcleos)
+    - customer_col: coluna de ID do cliente
+    - parametros: demais argumentos nomeados da função
+
+    Retorna:
+    - resultados de cada fatia concatenados (na ordem das fatias)
+    """
+    n_processos = n_processos or os.cpu_count() or 1
+    tarefa = partial(funcao, customer_col=customer_col, **parametros)
+    if n_processos == 1:
+        return tarefa(df)
+
+    fatia = pd.util.hash_pandas_object(df[customer_col], index=False).to_numpy() % n_processos
+    partes = [parte for _, parte in df.groupby(fatia)]
+    with ProcessPoolExecutor(max_workers=n_processos) as executor:
+        return pd.concat(list(executor.map(tarefa, partes)))
+
+
+def agregar_por_cliente(
     df,
     customer_col="CustomerID",
     date_col="InvoiceDate",
     invoice_col="InvoiceNo",
     quantity_col="Quantity",
     price_col="UnitPrice"
+):
+    """
+    Agregados parciais de cada cliente: última compra, número de notas e valor total.
+
+    Parâmetros:
+    - as mesmas colunas de criar_rfv
+
+    Retorna:
+    - DataFrame indexado pelo cliente com UltimaCompra, Frequency e Value
+    """
+    # Valor total de cada linha (quantidade × preço), sem alterar o DataFrame recebido
+    valor_total = df[quantity_col] * df[price_col]
+
+    grupos = df.groupby(customer_col)
+    return pd.DataFrame({
+        "UltimaCompra": grupos[date_col].max(),
+        "Frequency": grupos[invoice_col].nunique(),
+        "Value": valor_total.groupby(df[customer_col]).sum(),
+    })
+
+
+def criar_rfv(
+    df,
+    customer_col="CustomerID",
+    date_col="InvoiceDate",
+    invoice_col="InvoiceNo",
+    quantity_col="Quantity",
+    price_col="UnitPrice",
+    n_processos=1
 ):
     """
     Calcula a análise RFV (Recency, Frequency, Value) para um DataFrame customizado.
@@ -33,216 +395,635 @@ def criar_rfv(
     - invoice_col: coluna identificadora única de cada compra
     - quantity_col: coluna com a quantidade do item
     - price_col: coluna com o preço unitário do item
+    - n_processos: se maior que 1, agrega os clientes em paralelo (ver executar_por_cliente)
 
     Retorna:
     - DataFrame com métricas RFV, scores e perfis de cliente
     """
 
-    # Calcula o valor total de cada linha (quantidade × preço)
-    df["TotalPrice"] = df[quantity_col] * df[price_col]
+    # Agrupa por cliente (em fatias paralelas, se pedido)
+    parcial = executar_por_cliente(
+        agregar_por_cliente, df, n_processos, customer_col,
+        date_col=date_col, invoice_col=invoice_col,
+        quantity_col=quantity_col, price_col=price_col
+    )
 
-    # Define a última data da base como referência para o cálculo da Recency
-    data_ultima_transacao = df[date_col].max()
+    # A última data da base é a referência da Recency; só os tercis são globais
+    return rfv_do_estado(parcial, data_referencia=df[date_col].max(), customer_col=customer_col)
 
-    # Agrupa por cliente e calcula as métricas RFV
-    rfv = df.groupby(df[customer_col]).agg({
-        date_col: lambda x: (data_ultima_transacao - x.max()).days,  # Recency
-        invoice_col: "nunique",                                     # Frequency
-        "TotalPrice": "sum"                                         # Value
-    }).reset_index()
 
-    # Renomeia as colunas
-    rfv.columns = [customer_col, "Recency", "Frequency", "Value"]
+def pontuar_rfv(rfv):
+    """
+    Calcula os scores (RScore, FScore, VScore), a soma RFV e o perfil de cada
+    cliente a partir das métricas Recency, Frequency e Value.
 
-    # Calcula os scores por tercis (ou regra personalizada)
-    rfv["RScore"] = pd.qcut(rfv["Recency"], q=3, labels=[3, 2, 1]).astype(int)
+    Parâmetros:
+    - rfv: DataFrame com as colunas Recency, Frequency e Value (uma linha por cliente)
 
-    def get_fscore(f):
-        if f > 5:
-            return 3
-        elif f >= 3:
-            return 2
-        else:
-            return 1
+    Retorna:
+    - o próprio DataFrame com as colunas de score e Profile adicionadas
+    """
 
-    rfv["FScore"] = rfv["Frequency"].apply(get_fscore)
-    rfv["VScore"] = pd.qcut(rfv["Value"], q=3, labels=[1, 2, 3]).astype(int)
+    # Calcula os scores por tercis (labels=False devolve o tercil 0, 1 ou 2)
+    rfv["RScore"] = 3 - pd.qcut(rfv["Recency"], q=3, labels=False)
+    rfv["FScore"] = np.select([rfv["Frequency"] > 5, rfv["Frequency"] >= 3], [3, 2], default=1)
+    rfv["VScore"] = pd.qcut(rfv["Value"], q=3, labels=False) + 1
 
     # Soma dos scores RFV
     rfv["RFV"] = rfv["RScore"] + rfv["FScore"] + rfv["VScore"]
 
     # Classificação final dos perfis
-    def segmentar_cliente(score):
-        if score >= 8:
-            return "Clientes VIP"
-        elif score >= 5:
-            return "Clientes Emergentes"
-        else:
-            return "Clientes Churn"
-
-    rfv["Profile"] = rfv["RFV"].apply(segmentar_cliente)
+    rfv["Profile"] = np.select(
+        [rfv["RFV"] >= 8, rfv["RFV"] >= 5],
+        ["Clientes VIP", "Clientes Emergentes"],
+        default="Clientes Churn"
+    )
 
     return rfv
 
 ########################################
 
+def atualizar_estado_rfv(
+    estado,
+    lote,
+    customer_col="CustomerID",
+    date_col="InvoiceDate",
+    invoice_col="InvoiceNo",
+    quantity_col="Quantity",
+    price_col="UnitPrice"
+):
+    """
+    Incorpora um novo lote de transações ao estado acumulado por cliente, sem
+    reprocessar o histórico. O estado é atualizado no lugar: só as linhas dos
+    clientes do lote são escritas e os arrays crescem com folga (dobrando de
+    tamanho), então o custo é proporcional ao lote e não ao total de clientes.
+    Os scores são derivados depois com rfv_do_estado.
+
+    O estado guarda os pares cliente × nota já contados, de forma que uma nota
+    dividida entre lotes (ou reenviada) soma uma única vez na Frequency. Já o
+    Value é a soma das linhas: reenviar as mesmas linhas conta o valor duas vezes.
+
+    Parâmetros:
+    - estado: dicionário retornado por uma chamada anterior (ou None no primeiro lote)
+    - lote: DataFrame com as novas transações
+    - demais: as mesmas colunas de criar_rfv
+
+    Retorna:
+    - o estado: dicionário com "n" (clientes), "posicoes" (cliente -> linha),
+      "notas" (pares já contados) e os arrays ids, UltimaCompra, Frequency e
+      Value (só as n primeiras posições são válidas)
+    """
+    parcial = agregar_por_cliente(lote, customer_col, date_col, invoice_col, quantity_col, price_col)
+    if estado is None:
+        estado = {
+            "n": 0, "posicoes": {}, "notas": set(),
+            "ids": np.empty(0, dtype=object),
+            "UltimaCompra": np.empty(0, dtype=parcial["UltimaCompra"].dtype),
+            "Frequency": np.empty(0, dtype=np.int64),
+            "Value": np.empty(0, dtype=np.float64),
+        }
+
+    # Notas já contadas em lotes anteriores não entram de novo na Frequency
+    pares = lote[[customer_col, invoice_col]].dropna().drop_duplicates()
+    pares = list(zip(pares[customer_col], pares[invoice_col]))
+    repetidas = pd.Series([cliente for cliente, nota in pares if (cliente, nota) in estado["notas"]], dtype=object)
+    estado["notas"].update(pares)
+    frequencia = parcial["Frequency"].to_numpy() - repetidas.value_counts().reindex(parcial.index, fill_value=0).to_numpy()
+
+    # Linha de cada cliente do lote; clientes novos recebem as próximas linhas livres
+    posicoes = estado["posicoes"]
+    linhas = np.fromiter((posicoes.get(cliente, -1) for cliente in parcial.index), dtype=np.int64, count=len(parcial))
+    novos = linhas < 0
+    n, n_novos = estado["n"], int(novos.sum())
+    if n + n_novos > len(estado["ids"]):
+        capacidade = max(2 * len(estado["ids"]), n + n_novos)
+        for coluna in ["ids", "UltimaCompra", "Frequency", "Value"]:
+            antigo = estado[coluna]
+            estado[coluna] = np.empty(capacidade, dtype=antigo.dtype)
+            estado[coluna][:n] = antigo[:n]
+
+    # Clientes novos: copia os agregados do lote
+    linhas[novos] = np.arange(n, n + n_novos)
+    posicoes.update(zip(parcial.index[novos], linhas[novos].tolist()))
+    estado["ids"][linhas[novos]] = parcial.index[novos].to_numpy(dtype=object)
+    estado["UltimaCompra"][linhas[novos]] = parcial["UltimaCompra"].to_numpy()[novos]
+    estado["Frequency"][linhas[novos]] = frequencia[novos]
+    estado["Value"][linhas[novos]] = parcial["Value"].to_numpy()[novos]
+    estado["n"] = n + n_novos
+
+    # Clientes já conhecidos: atualiza só as suas linhas
+    conhecidos = linhas[~novos]
+    estado["UltimaCompra"][conhecidos] = np.maximum(
+        estado["UltimaCompra"][conhecidos], parcial["UltimaCompra"].to_numpy()[~novos]
+    )
+    estado["Frequency"][conhecidos] += frequencia[~novos]
+    estado["Value"][conhecidos] += parcial["Value"].to_numpy()[~novos]
+    return estado
+
+
+def tabela_do_estado(estado):
+    """
+    Converte o estado de atualizar_estado_rfv em um DataFrame indexado pelo
+    cliente com UltimaCompra, Frequency e Value (formato de agregar_por_cliente).
+    """
+    n = estado["n"]
+    return pd.DataFrame(
+        {coluna: estado[coluna][:n] for coluna in ["UltimaCompra", "Frequency", "Value"]},
+        index=pd.Index(estado["ids"][:n]),
+    )
+
+
+def rfv_do_estado(estado, data_referencia=None, customer_col="CustomerID"):
+    """
+    Deriva a tabela RFV (mesmo formato de criar_rfv) a partir do estado
+    incremental. Só os tercis de pontuar_rfv exigem uma passada global.
+
+    Parâmetros:
+    - estado: dicionário retornado por atualizar_estado_rfv (ou DataFrame de agregar_por_cliente)
+    - data_referencia: data usada na Recency (default: última compra registrada)
+    - customer_col: nome da coluna de cliente no resultado
+
+    Retorna:
+    - DataFrame com métricas RFV, scores e perfis de cliente
+    """
+    if isinstance(estado, dict):
+        estado = tabela_do_estado(estado)
+    if data_referencia is None:
+        data_referencia = estado["UltimaCompra"].max()
+
+    estado = estado.sort_index()
+    rfv = pd.DataFrame({
+        customer_col: estado.index,
+        "Recency": (data_referencia - estado["UltimaCompra"]).dt.days.to_numpy(),
+        "Frequency": estado["Frequency"].to_numpy(),
+        "Value": estado["Value"].to_numpy(),
+    })
+    return pontuar_rfv(rfv)
+
+########################################
+
+def criar_rfv_em_datas(
+    df,
+    datas,
+    customer_col="CustomerID",
+    date_col="InvoiceDate",
+    invoice_col="InvoiceNo",
+    quantity_col="Quantity",
+    price_col="UnitPrice"
+):
+    """
+    Calcula o RFV "como era" em cada uma das datas de referência, com uma única
+    ordenação da base: cada cliente vira uma linha do tempo com somas
+    acumuladas, e cada data é respondida por busca binária (searchsorted).
+
+    O resultado de cada data é igual ao de criar_rfv(df[df[date_col] <= data]),
+    a menos do arredondamento de ponto flutuante em Value (somas feitas em outra
+    ordem), que pode trocar o VScore de um cliente exatamente sobre um tercil.
+
+    Parâmetros:
+    - df: DataFrame com os dados de transações
+    - datas: lista de datas de referência
+    - demais: as mesmas colunas de criar_rfv
+
+    Retorna:
+    - DataFrame com ReferenceDate e as colunas de criar_rfv, uma linha por cliente ativo em cada data
+    """
+    codigos, clientes = pd.factorize(df[customer_col], sort=True)
+    validos = codigos >= 0
+    codigos = codigos[validos]
+    datas_transacao = df[date_col].to_numpy()[validos]
+    notas = pd.factorize(df[invoice_col].to_numpy()[validos])[0]
+    valores = (df[quantity_col] * df[price_col]).to_numpy(dtype=np.float64)[validos]
+
+    # Linha do tempo: ordena por cliente e data
+    ordem = np.lexsort((datas_transacao, codigos))
+    codigos, datas_transacao = codigos[ordem], datas_transacao[ordem]
+    notas, valores = notas[ordem], valores[ordem]
+
+    # Cada nota conta uma vez, na primeira data em que aparece para o cliente.
+    # Linhas sem nota (código -1) ficam fora da chave, que colidiria com a última
+    # nota do cliente anterior, e não contam na Frequency (como o nunique de
+    # criar_rfv); continuam valendo para Recency e Value
+    com_nota = notas >= 0
+    nota_nova = np.zeros(len(notas), dtype=bool)
+    nota_nova[com_nota] = ~pd.Series(codigos[com_nota] * (notas.max(initial=0) + 1) + notas[com_nota]).duplicated().to_numpy()
+
+    # Somas acumuladas reiniciadas a cada cliente (sem perda de precisão entre clientes)
+    frequencia_acumulada = pd.Series(nota_nova.astype(np.int64)).groupby(codigos).cumsum().to_numpy()
+    valor_acumulado = pd.Series(valores).groupby(codigos).cumsum().to_numpy()
+
+    # Chave ordenada cliente × posição da data, para buscar o corte de cada cliente
+    datas_unicas = np.unique(datas_transacao)
+    passo = len(datas_unicas) + 1
+    chave = codigos * passo + np.searchsorted(datas_unicas, datas_transacao)
+    todos = np.arange(len(clientes))
+    inicio = np.searchsorted(chave, todos * passo, side="left")
+
+    resultados = []
+    for data in pd.to_datetime(list(datas)):
+        limite = np.searchsorted(datas_unicas, data.to_datetime64(), side="right")
+        if limite == 0:
+            continue
+        fim = np.searchsorted(chave, todos * passo + limite, side="left")
+        ativos = fim > inicio
+        ultima = fim[ativos] - 1
+
+        # Referência: última transação da base até a data (como em criar_rfv)
+        referencia = datas_unicas[limite - 1]
+        rfv = pd.DataFrame({
+            customer_col: clientes[ativos],
+            "Recency": (referencia - datas_transacao[ultima]) // np.timedelta64(1, "D"),
+            "Frequency": frequencia_acumulada[ultima],
+            "Value": valor_acumulado[ultima],
+        })
+        rfv = pontuar_rfv(rfv)
+        rfv.insert(0, "ReferenceDate", data)
+        resultados.append(rfv)
+
+    if not resultados:
+        return pd.DataFrame(columns=["ReferenceDate", customer_col, "Recency", "Frequency", "Value",
+                                     "RScore", "FScore", "VScore", "RFV", "Profile"])
+    return pd.concat(resultados, ignore_index=True)
+
+########################################
+
 def calc_proporcao_rfv(rfv):
     rfv = rfv["Profile"].value_counts(normalize=True).reset_index().rename(columns={"proportion":"Proportion"})
     return rfv
 
 ########################################
 
-def calc_migracoes_rfv(df):
-    # 1. Extrai o mês da transação
-    df["MonthReference"] = df["InvoiceDate"].dt.to_period("M")
-    
-    # 2. Cálculo mensal de RFV com classificação por perfil
-    def calcular_rfv_mensal(df):
-        resultados = []
-    
-        for mes in sorted(df["MonthReference"].unique()):
-            df_mes = df[df["MonthReference"] == mes]
-    
-            rfm = (
-                df_mes.groupby("CustomerID")
-                .agg({
-                    "InvoiceDate": lambda x: (df_mes["InvoiceDate"].max() - x.max()).days,
-                    "InvoiceNo": "nunique",
-                    "TotalPrice": "sum"
-                })
-                .reset_index()
-            )
-            rfm.columns = ["CustomerID", "Recency", "Frequency", "Monetary"]
-    
-            rfm["R_score"] = pd.qcut(rfm["Recency"], 3, labels=[3, 2, 1])
-            rfm["F_score"] = pd.qcut(rfm["Frequency"].rank(method="first"), 3, labels=[1, 2, 3])
-            rfm["M_score"] = pd.qcut(rfm["Monetary"], 3, labels=[1, 2, 3])
-    
-            rfm["RFV"] = rfm["R_score"].astype(str) + rfm["F_score"].astype(str) + rfm["M_score"].astype(str)
-    
-            def classificar(rfv):
-                if rfv == "333":
-                    return "Clientes VIP"
-                elif rfv.startswith("3") or rfv.endswith("3"):
-                    return "Clientes Emergentes"
-                elif rfv.startswith("1") and rfv.endswith("1"):
-                    return "Clientes Churn"
-                else:
-                    return "Clientes Regulares"
-    
-            rfm["Profile"] = rfm["RFV"].apply(classificar)
-            rfm["MonthReference"] = mes
-            resultados.append(rfm[["CustomerID", "MonthReference", "Profile"]])
-    
-        return pd.concat(resultados, ignore_index=True)
-    
-    # 3. Aplica o cálculo mensal de RFV
-    rfv = calcular_rfv_mensal(df)
-    
-    # 4. Faz o merge para obter df_rfv com perfis mensais
-    df_rfv = df.merge(rfv, on=["CustomerID", "MonthReference"], how="left")
-    
-    # 5. Prepara perfil mensal por cliente
-    monthly_profiles = (
-        df_rfv.groupby(["CustomerID", "MonthReference"])["Profile"]
-        .first()
-        .reset_index()
-        .sort_values(by=["CustomerID", "MonthReference"])
+def calc_faturamento_rfv(rfv):
+    """
+    Faturamento total gerado por cada perfil RFV.
+
+    Parâmetros:
+    - rfv: DataFrame retornado por criar_rfv
+
+    Retorna:
+    - DataFrame com Profile e Value
+    """
+    return rfv.groupby("Profile")["Value"].sum().reset_index()
+
+########################################
+
+def agregar_cliente_mes(
+    df,
+    customer_col="CustomerID",
+    date_col="InvoiceDate",
+    invoice_col="InvoiceNo",
+    quantity_col="Quantity",
+    price_col="UnitPrice"
+):
+    """
+    Agregados parciais de cada cliente × mês: última compra, número de notas e valor total.
+
+    Parâmetros:
+    - as mesmas colunas de criar_rfv
+
+    Retorna:
+    - DataFrame com customer_col, MonthReference, UltimaCompra, Frequency e Value
+    """
+    mes = df[date_col].dt.to_period("M").rename("MonthReference")
+    chaves = [df[customer_col], mes]
+    grupos = df.groupby(chaves)
+
+    return pd.DataFrame({
+        "UltimaCompra": grupos[date_col].max(),
+        "Frequency": grupos[invoice_col].nunique(),
+        "Value": (df[quantity_col] * df[price_col]).groupby(chaves).sum(),
+    }).reset_index()
+
+
+def calc_rfv_mensal(
+    df,
+    customer_col="CustomerID",
+    date_col="InvoiceDate",
+    invoice_col="InvoiceNo",
+    quantity_col="Quantity",
+    price_col="UnitPrice",
+    n_processos=1
+):
+    """
+    Calcula o RFV de cada cliente em cada mês em uma única agregação por
+    cliente × mês. É a base comum de calc_migracoes_rfv e calc_retencao_rfv.
+
+    A Recency é medida contra a última transação do próprio mês e os tercis
+    são calculados dentro de cada mês. São gerados dois perfis:
+    - Profile: soma dos scores, como em criar_rfv (usado na retenção)
+    - MigrationProfile: combinação R-F-V, com F por tercil do ranking de
+      frequência (usado nas migrações)
+
+    Parâmetros:
+    - as mesmas colunas de criar_rfv
+    - n_processos: se maior que 1, agrega os clientes em paralelo (ver executar_por_cliente)
+
+    Retorna:
+    - DataFrame com uma linha por cliente × mês (MonthReference), ordenado por cliente e mês
+    """
+    mensal = executar_por_cliente(
+        agregar_cliente_mes, df, n_processos, customer_col,
+        date_col=date_col, invoice_col=invoice_col,
+        quantity_col=quantity_col, price_col=price_col
+    )
+    if n_processos != 1:
+        mensal = mensal.sort_values([customer_col, "MonthReference"], ignore_index=True)
+
+    return pontuar_rfv_mensal(mensal, customer_col)
+
+
+def pontuar_rfv_mensal(mensal, customer_col="CustomerID"):
+    """
+    Calcula Recency, scores e perfis mensais a partir de agregar_cliente_mes.
+    Só a última compra de cada mês e os tercis dependem de todos os clientes.
+
+    Parâmetros:
+    - mensal: DataFrame retornado por agregar_cliente_mes, ordenado por cliente e mês
+    - customer_col: coluna de ID do cliente
+
+    Retorna:
+    - DataFrame no formato de calc_rfv_mensal
+    """
+    # A última transação do mês é o máximo das últimas compras de cada cliente no mês
+    por_mes = mensal.groupby("MonthReference")
+    mensal["Recency"] = (por_mes["UltimaCompra"].transform("max") - mensal["UltimaCompra"]).dt.days
+
+    def tercil(coluna):
+        # Tercil (0, 1 ou 2) calculado separadamente dentro de cada mês
+        return por_mes[coluna].transform(lambda x: pd.qcut(x, 3, labels=False)).astype(int)
+
+    mensal["RScore"] = 3 - tercil("Recency")
+    mensal["FScore"] = np.select([mensal["Frequency"] > 5, mensal["Frequency"] >= 3], [3, 2], default=1)
+    mensal["VScore"] = tercil("Value") + 1
+    mensal["RFV"] = mensal["RScore"] + mensal["FScore"] + mensal["VScore"]
+    mensal["Profile"] = np.select(
+        [mensal["RFV"] >= 8, mensal["RFV"] >= 5],
+        ["Clientes VIP", "Clientes Emergentes"],
+        default="Clientes Churn"
+    )
+
+    # Perfil das migrações: F pelo ranking (empates na ordem dos clientes)
+    mensal["FRank"] = por_mes["Frequency"].transform(
+        lambda x: pd.qcut(x.rank(method="first"), 3, labels=False)
+    ).astype(int) + 1
+    r, f, v = mensal["RScore"], mensal["FRank"], mensal["VScore"]
+    mensal["MigrationProfile"] = np.select(
+        [(r == 3) & (f == 3) & (v == 3), (r == 3) | (v == 3), (r == 1) & (v == 1)],
+        ["Clientes VIP", "Clientes Emergentes", "Clientes Churn"],
+        default="Clientes Regulares"
+    )
+
+    colunas = [
+        customer_col, "MonthReference", "Recency", "Frequency", "Value",
+        "RScore", "FScore", "VScore", "RFV", "Profile", "MigrationProfile"
+    ]
+    return mensal[colunas]
+
+
+########################################
+
+def calc_migracoes_rfv(df, rfv_mensal=None):
+    """
+    Conta, por mês, os clientes que migraram de Emergentes para VIP em relação
+    ao mês anterior em que compraram.
+
+    Parâmetros:
+    - df: DataFrame com os dados de transações
+    - rfv_mensal: resultado de calc_rfv_mensal(df), se já calculado
+
+    Retorna:
+    - DataFrame com Month e NumMigrations
+    """
+    if rfv_mensal is None:
+        rfv_mensal = calc_rfv_mensal(df)
+
+    # Perfil mensal por cliente (calc_rfv_mensal já ordena por cliente e mês)
+    monthly_profiles = rfv_mensal[["CustomerID", "MonthReference", "MigrationProfile"]].rename(
+        columns={"MigrationProfile": "Profile"}
     )
-    
-    # 6. Cria coluna de perfil anterior
+
+    # Cria coluna de perfil anterior
     monthly_profiles["PreviousProfile"] = monthly_profiles.groupby("CustomerID")["Profile"].shift(1)
-    
-    # 7. Filtra migrações de Emergentes para VIP
+
+    # Filtra migrações de Emergentes para VIP
     migrations = monthly_profiles[
         (monthly_profiles["PreviousProfile"] == "Clientes Emergentes") &
         (monthly_profiles["Profile"] == "Clientes VIP")
     ]
-    
-    # 8. Conta número de migrações por mês
+
+    # Conta número de migrações por mês
     migrations_by_month = migrations.groupby("MonthReference")["CustomerID"].nunique().reset_index()
     migrations_by_month.columns = ["Month", "NumMigrations"]
     return migrations_by_month
 
-########################################
 
-def calc_retencao_rfv(df):
+def calc_transicoes_rfv(
+    df,
+    rfv_mensal=None,
+    profile_col="MigrationProfile",
+    rotulo_ausente="Sem compra",
+    customer_col="CustomerID",
+    month_col="MonthReference"
+):
     """
-    Calcula a matriz de retenção percentual média por perfil RFV ao longo dos meses.
+    Conta as transições entre todos os perfis RFV em cada par de meses
+    consecutivos do calendário, em uma única passada sobre as linhas cliente ×
+    mês com os perfis codificados como inteiros (np.bincount sobre mês ×
+    origem × destino). Um mês sem nenhuma compra na base também entra, com
+    todos os clientes em rotulo_ausente.
+
+    Além dos K perfis há o estado rotulo_ausente (cliente sem compra no mês),
+    para que saídas (perfil → ausente) e retornos ou entradas (ausente →
+    perfil) também apareçam. Em cada par, a população é a dos clientes com
+    primeira compra até o mês de destino.
+
+    Parâmetros:
+    - df: DataFrame com os dados de transações
+    - rfv_mensal: resultado de calc_rfv_mensal(df), se já calculado
+    - profile_col: coluna do perfil mensal ("MigrationProfile" ou "Profile")
+    - rotulo_ausente: nome do estado sem compra
+    - customer_col, month_col: colunas de cliente e mês
 
     Retorna:
-    - retencao_rfv: DataFrame com os meses como linhas e os perfis RFV como colunas
+    - DataFrame com Month (mês de destino), FromProfile, ToProfile e Customers,
+      com a matriz (K+1) × (K+1) completa de cada mês, inclusive as contagens zero
     """
+    if rfv_mensal is None:
+        rfv_mensal = calc_rfv_mensal(df)
 
-    df["MonthReference"] = df["InvoiceDate"].dt.to_period("M")
+    clientes, _ = pd.factorize(rfv_mensal[customer_col])
+    # Meses do calendário completo entre o primeiro e o último: um mês sem
+    # nenhuma compra ainda é um passo, para que todo par seja de meses adjacentes
+    periodos = pd.PeriodIndex(rfv_mensal[month_col], freq="M")
+    if len(periodos):
+        rotulos_meses = pd.period_range(periodos.min(), periodos.max(), freq="M")
+        meses = periodos.asi8 - rotulos_meses[0].ordinal
+    else:
+        rotulos_meses, meses = periodos, np.array([], dtype=np.int64)
+    perfis, rotulos_perfis = pd.factorize(rfv_mensal[profile_col], sort=True)
+    ausente = len(rotulos_perfis)
+    n_estados, n_pares = ausente + 1, max(len(rotulos_meses) - 1, 0)
 
-    def calcular_rfv_mensal(df):
-        resultados = []
+    ordem = np.lexsort((meses, clientes))
+    clientes, meses, perfis = clientes[ordem], meses[ordem], perfis[ordem]
 
-        for mes in sorted(df["MonthReference"].unique()):
-            df_mes = df[df["MonthReference"] == mes]
+    # O cliente comprou também no mês seguinte? (próxima linha, mesmo cliente, mês + 1)
+    consecutivo = np.r_[(clientes[1:] == clientes[:-1]) & (meses[1:] == meses[:-1] + 1), False]
+    proximo = np.r_[perfis[1:], ausente]
 
-            rfv = (
-                df_mes.groupby("CustomerID")
-                .agg({
-                    "InvoiceDate": lambda x: (df_mes["InvoiceDate"].max() - x.max()).days,
-                    "InvoiceNo": "nunique",
-                    "TotalPrice": "sum"
-                })
-                .reset_index()
-            )
-            rfv.columns = ["CustomerID", "Recency", "Frequency", "Value"]
-            rfv["RScore"] = pd.qcut(rfv["Recency"], 3, labels=[3, 2, 1]).astype(int)
+    # Saídas: toda linha antes do último mês vai para o perfil seguinte ou para ausente
+    sai = meses < n_pares
+    destino = np.where(consecutivo, proximo, ausente)
+    # Entradas: linha sem compra do cliente no mês anterior vem de ausente
+    entra = ~np.r_[False, consecutivo[:-1]] & (meses > 0)
 
-            def get_fscore(f):
-                return 3 if f > 5 else 2 if f >= 3 else 1
+    codigos = np.concatenate([
+        (meses[sai] * n_estados + perfis[sai]) * n_estados + destino[sai],
+        ((meses[entra] - 1) * n_estados + ausente) * n_estados + perfis[entra],
+    ])
+    contagens = np.bincount(codigos, minlength=n_pares * n_estados ** 2).reshape(n_pares, n_estados, n_estados)
 
-            rfv["FScore"] = rfv["Frequency"].apply(get_fscore)
-            rfv["VScore"] = pd.qcut(rfv["Value"], 3, labels=[1, 2, 3]).astype(int)
-            rfv["RFV"] = rfv["RScore"] + rfv["FScore"] + rfv["VScore"]
+    # Ausente → ausente: clientes já vistos até o mês de destino que não entraram em nenhuma célula
+    primeiro_mes = meses[np.diff(clientes, prepend=-1) != 0]
+    populacao = np.cumsum(np.bincount(primeiro_mes, minlength=len(rotulos_meses)))[1:]
+    contagens[:, ausente, ausente] = populacao - contagens.sum(axis=(1, 2))
 
-            def segmentar(score):
-                return "Clientes VIP" if score >= 8 else "Clientes Emergentes" if score >= 5 else "Clientes Churn"
+    estados = np.array(list(rotulos_perfis) + [rotulo_ausente], dtype=object)
+    return pd.DataFrame({
+        "Month": np.repeat(np.asarray(rotulos_meses[1:]), n_estados ** 2),
+        "FromProfile": np.tile(np.repeat(estados, n_estados), n_pares),
+        "ToProfile": np.tile(estados, n_pares * n_estados),
+        "Customers": contagens.ravel(),
+    })
 
-            rfv["Profile"] = rfv["RFV"].apply(segmentar)
-            rfv["MonthReference"] = mes
-            resultados.append(rfv[["CustomerID", "MonthReference", "Profile"]])
 
-        return pd.concat(resultados, ignore_index=True)
+def projetar_perfis(transicoes, janela=3):
+    """
+    Projeta o tamanho de cada perfil no próximo mês como uma cadeia de Markov:
+    as probabilidades de transição vêm das contagens dos últimos `janela`
+    meses e são aplicadas à distribuição do último mês.
 
-    rfv = calcular_rfv_mensal(df)
-    df_rfv = df.merge(rfv, on=["CustomerID", "MonthReference"], how="left")
+    Parâmetros:
+    - transicoes: DataFrame retornado por calc_transicoes_rfv
+    - janela: número de meses mais recentes usados para estimar as probabilidades
 
-    presenca = (
-        df_rfv.groupby(["CustomerID", "MonthReference"])["Profile"]
-        .first()
-        .reset_index()
-    )
+    Retorna:
+    - DataFrame com Profile, Customers (último mês) e Projected (próximo mês),
+      vazio se não houver nenhum par de meses (base com um único mês)
+    """
+    if transicoes.empty:
+        return pd.DataFrame({
+            "Profile": pd.Series(dtype=object),
+            "Customers": pd.Series(dtype=np.int64),
+            "Projected": pd.Series(dtype=np.float64),
+        })
 
-    clientes_mes = (
-        presenca
-        .assign(Presente=1)
-        .pivot_table(index="CustomerID", columns="MonthReference", values="Presente", fill_value=0)
-    )
+    estados = pd.unique(transicoes["ToProfile"])
+    n_estados = len(estados)
+    contagens = transicoes["Customers"].to_numpy().reshape(-1, n_estados, n_estados)
+
+    atual = contagens[-1].sum(axis=0)
+    soma = contagens[-janela:].sum(axis=0)
+    saidas = soma.sum(axis=1, keepdims=True)
+
+    # Estado sem nenhuma saída observada na janela permanece onde está
+    probabilidades = np.divide(soma, saidas, out=np.eye(n_estados), where=saidas > 0)
 
-    perfil_inicial = (
-        presenca
-        .sort_values(by="MonthReference")
-        .groupby("CustomerID")["Profile"]
-        .first()
-        .reset_index()
+    return pd.DataFrame({
+        "Profile": estados,
+        "Customers": atual,
+        "Projected": atual @ probabilidades,
+    })
+
+########################################
+
+def matriz_coortes(
+    rfv_mensal,
+    por="perfil",
+    relativo=False,
+    proporcao=True,
+    customer_col="CustomerID",
+    month_col="MonthReference",
+    profile_col="Profile"
+):
+    """
+    Matriz de retenção por coorte a partir das linhas cliente × mês, sem montar
+    a matriz densa clientes × meses: clientes, meses e coortes viram códigos
+    inteiros e as presenças são contadas com np.bincount em um array de
+    coortes × meses (memória proporcional às linhas de entrada e ao resultado).
+
+    Parâmetros:
+    - rfv_mensal: DataFrame retornado por calc_rfv_mensal (uma linha por cliente × mês)
+    - por: "perfil" (perfil RFV no primeiro mês do cliente) ou "mes" (mês da primeira compra)
+    - relativo: se True, as colunas são meses desde o início da coorte (0, 1, 2...)
+      em vez dos meses do calendário
+    - proporcao: se True, divide as contagens pelo tamanho da coorte; senão, retorna
+      o número de clientes presentes
+    - customer_col, month_col, profile_col: colunas de cliente, mês e perfil
+
+    Retorna:
+    - DataFrame com uma linha por coorte (índice "Cohort") e uma coluna por mês
+    """
+    if por not in ("perfil", "mes"):
+        raise ValueError(f"Coorte inválida: {por}. Use 'perfil' ou 'mes'")
+
+    clientes, rotulos_clientes = pd.factorize(rfv_mensal[customer_col])
+    meses, rotulos_meses = pd.factorize(rfv_mensal[month_col], sort=True)
+    n_clientes, n_meses = len(rotulos_clientes), len(rotulos_meses)
+
+    # Primeira linha de cada cliente: ordena por (cliente, mês) e pega o início de cada bloco
+    ordem = np.lexsort((meses, clientes))
+    inicio = ordem[np.diff(clientes[ordem], prepend=-1) != 0]
+    primeiro_mes = np.empty(n_clientes, dtype=np.int64)
+    primeiro_mes[clientes[inicio]] = meses[inicio]
+
+    if por == "perfil":
+        perfis, rotulos_coortes = pd.factorize(rfv_mensal[profile_col], sort=True)
+        coorte = np.empty(n_clientes, dtype=np.int64)
+        coorte[clientes[inicio]] = perfis[inicio]
+    else:
+        coorte, rotulos_coortes = primeiro_mes, rotulos_meses
+    n_coortes = len(rotulos_coortes)
+
+    # Coluna de cada presença: mês do calendário ou distância até o primeiro mês
+    colunas = meses - primeiro_mes[clientes] if relativo else meses
+    presentes = np.bincount(
+        coorte[clientes] * n_meses + colunas, minlength=n_coortes * n_meses
+    ).reshape(n_coortes, n_meses)
+
+    # Só entram as coortes com algum cliente (ex: perfis que nunca são o inicial)
+    tamanhos = np.bincount(coorte, minlength=n_coortes)
+    mantidas = tamanhos > 0
+    presentes = presentes[mantidas]
+    if proporcao:
+        presentes = presentes / tamanhos[mantidas, None]
+
+    return pd.DataFrame(
+        presentes,
+        index=pd.Index(rotulos_coortes[mantidas], name="Cohort"),
+        columns=pd.RangeIndex(n_meses) if relativo else pd.Index(rotulos_meses, name=month_col)
     )
 
-    clientes_mes = clientes_mes.merge(perfil_inicial, on="CustomerID", how="left")
 
-    perfil = clientes_mes["Profile"]
-    clientes_mes = clientes_mes.drop(columns="Profile")
+def calc_retencao_rfv(df, rfv_mensal=None):
+    """
+    Calcula a matriz de retenção percentual média por perfil RFV ao longo dos meses:
+    para cada perfil inicial, a fração dos clientes presentes em cada mês
+    (ver matriz_coortes).
 
-    # Mantém somente colunas numéricas
-    clientes_mes = clientes_mes.select_dtypes(include=["number"])
+    Parâmetros:
+    - df: DataFrame com os dados de transações
+    - rfv_mensal: resultado de calc_rfv_mensal(df), se já calculado
+
+    Retorna:
+    - retencao_rfv: DataFrame com os meses como linhas e os perfis RFV como colunas
+    """
+    if rfv_mensal is None:
+        rfv_mensal = calc_rfv_mensal(df)
 
-    retencao_rfv = clientes_mes.groupby(perfil).mean().T
+    retencao_rfv = matriz_coortes(rfv_mensal, por="perfil").T
     retencao_rfv.index.name = "Month"
+    retencao_rfv.columns.name = "Profile"
     retencao_rfv.reset_index(inplace=True)
 
     return retencao_rfv
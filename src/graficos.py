@@ -0,0 +1,240 @@
+import argparse
+import os
+import re
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from src.cache_graficos import grafico_em_cache, renderizar
+from src.plots import VEGA_LITE, plot_barh, plot_barv, plot_pizza
+
+# Diretórios padrão do projeto
+DIRETORIO_DASHBOARDS = os.path.join("data", "dashboards")
+DIRETORIO_RELATORIO = "relatorio"
+
+# Registro dos gráficos do dashboard: usado pelo app e pelo relatório em lote.
+# Cada gráfico declara a função de plot, o CSV de data/dashboards de que
+# depende, como o app o exibe ("imagem": PNG renderizado no servidor;
+# "vega": especificação Vega-Lite desenhada no navegador) e os parâmetros do plot.
+GRAFICOS = {
+    "Média de produtos por transação": {
+        "funcao": plot_barh, "dados": "transacoes", "modo": "vega",
+        "parametros": dict(
+            col_categoria="Country", col_valor="Media",
+            titulo="Média de produtos por transação"
+        ),
+    },
+    "Média de preços por país": {
+        "funcao": plot_barh, "dados": "media_preco", "modo": "vega",
+        "parametros": dict(
+            col_categoria="Country", col_valor="UnitPrice",
+            simbolo="£", titulo="Média de preços por país"
+        ),
+    },
+    "Produto mais vendido em cada país": {
+        "funcao": plot_barh, "dados": "top_vendas_pais", "modo": "vega",
+        "parametros": dict(
+            col_categoria="Country", col_valor="Quantity",
+            col_rotulo="Description", decimais=False,
+            titulo="Produto mais vendido em cada país"
+        ),
+    },
+    "Produtos com maior margem de lucro por país": {
+        "funcao": plot_barh, "dados": "margem_lucro", "modo": "vega",
+        "parametros": dict(
+            col_categoria="Country", col_valor="UnitPrice",
+            col_rotulo="Description", simbolo="£",
+            titulo="Produtos com maior margem de lucro por país"
+        ),
+    },
+    "Produtos mais comprados por clientes VIP": {
+        "funcao": plot_barh, "dados": "preferencias", "modo": "vega",
+        "parametros": dict(
+            col_categoria="Description", col_valor="Quantity",
+            decimais=False, max_categorias=50,
+            titulo="Produtos mais comprados por clientes VIP"
+        ),
+    },
+    "Distribuição de clientes por perfil RFV": {
+        "funcao": plot_pizza, "dados": "proporcao_rfv", "modo": "imagem",
+        "parametros": dict(
+            col_categoria="Profile", col_valor="Proportion",
+            exibir_percentual=True,
+            titulo="Distribuição de clientes por perfil RFV"
+        ),
+    },
+    "Faturamento Total Gerado por Perfil RFV": {
+        "funcao": plot_pizza, "dados": "faturamento_rfv", "modo": "imagem",
+        "parametros": dict(
+            col_categoria="Profile", col_valor="Value",
+            simbolo="£", milhar=True, exibir_percentual=False,
+            titulo="Faturamento Total Gerado por Perfil RFV"
+        ),
+    },
+    "Evolução mensal de migração de clientes Emergentes para VIP": {
+        "funcao": plot_barv, "dados": "migracoes_rfv", "modo": "vega",
+        "parametros": dict(
+            col_categoria="Month", col_valor="NumMigrations",
+            usar_cores=False, decimais=False, log=True,
+            ordenar_por_valor=False,
+            titulo="Evolução mensal de migração de clientes Emergentes para VIP"
+        ),
+    },
+    "Retenção mensal de Clientes Churn": {
+        "funcao": plot_barv, "dados": "retencao_rfv", "modo": "vega",
+        "parametros": dict(
+            col_categoria="Month", col_valor="Clientes Churn",
+            exibir_percentual=True, ordenar_por_valor=False,
+            usar_cores=False,
+            titulo="Retenção mensal de Clientes Churn"
+        ),
+    },
+    "Retenção mensal de Clientes Emergentes": {
+        "funcao": plot_barv, "dados": "retencao_rfv", "modo": "vega",
+        "parametros": dict(
+            col_categoria="Month", col_valor="Clientes Emergentes",
+            exibir_percentual=True, ordenar_por_valor=False,
+            usar_cores=False,
+            titulo="Retenção mensal de Clientes Emergentes"
+        ),
+    },
+    "Retenção mensal de Clientes VIP": {
+        "funcao": plot_barv, "dados": "retencao_rfv", "modo": "vega",
+        "parametros": dict(
+            col_categoria="Month", col_valor="Clientes VIP",
+            exibir_percentual=True, ordenar_por_valor=False,
+            usar_cores=False,
+            titulo="Retenção mensal de Clientes VIP"
+        ),
+    },
+}
+
+########################################
+
+def especificacao_vega(nome, df):
+    """
+    Retorna a especificação Vega-Lite do gráfico, com os mesmos parâmetros
+    e rótulos da versão em imagem.
+    """
+    definicao = GRAFICOS[nome]
+    return VEGA_LITE[definicao["funcao"]](df, **definicao["parametros"])
+
+
+def nome_arquivo(nome):
+    """
+    Converte o nome de um gráfico em nome de arquivo (sem acentos, minúsculo, com "_").
+    """
+    ascii_ = unicodedata.normalize("NFKD", nome).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "_", ascii_.lower()).strip("_")
+
+
+def renderizar_grafico(nome, diretorio_dados, diretorio_saida, formato="png", dpi=200, diretorio_cache=None):
+    """
+    Renderiza um gráfico do registro e grava a imagem no diretório de saída.
+    Executada em cada processo do relatório em lote (backend Agg, sem display).
+
+    Parâmetros:
+    - nome: chave do gráfico em GRAFICOS
+    - diretorio_dados: diretório dos CSVs de dashboards
+    - diretorio_saida: destino das imagens
+    - formato: "png", "svg" ou "pdf"
+    - dpi: resolução usada no savefig
+    - diretorio_cache: se informado, usa o cache de imagens em disco (grafico_em_cache)
+
+    Retorna:
+    - tupla (caminho do arquivo gerado, segundos gastos)
+    """
+    inicio = time.perf_counter()
+    definicao = GRAFICOS[nome]
+    df = pd.read_csv(os.path.join(diretorio_dados, f"{definicao['dados']}.csv"))
+
+    if diretorio_cache:
+        imagem = grafico_em_cache(
+            definicao["funcao"], df, formato, dpi, diretorio=diretorio_cache, **definicao["parametros"]
+        )
+    else:
+        imagem = renderizar(definicao["funcao"], df, formato, dpi, **definicao["parametros"])
+
+    caminho = os.path.join(diretorio_saida, f"{nome_arquivo(nome)}.{formato}")
+    with open(caminho, "wb") as f:
+        f.write(imagem)
+    return caminho, time.perf_counter() - inicio
+
+
+def renderizar_todos(
+    diretorio_dados=DIRETORIO_DASHBOARDS,
+    diretorio_saida=DIRETORIO_RELATORIO,
+    formato="png",
+    dpi=200,
+    nomes=None,
+    n_processos=None,
+    diretorio_cache=None,
+    log=print
+):
+    """
+    Renderiza os gráficos do registro em paralelo, um processo por gráfico.
+
+    Parâmetros:
+    - diretorio_dados: diretório dos CSVs de dashboards
+    - diretorio_saida: destino das imagens (criado se não existir)
+    - formato: "png", "svg" ou "pdf"
+    - dpi: resolução usada no savefig
+    - nomes: gráficos a renderizar (default: todos)
+    - n_processos: número de processos (default: número de núcleos)
+    - diretorio_cache: se informado, reaproveita imagens do cache em disco
+    - log: função chamada com uma linha de texto por gráfico (None para silenciar)
+
+    Retorna:
+    - dicionário nome do gráfico -> (caminho do arquivo, segundos gastos)
+    """
+    nomes = list(GRAFICOS) if nomes is None else list(nomes)
+    desconhecidos = set(nomes) - set(GRAFICOS)
+    if desconhecidos:
+        raise ValueError(f"Gráficos desconhecidos: {sorted(desconhecidos)}")
+    os.makedirs(diretorio_saida, exist_ok=True)
+
+    inicio = time.perf_counter()
+    resultados = {}
+    n_processos = min(n_processos or os.cpu_count() or 1, max(len(nomes), 1))
+    with ProcessPoolExecutor(max_workers=n_processos) as executor:
+        futuros = {
+            executor.submit(
+                renderizar_grafico, nome, diretorio_dados, diretorio_saida, formato, dpi, diretorio_cache
+            ): nome
+            for nome in nomes
+        }
+        for futuro in as_completed(futuros):
+            nome = futuros[futuro]
+            resultados[nome] = futuro.result()
+            if log:
+                caminho, segundos = resultados[nome]
+                log(f"{segundos:6.2f}s  {caminho}")
+
+    if log:
+        log(f"{len(resultados)} gráficos em {time.perf_counter() - inicio:.2f}s")
+    return {nome: resultados[nome] for nome in nomes}
+
+########################################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Renderiza todos os gráficos do dashboard em arquivos.")
+    parser.add_argument("graficos", nargs="*", help="nomes dos gráficos (default: todos)")
+    parser.add_argument("--dados", default=DIRETORIO_DASHBOARDS, help="diretório dos CSVs de dashboards")
+    parser.add_argument("--saida", default=DIRETORIO_RELATORIO, help="diretório das imagens geradas")
+    parser.add_argument("--formato", choices=["png", "svg", "pdf"], default="png")
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("-j", "--processos", type=int, default=0, help="processos em paralelo (0: todos os núcleos)")
+    parser.add_argument("--cache", default=None, help="diretório do cache de imagens (default: sem cache)")
+    args = parser.parse_args(argv)
+
+    renderizar_todos(
+        args.dados, args.saida, args.formato, args.dpi,
+        nomes=args.graficos or None, n_processos=args.processos or None,
+        diretorio_cache=args.cache
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from src.cache import salvar_colunar
+
+# Diretório padrão do índice (gerado pelo pipeline junto com os CSVs de dashboards)
+DIRETORIO_INDICE = os.path.join("data", "dashboards", "indice_clientes")
+
+# Arquivo com o nome da versão em uso: o índice é gravado em um subdiretório
+# novo e só então este arquivo é trocado (os.replace), sem apagar a versão que
+# leitores ainda podem ter mapeada em memória
+ARQUIVO_VERSAO = "ATUAL"
+
+# IDs lidos como número viram "12347.0": o índice guarda e busca sempre "12347"
+SUFIXO_DECIMAL = re.compile(r"\.0$")
+
+########################################
+
+def normalizar_id(valor):
+    """
+    Converte um CustomerID (número, texto ou "12347.0") para a forma usada no índice.
+    """
+    return SUFIXO_DECIMAL.sub("", str(valor).strip())
+
+
+def construir_indice(rfv, rfv_mensal=None, customer_col="CustomerID"):
+    """
+    Monta o índice de consulta por cliente: a tabela RFV ordenada por
+    CustomerID e o histórico mensal agrupado na mesma ordem, de forma que o
+    histórico de cada cliente é um intervalo contínuo [Inicio, Fim).
+
+    Parâmetros:
+    - rfv: DataFrame retornado por criar_rfv
+    - rfv_mensal: DataFrame retornado por calc_rfv_mensal (None: índice sem histórico)
+    - customer_col: coluna de ID do cliente
+
+    Retorna:
+    - dicionário com "ids" (array ordenado de IDs normalizados), "clientes"
+      (RFV alinhado a ids, com Inicio e Fim) e "historico" (meses de todos os
+      clientes, sem a coluna de ID)
+    """
+    ids = np.array([normalizar_id(v) for v in rfv[customer_col].tolist()], dtype=str)
+    ordem = np.argsort(ids, kind="stable")
+    ids = ids[ordem]
+    clientes = rfv.drop(columns=customer_col).iloc[ordem].reset_index(drop=True)
+
+    if rfv_mensal is None:
+        rfv_mensal = pd.DataFrame({customer_col: pd.Series(dtype=str)})
+    ids_historico = np.array([normalizar_id(v) for v in rfv_mensal[customer_col].tolist()], dtype=str)
+    ordem = np.argsort(ids_historico, kind="stable")  # mantém a ordem dos meses de cada cliente
+    ids_historico = ids_historico[ordem]
+    historico = rfv_mensal.drop(columns=customer_col).iloc[ordem].reset_index(drop=True)
+
+    clientes["Inicio"] = np.searchsorted(ids_historico, ids, side="left")
+    clientes["Fim"] = np.searchsorted(ids_historico, ids, side="right")
+    return {"ids": ids, "clientes": clientes, "historico": historico}
+
+
+def versao_atual(diretorio=None):
+    """
+    Retorna o subdiretório da versão em uso do índice, ou None se não houver índice.
+    """
+    diretorio = diretorio or DIRETORIO_INDICE
+    try:
+        with open(os.path.join(diretorio, ARQUIVO_VERSAO), encoding="utf-8") as f:
+            versao = os.path.join(diretorio, f.read().strip())
+    except FileNotFoundError:
+        return None
+    return versao if os.path.exists(os.path.join(versao, "ids.npy")) else None
+
+
+def gravar_indice(indice, destino=None):
+    """
+    Grava o índice em disco: ids.npy e as tabelas clientes/ e historico/ no
+    formato colunar do cache (um .npy por coluna), prontos para mmap.
+
+    Cada gravação cria uma versão nova em um subdiretório e troca o arquivo
+    ATUAL de forma atômica: leitores abertos continuam na versão anterior, que
+    é apagada em seguida (no Windows, se ainda estiver mapeada pelo app, fica
+    no disco).
+
+    Parâmetros:
+    - indice: dicionário retornado por construir_indice
+    - destino: diretório do índice (default=DIRETORIO_INDICE)
+    """
+    destino = destino or DIRETORIO_INDICE
+    os.makedirs(destino, exist_ok=True)
+    anterior = versao_atual(destino)
+
+    versao = tempfile.mkdtemp(dir=destino, prefix="v-")
+    try:
+        np.save(os.path.join(versao, "ids.npy"), indice["ids"], allow_pickle=False)
+        salvar_colunar(indice["clientes"], os.path.join(versao, "clientes"))
+        salvar_colunar(indice["historico"], os.path.join(versao, "historico"))
+
+        ponteiro = os.path.join(destino, ARQUIVO_VERSAO)
+        with open(ponteiro + ".tmp", "w", encoding="utf-8") as f:
+            f.write(os.path.basename(versao))
+        os.replace(ponteiro + ".tmp", ponteiro)
+    except BaseException:
+        shutil.rmtree(versao, ignore_errors=True)
+        raise
+
+    # Só apaga a versão substituída: outras v-* podem ser de uma gravação
+    # concorrente ainda em andamento. Se ainda estiver mapeada (Windows), fica no disco
+    if anterior is not None and os.path.basename(anterior) != os.path.basename(versao):
+        shutil.rmtree(anterior, ignore_errors=True)
+
+########################################
+
+def abrir_colunas(diretorio):
+    """
+    Mapeia em memória as colunas de uma tabela gravada por salvar_colunar,
+    sem ler os dados. Retorna uma lista de (nome, valores, categorias, dtype).
+    """
+    with open(os.path.join(diretorio, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+
+    colunas = []
+    for coluna in meta["colunas"]:
+        valores = np.load(os.path.join(diretorio, coluna["arquivo"]), mmap_mode="r", allow_pickle=False)
+        categorias = np.array(coluna["categorias"], dtype=object) if "categorias" in coluna else None
+        dtype = coluna["dtype"] if coluna["tipo"] == "data" else None
+        colunas.append((coluna["nome"], valores, categorias, dtype))
+    return colunas
+
+
+def ler_linhas(colunas, inicio, fim):
+    """
+    Lê só as linhas [inicio, fim) das colunas abertas por abrir_colunas.
+    Retorna um dicionário nome -> array.
+    """
+    dados = {}
+    for nome, valores, categorias, dtype in colunas:
+        trecho = np.array(valores[inicio:fim])
+        if categorias is not None:
+            trecho = np.where(trecho >= 0, categorias[np.maximum(trecho, 0)], None)
+        elif dtype is not None:
+            trecho = trecho.view(dtype)
+        dados[nome] = trecho
+    return dados
+
+
+def abrir_indice(diretorio=None, versao=None):
+    """
+    Abre o índice de clientes mapeado em memória: nada é carregado no pandas
+    até uma consulta.
+
+    Parâmetros:
+    - diretorio: diretório do índice (default=DIRETORIO_INDICE)
+    - versao: subdiretório de uma versão, como retornado por versao_atual
+      (default: a versão em uso no diretório)
+
+    Retorna:
+    - dicionário com ids, clientes e historico, ou None se o índice não existir
+    """
+    versao = versao or versao_atual(diretorio)
+    if versao is None or not os.path.exists(os.path.join(versao, "ids.npy")):
+        return None
+    return {
+        "ids": np.load(os.path.join(versao, "ids.npy"), mmap_mode="r", allow_pickle=False),
+        "clientes": abrir_colunas(os.path.join(versao, "clientes")),
+        "historico": abrir_colunas(os.path.join(versao, "historico")),
+    }
+
+
+def buscar_cliente(indice, customer_id):
+    """
+    Busca um cliente por busca binária nos IDs ordenados e lê só a sua linha
+    do RFV e o seu intervalo do histórico mensal.
+
+    Parâmetros:
+    - indice: dicionário retornado por abrir_indice
+    - customer_id: ID do cliente (número ou texto)
+
+    Retorna:
+    - tupla (Series com o RFV do cliente, DataFrame com o histórico mensal),
+      ou None se o cliente não estiver no índice
+    """
+    chave = normalizar_id(customer_id)
+    ids = indice["ids"]
+    posicao = int(np.searchsorted(ids, chave))
+    if posicao == len(ids) or ids[posicao] != chave:
+        return None
+
+    cliente = {nome: valores[0] for nome, valores in ler_linhas(indice["clientes"], posicao, posicao + 1).items()}
+    historico = ler_linhas(indice["historico"], int(cliente.pop("Inicio")), int(cliente.pop("Fim")))
+    return pd.Series(cliente, dtype=object), pd.DataFrame(historico)
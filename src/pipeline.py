@@ -0,0 +1,352 @@
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from src.cache import carregar_colunar, chave_cache, garantir_cache
+from src.funcoes import (
+    calc_faturamento_rfv,
+    calc_margem_lucro,
+    calc_media_preco,
+    calc_migracoes_rfv,
+    calc_preferencias,
+    calc_proporcao_rfv,
+    calc_retencao_rfv,
+    calc_rfv_mensal,
+    calc_top_vendas_pais,
+    calc_transacoes,
+    calc_transicoes_rfv,
+    criar_rfv,
+    projetar_perfis,
+)
+from src.indice_clientes import construir_indice, gravar_indice
+from src.preprocessamento import carregar_dados_limpos, carregar_e_limpar
+
+# Caminhos padrão do projeto
+CAMINHO_BRUTO = os.path.join("data", "raw", "OnlineRetail.csv")
+DIRETORIO_SAIDA = os.path.join("data", "dashboards")
+ARQUIVO_MANIFESTO = "manifest.json"
+
+# Grafo de dependências: nó -> (função, nós de entrada, exportação)
+# A exportação é False (nó intermediário), True (grava <nó>.csv) ou uma função
+# gravar(resultado, destino) para formatos próprios, gravados em <nó>/.
+# O nó "limpo" (base tratada a partir do CSV bruto) é a raiz de todos os outros.
+NOS = {
+    "transacoes": (calc_transacoes, ["limpo"], True),
+    "media_preco": (calc_media_preco, ["limpo"], True),
+    "top_vendas_pais": (calc_top_vendas_pais, ["limpo"], True),
+    "margem_lucro": (calc_margem_lucro, ["limpo"], True),
+    "preferencias": (calc_preferencias, ["limpo"], True),
+    "rfv": (criar_rfv, ["limpo"], True),
+    "proporcao_rfv": (calc_proporcao_rfv, ["rfv"], True),
+    "faturamento_rfv": (calc_faturamento_rfv, ["rfv"], True),
+    "rfv_mensal": (calc_rfv_mensal, ["limpo"], False),
+    "migracoes_rfv": (calc_migracoes_rfv, ["limpo", "rfv_mensal"], True),
+    "retencao_rfv": (calc_retencao_rfv, ["limpo", "rfv_mensal"], True),
+    "transicoes_rfv": (calc_transicoes_rfv, ["limpo", "rfv_mensal"], True),
+    "projecao_rfv": (projetar_perfis, ["transicoes_rfv"], True),
+    "indice_clientes": (construir_indice, ["rfv", "rfv_mensal"], gravar_indice),
+}
+
+########################################
+
+def funcoes_chamadas(funcao):
+    """
+    Retorna a função e as funções do projeto que ela usa, direta ou
+    indiretamente: nomes globais do corpo (inclusive de funções aninhadas e
+    lambdas) que apontam para funções do mesmo módulo ou do pacote src.
+
+    Parâmetros:
+    - funcao: função de um nó do grafo
+
+    Retorna:
+    - dicionário "modulo.nome" -> função, incluindo a própria funcao
+    """
+    encontradas = {}
+    pendentes = [funcao]
+    while pendentes:
+        atual = pendentes.pop()
+        chave = f"{atual.__module__}.{atual.__qualname__}"
+        if chave in encontradas:
+            continue
+        encontradas[chave] = atual
+
+        codigos = [atual.__code__]
+        while codigos:
+            codigo = codigos.pop()
+            codigos.extend(c for c in codigo.co_consts if inspect.iscode(c))
+            for nome in codigo.co_names:
+                alvo = atual.__globals__.get(nome)
+                if inspect.isfunction(alvo) and (
+                    alvo.__module__ == funcao.__module__ or alvo.__module__.startswith("src.")
+                ):
+                    pendentes.append(alvo)
+    return encontradas
+
+
+def hash_codigo(funcao):
+    """
+    Hash do código-fonte da função e das funções auxiliares que ela chama
+    (ver funcoes_chamadas). Editar outra função do mesmo módulo, ou um
+    comentário fora delas, não muda o hash.
+
+    Parâmetros:
+    - funcao: função de um nó do grafo
+
+    Retorna:
+    - string hexadecimal com o hash do código
+    """
+    h = hashlib.blake2b(digest_size=20)
+    for chave, alvo in sorted(funcoes_chamadas(funcao).items()):
+        h.update(chave.encode())
+        h.update(inspect.getsource(alvo).encode())
+    return h.hexdigest()
+
+def calcular_assinaturas(caminho, k=1.5, nos=None):
+    """
+    Calcula a assinatura de cada nó sem executar nenhum cálculo. A assinatura
+    combina o código do nó com as assinaturas das suas entradas, então uma
+    mudança no CSV bruto ou na limpeza se propaga para todos os dependentes.
+
+    Parâmetros:
+    - caminho: CSV bruto
+    - k: multiplicador do IQR usado na limpeza
+    - nos: grafo de dependências (default=NOS)
+
+    Retorna:
+    - dicionário nó -> assinatura
+    """
+    nos = nos or NOS
+    assinaturas = {"limpo": chave_cache(caminho, carregar_e_limpar, {"k": k, "compacto": False})}
+
+    def assinar(nome):
+        if nome not in assinaturas:
+            funcao, entradas, exporta = nos[nome]
+            descricao = json.dumps({
+                "funcao": f"{funcao.__module__}.{funcao.__qualname__}",
+                "codigo": hash_codigo(funcao),
+                # Formatos próprios: o código que grava também entra na assinatura
+                "gravacao": hash_codigo(exporta) if callable(exporta) else exporta,
+                "entradas": [assinar(entrada) for entrada in entradas],
+            }, sort_keys=True)
+            assinaturas[nome] = hashlib.blake2b(descricao.encode(), digest_size=20).hexdigest()
+        return assinaturas[nome]
+
+    for nome in nos:
+        assinar(nome)
+    return assinaturas
+
+
+def ler_manifesto(diretorio):
+    caminho = os.path.join(diretorio, ARQUIVO_MANIFESTO)
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def gravar_manifesto(diretorio, manifesto):
+    caminho = os.path.join(diretorio, ARQUIVO_MANIFESTO)
+    with open(caminho + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, indent=2, sort_keys=True)
+    os.replace(caminho + ".tmp", caminho)
+
+########################################
+
+def destino_no(diretorio_saida, nome, nos=None):
+    """
+    Caminho gravado por um nó exportado: <nó>.csv ou o diretório <nó>/.
+    """
+    nos = nos or NOS
+    return os.path.join(diretorio_saida, nome if callable(nos[nome][2]) else f"{nome}.csv")
+
+
+def nos_necessarios(alvos, nos=None):
+    """
+    Retorna os alvos e todos os nós dos quais eles dependem (exceto "limpo").
+    """
+    nos = nos or NOS
+    necessarios = set()
+    pendentes = list(alvos)
+    while pendentes:
+        nome = pendentes.pop()
+        if nome in necessarios or nome == "limpo":
+            continue
+        necessarios.add(nome)
+        pendentes.extend(nos[nome][1])
+    return necessarios
+
+
+def executar_no(nome, entradas, diretorio_limpo, nos=None):
+    """
+    Calcula um nó a partir das suas entradas. Usada pelos processos do
+    construir paralelo: a base tratada é mapeada do cache colunar (um único
+    arquivo compartilhado por todos os processos) em vez de ser enviada pelo
+    processo principal, com as colunas de texto como categorias sobre os
+    códigos mapeados; as demais entradas são resultados pequenos já prontos.
+
+    Parâmetros:
+    - nome: nó a calcular
+    - entradas: dicionário nó -> DataFrame com as entradas já calculadas
+    - diretorio_limpo: diretório do cache colunar da base tratada
+    - nos: grafo de dependências (default=NOS)
+
+    Retorna:
+    - tupla (DataFrame do nó, segundos gastos)
+    """
+    nos = nos or NOS
+    funcao, nomes, _ = nos[nome]
+    inicio = time.perf_counter()
+    argumentos = [
+        carregar_colunar(diretorio_limpo, texto_como_categoria=True) if entrada == "limpo" else entradas[entrada]
+        for entrada in nomes
+    ]
+    return funcao(*argumentos), time.perf_counter() - inicio
+
+
+def construir(
+    caminho=CAMINHO_BRUTO,
+    diretorio_saida=DIRETORIO_SAIDA,
+    alvos=None,
+    forcar=False,
+    k=1.5,
+    usar_cache=True,
+    diretorio_cache=None,
+    n_processos=1,
+    nos=None,
+    log=print
+):
+    """
+    Gera os CSVs e o índice de clientes de data/dashboards, reconstruindo
+    somente os nós cujas entradas ou código mudaram desde a última execução
+    (registrada no manifest.json do diretório de saída). Só são calculados os nós
+    desatualizados e as entradas de que eles precisam: se nada mudou, nem a
+    base tratada é carregada.
+
+    Com n_processos > 1, os nós independentes rodam ao mesmo tempo em um pool
+    de processos, cada nó é enviado assim que suas entradas ficam prontas e o
+    tempo total tende ao do caminho mais lento do grafo.
+
+    Parâmetros:
+    - caminho: CSV bruto
+    - diretorio_saida: destino dos CSVs, do índice de clientes e do manifesto
+    - alvos: nós a gerar (default: todos os exportados)
+    - forcar: se True, reconstrói todos os alvos
+    - k: multiplicador do IQR usado na limpeza
+    - usar_cache: se True, a base tratada vem do cache colunar (obrigatório com n_processos > 1)
+    - diretorio_cache: raiz do cache da base tratada
+    - n_processos: número de processos (None: número de núcleos)
+    - nos: grafo de dependências (default=NOS)
+    - log: função chamada com uma linha de texto por nó (None para silenciar)
+
+    Retorna:
+    - dicionário nó -> "reconstruído" ou "atualizado"
+    """
+    nos = nos or NOS
+    n_processos = n_processos or os.cpu_count() or 1
+    if alvos is None:
+        alvos = [nome for nome, (_, _, exporta) in nos.items() if exporta]
+    desconhecidos = set(alvos) - set(nos)
+    if desconhecidos:
+        raise ValueError(f"Nós desconhecidos: {sorted(desconhecidos)}")
+    if n_processos > 1 and not usar_cache:
+        raise ValueError("O construir paralelo lê a base tratada do cache: use usar_cache=True")
+
+    os.makedirs(diretorio_saida, exist_ok=True)
+    assinaturas = calcular_assinaturas(caminho, k, nos)
+    manifesto = ler_manifesto(diretorio_saida)
+    ordem = list(nos).index
+
+    # Separa os nós exportados entre atualizados e a reconstruir
+    status = {}
+    for nome in nos_necessarios(alvos, nos):
+        if nos[nome][2]:
+            destino = destino_no(diretorio_saida, nome, nos)
+            atualizado = manifesto.get(nome) == assinaturas[nome] and os.path.exists(destino)
+            status[nome] = "atualizado" if atualizado and not forcar else "reconstruído"
+
+    reconstruir = [nome for nome, s in status.items() if s == "reconstruído"]
+    calcular = sorted(nos_necessarios(reconstruir, nos), key=ordem)
+
+    def concluir(nome, resultado, segundos):
+        if status.get(nome) != "reconstruído":
+            return
+        destino = destino_no(diretorio_saida, nome, nos)
+        gravar = nos[nome][2]
+        if callable(gravar):
+            gravar(resultado, destino)
+        else:
+            resultado.to_csv(destino + ".tmp", index=False, encoding="utf-8-sig")
+            os.replace(destino + ".tmp", destino)
+
+        # Grava o manifesto a cada nó, para que uma falha no meio não perca o progresso
+        manifesto[nome] = assinaturas[nome]
+        gravar_manifesto(diretorio_saida, manifesto)
+        if log:
+            log(f"{nome}: reconstruído em {segundos:.2f}s")
+
+    if n_processos == 1 or len(calcular) <= 1:
+        valores = {}
+        for nome in calcular:
+            funcao, entradas, _ = nos[nome]
+            inicio = time.perf_counter()
+            if "limpo" in entradas and "limpo" not in valores:
+                valores["limpo"] = carregar_dados_limpos(
+                    caminho, k=k, usar_cache=usar_cache, diretorio_cache=diretorio_cache
+                )
+            valores[nome] = funcao(*[valores[entrada] for entrada in entradas])
+            concluir(nome, valores[nome], time.perf_counter() - inicio)
+    elif calcular:
+        # Garante que o cache da base tratada exista antes de abrir os processos,
+        # sem carregá-la no processo principal (cada processo faz o mmap)
+        diretorio_limpo = garantir_cache(caminho, carregar_e_limpar, diretorio_cache, k=k, compacto=False)
+
+        valores = {}
+        pendentes = list(calcular)
+        em_execucao = {}
+        with ProcessPoolExecutor(max_workers=min(n_processos, len(calcular))) as executor:
+            while pendentes or em_execucao:
+                # Envia todos os nós cujas entradas já foram calculadas
+                for nome in [n for n in pendentes if all(e == "limpo" or e in valores for e in nos[n][1])]:
+                    entradas = {e: valores[e] for e in nos[nome][1] if e != "limpo"}
+                    futuro = executor.submit(executar_no, nome, entradas, diretorio_limpo, nos)
+                    em_execucao[futuro] = nome
+                    pendentes.remove(nome)
+
+                prontos, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+                for futuro in prontos:
+                    nome = em_execucao.pop(futuro)
+                    valores[nome], segundos = futuro.result()
+                    concluir(nome, valores[nome], segundos)
+
+    if log:
+        atualizados = sorted(nome for nome, s in status.items() if s == "atualizado")
+        if atualizados:
+            log(f"Sem mudanças: {', '.join(atualizados)}")
+    return dict(sorted(status.items(), key=lambda item: ordem(item[0])))
+
+########################################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera os CSVs de data/dashboards a partir do CSV bruto.")
+    parser.add_argument("alvos", nargs="*", help="nós a gerar (default: todos)")
+    parser.add_argument("--bruto", default=CAMINHO_BRUTO, help="CSV bruto")
+    parser.add_argument("--saida", default=DIRETORIO_SAIDA, help="diretório dos CSVs gerados")
+    parser.add_argument("--forcar", action="store_true", help="reconstrói mesmo sem mudanças")
+    parser.add_argument("--k", type=float, default=1.5, help="multiplicador do IQR na limpeza")
+    parser.add_argument("--sem-cache", action="store_true", help="não usa o cache da base tratada")
+    parser.add_argument("-j", "--processos", type=int, default=1, help="processos em paralelo (0: todos os núcleos)")
+    args = parser.parse_args(argv)
+
+    construir(
+        args.bruto, args.saida, alvos=args.alvos or None,
+        forcar=args.forcar, k=args.k, usar_cache=not args.sem_cache,
+        n_processos=args.processos or None
+    )
+
+
+if __name__ == "__main__":
+    main()
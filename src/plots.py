@@ -1,5 +1,10 @@
-import matplotlib.pyplot as plt
+import matplotlib
+import numpy as np
+import pandas as pd
 from decimal import Decimal, ROUND_DOWN
+from matplotlib.colors import to_hex
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
 
 #######################################
 
@@ -42,6 +47,280 @@ def format_milhar(valor, decimais=True, simbolo=""):
 
 ######################################
 
+def formatar_valor(valor, decimais=True, milhar=False, simbolo="", percentual=False):
+    """
+    Formata um único valor para rótulo de gráfico (versão de referência, com Decimal).
+
+    Parâmetros:
+    - valor: número a ser formatado
+    - decimais: se False, arredonda sem casas decimais
+    - milhar: se True, abrevia com k / kk (ver format_milhar)
+    - simbolo: string prefixada aos valores (ex: "R$", "$", etc.)
+    - percentual: se True, formata como porcentagem (ignora milhar e simbolo)
+
+    Retorna:
+    - string com o valor formatado
+    """
+    if percentual:
+        return f"{valor:,.2%}" if decimais else f"{valor:,.0%}"
+    if milhar:
+        return format_milhar(valor, decimais=decimais, simbolo=simbolo)
+
+    base = Decimal(valor)
+    if decimais:
+        base = base.quantize(Decimal("0.01"), rounding=ROUND_DOWN)
+        return f"{simbolo}{base:,.2f}".replace(",", ".")
+    return f"{simbolo}{int(round(base + Decimal('1e-6'))):,}".replace(",", ".")
+
+
+def formatar_valores(valores, decimais=True, milhar=False, simbolo="", percentual=False):
+    """
+    Formata um array inteiro de valores com o mesmo resultado de formatar_valor,
+    mas calculando truncamento, arredondamento e sufixos de forma vetorizada.
+
+    O truncamento em centavos usa a representação binária exata de cada valor
+    (mantissa inteira deslocada pelo expoente), igual ao Decimal. Valores
+    não finitos, muito grandes ou a menos de 1e-9 de um empate no
+    arredondamento sem decimais usam formatar_valor.
+
+    Parâmetros:
+    - valores: array, lista ou Series numérica
+    - decimais, milhar, simbolo, percentual: como em formatar_valor
+
+    Retorna:
+    - lista de strings, na mesma ordem dos valores
+    """
+    originais = np.asarray(valores)
+    if percentual:
+        formato = "{:,.2%}" if decimais else "{:,.0%}"
+        return [formato.format(v) for v in originais.tolist()]
+
+    v = originais.astype(np.float64)
+    escala = np.ones(len(v), dtype=np.int64)
+    sufixos = np.full(len(v), "", dtype=object)
+    if milhar:
+        escala[v >= 1_000] = 1_000
+        sufixos[v >= 1_000] = "k"
+        escala[v >= 1_000_000] = 1_000_000
+        sufixos[v >= 1_000_000] = "kk"
+
+    # Fora do intervalo exato da aritmética inteira, usa a versão com Decimal
+    referencia = ~np.isfinite(v) | (np.abs(v) >= 2.0 ** 52)
+    v = np.where(referencia, 0.0, v)
+
+    if decimais:
+        # |v| = m * 2^(e-53) com m inteiro: centavos truncados = (m * 100 >> (53 - e)) // escala
+        fracao, expoente = np.frexp(np.abs(v))
+        mantissa = np.ldexp(fracao, 53).astype(np.int64)
+        centavos = ((mantissa * 100) >> np.minimum(53 - expoente, 63)) // escala
+        negativo = np.signbit(v)  # ROUND_DOWN mantém o sinal: -0.001 → "-0.00"
+        textos = [
+            f"{simbolo}{'-' if n else ''}{c // 100:,}.{c % 100:02d}{sufixo}"
+            for n, c, sufixo in zip(negativo.tolist(), centavos.tolist(), sufixos.tolist())
+        ]
+    else:
+        # round(x + 1e-6) do Decimal só difere de floor(x + 0.5 + 1e-6) num empate exato
+        deslocado = v / escala + 1e-6 + 0.5
+        inteiros = np.floor(deslocado)
+        distancia = np.abs(deslocado - np.rint(deslocado))
+        referencia |= distancia < 1e-9 * np.maximum(1.0, np.abs(deslocado))
+        textos = [
+            f"{simbolo}{i:,}{sufixo}"
+            for i, sufixo in zip(inteiros.astype(np.int64).tolist(), sufixos.tolist())
+        ]
+
+    textos = [texto.replace(",", ".") for texto in textos]
+    for i in np.flatnonzero(referencia):
+        textos[i] = formatar_valor(originais[i].item(), decimais=decimais, milhar=milhar, simbolo=simbolo)
+    return textos
+
+######################################
+
+def criar_eixo(ax, figsize):
+    """
+    Retorna (figura, eixo) para desenhar: o eixo recebido ou uma Figure nova,
+    criada sem o pyplot (sem estado global, liberada quando sai de escopo).
+    """
+    if ax is not None:
+        return ax.figure, ax
+    fig = Figure(figsize=figsize)
+    return fig, fig.add_subplot()
+
+def limitar_categorias(transacoes, col_valor, col_categoria, max_categorias, col_rotulo=None, rotulo_outros="Outros"):
+    """
+    Mantém só as max_categorias linhas de maior valor, escolhidas por seleção
+    parcial (np.argpartition, sem ordenar tudo), e soma as demais em uma linha extra.
+
+    Parâmetros:
+    - transacoes: DataFrame com os dados
+    - col_valor: coluna numérica
+    - col_categoria: coluna das categorias
+    - max_categorias: número máximo de barras individuais (None = sem limite)
+    - col_rotulo: coluna auxiliar do rótulo, se houver
+    - rotulo_outros: nome da barra que agrupa o restante
+
+    Retorna:
+    - tupla (linhas mantidas na ordem original, DataFrame de uma linha com o
+      total das demais ou None se nada foi agrupado)
+    """
+    if max_categorias is None or len(transacoes) <= max_categorias:
+        return transacoes, None
+
+    valores = transacoes[col_valor].to_numpy(dtype=np.float64)
+    chave = np.where(np.isnan(valores), -np.inf, valores)
+    mantidas = np.sort(np.argpartition(-chave, max_categorias - 1)[:max_categorias])
+
+    resto = np.ones(len(valores), dtype=bool)
+    resto[mantidas] = False
+    n_resto = int(resto.sum())
+    outros = {col_categoria: f"{rotulo_outros} ({n_resto})", col_valor: np.nansum(valores[resto])}
+    if col_rotulo:
+        outros.update({col_rotulo: rotulo_outros, col_categoria: f"{n_resto}"})
+    return transacoes.iloc[mantidas], pd.DataFrame([outros])
+
+
+def dados_barh(
+    transacoes, col_valor, col_categoria, col_rotulo=None, cor="steelblue",
+    exibir_percentual=False, ordenar_por_valor=True, decimais=True, milhar=False,
+    simbolo="", max_categorias=None, rotulo_outros="Outros"
+):
+    """
+    Prepara as barras de plot_barh (usado também por vega_barh, para que a
+    imagem e a especificação tenham os mesmos rótulos).
+
+    Retorna:
+    - DataFrame com label, valor e cor de cada barra, da base para o topo
+    """
+    transacoes, outros = limitar_categorias(
+        transacoes, col_valor, col_categoria, max_categorias, col_rotulo, rotulo_outros
+    )
+
+    if ordenar_por_valor:
+        transacoes = transacoes.sort_values(by=col_valor, ascending=True)
+    else:
+        transacoes = transacoes.sort_values(by=col_categoria, ascending=True)
+
+    # "Outros" fica sempre na base do gráfico
+    cores = [cor] * len(transacoes)
+    if outros is not None:
+        transacoes = pd.concat([outros, transacoes], ignore_index=True)
+        cores = ["lightgray"] + cores
+
+    rotulos = pd.Series(formatar_valores(
+        transacoes[col_valor], decimais=decimais, milhar=milhar,
+        simbolo=simbolo, percentual=exibir_percentual
+    ), index=transacoes.index)
+
+    if col_rotulo:
+        labels = (
+            transacoes[col_rotulo].astype(str) + " (" + transacoes[col_categoria].astype(str)
+            + " - " + rotulos + ")"
+        )
+    else:
+        labels = transacoes[col_categoria].astype(str) + " (" + rotulos + ")"
+
+    return pd.DataFrame({
+        "label": labels.tolist(),
+        "valor": transacoes[col_valor].to_numpy(),
+        "cor": cores,
+    })
+
+
+def dados_barv(
+    transacoes, col_valor, col_categoria, col_rotulo=None, exibir_percentual=False,
+    ordenar_por_valor=True, usar_cores=True, decimais=True, milhar=False,
+    simbolo="", max_categorias=None, rotulo_outros="Outros"
+):
+    """
+    Prepara as barras de plot_barv (usado também por vega_barv).
+
+    Retorna:
+    - DataFrame com label, valor, rotulo (texto acima da barra), categoria e
+      cor de cada barra, da esquerda para a direita
+    """
+    # Agrupa os dados por categoria ao exibir percentuais
+    if exibir_percentual:
+        transacoes = transacoes.groupby(col_categoria, as_index=False)[col_valor].sum()
+        transacoes["label"] = transacoes[col_categoria]
+    elif col_rotulo:
+        transacoes = transacoes.assign(label=(
+            transacoes[col_rotulo].astype(str) + " (" + transacoes[col_categoria].astype(str) + ")"
+        ))
+    else:
+        transacoes = transacoes.assign(label=transacoes[col_categoria])
+
+    transacoes, outros = limitar_categorias(
+        transacoes, col_valor, col_categoria, max_categorias, col_rotulo, rotulo_outros
+    )
+
+    if ordenar_por_valor:
+        transacoes = transacoes.sort_values(by=col_valor, ascending=False)
+    else:
+        transacoes = transacoes.sort_values(by=col_categoria)
+
+    # "Outros" fica sempre no fim do gráfico
+    if outros is not None:
+        if col_rotulo and not exibir_percentual:
+            outros["label"] = outros[col_rotulo] + " (" + outros[col_categoria] + ")"
+        else:
+            outros["label"] = outros[col_categoria]
+        transacoes = pd.concat([transacoes, outros], ignore_index=True)
+
+    if usar_cores:
+        cmap = matplotlib.colormaps["Set2"]
+        cores = {cat: to_hex(cmap(i)) for i, cat in enumerate(transacoes[col_categoria].unique())}
+        cores_barras = transacoes[col_categoria].map(cores).tolist()
+    else:
+        cores_barras = ["steelblue"] * len(transacoes)
+        if outros is not None:
+            cores_barras[-1] = "lightgray"
+
+    return pd.DataFrame({
+        "label": transacoes["label"].astype(str).tolist(),
+        "valor": transacoes[col_valor].to_numpy(),
+        "rotulo": formatar_valores(
+            transacoes[col_valor], decimais=decimais, milhar=milhar,
+            simbolo=simbolo, percentual=exibir_percentual
+        ),
+        "categoria": transacoes[col_categoria].tolist(),
+        "cor": cores_barras,
+    })
+
+
+def dados_pizza(
+    transacoes, col_valor, col_categoria, exibir_percentual=True, usar_cores=True,
+    decimais=True, ordenar_por_valor=True, milhar=False, simbolo=""
+):
+    """
+    Prepara as fatias de plot_pizza (usado também por vega_pizza).
+
+    Retorna:
+    - DataFrame com label, valor e cor de cada fatia, em sentido horário
+    """
+    if ordenar_por_valor:
+        transacoes = transacoes.sort_values(by=col_valor, ascending=False)
+    else:
+        transacoes = transacoes.sort_values(by=col_categoria)
+
+    rotulos = formatar_valores(
+        transacoes[col_valor], decimais=decimais, milhar=milhar,
+        simbolo=simbolo, percentual=exibir_percentual
+    )
+
+    if usar_cores:
+        cmap = matplotlib.colormaps["Set2"]
+        cores = [to_hex(cmap(i % cmap.N)) for i in range(len(transacoes))]
+    else:
+        cores = ["steelblue"] * len(transacoes)
+
+    return pd.DataFrame({
+        "label": [f"{cat} ({rotulo})" for cat, rotulo in zip(transacoes[col_categoria], rotulos)],
+        "valor": transacoes[col_valor].to_numpy(),
+        "cor": cores,
+    })
+
+######################################
+
 def plot_barh(
     transacoes,
     col_valor,
@@ -55,7 +334,10 @@ def plot_barh(
     contorno_barras=True,
     decimais=True,
     milhar=False,
-    simbolo=""
+    simbolo="",
+    max_categorias=None,
+    rotulo_outros="Outros",
+    ax=None
 ):
     """
     Plota um gráfico de barras horizontais com:
@@ -77,46 +359,34 @@ def plot_barh(
     - decimais: se False, remove casas decimais dos rótulos
     - milhar: se True, formata os valores como k / kk
     - simbolo: string prefixada aos valores (ex: "R$")
+    - max_categorias: se informado, desenha só as N maiores barras e soma o
+      restante em uma barra rotulo_outros (cinza, na base); a altura da figura
+      passa a acompanhar o número de barras
+    - rotulo_outros: nome da barra que agrupa o restante
+    - ax: Axes onde desenhar (opcional); se omitido, cria uma Figure própria
+
+    Retorna:
+    - Figure do matplotlib com o gráfico
     """
     
-    if ordenar_por_valor:
-        transacoes = transacoes.sort_values(by=col_valor, ascending=True)
-    else:
-        transacoes = transacoes.sort_values(by=col_categoria, ascending=True)
-
-    if exibir_percentual:
-        format_valor = lambda v: f"{v:,.0%}" if not decimais else f"{v:,.2%}"
-    else:
-        if milhar:
-            format_valor = lambda v: format_milhar(v, decimais=decimais, simbolo=simbolo)
-        else:
-            def format_valor(v):
-                base = Decimal(v)
-                if decimais:
-                    base = base.quantize(Decimal("0.01"), rounding=ROUND_DOWN)
-                    return f"{simbolo}{base:,.2f}".replace(",", ".")
-                else:
-                    return f"{simbolo}{int(round(base + Decimal('1e-6'))):,}".replace(",", ".")
-
-    if col_rotulo:
-        transacoes["label"] = transacoes.apply(
-            lambda row: f"{row[col_rotulo]} ({row[col_categoria]} - {format_valor(row[col_valor])})", axis=1
-        )
-    else:
-        transacoes["label"] = transacoes.apply(
-            lambda row: f"{row[col_categoria]} ({format_valor(row[col_valor])})", axis=1
-        )
-
-    transacoes = transacoes.set_index("label")
+    dados = dados_barh(
+        transacoes, col_valor, col_categoria, col_rotulo, cor, exibir_percentual,
+        ordenar_por_valor, decimais, milhar, simbolo, max_categorias, rotulo_outros
+    )
 
-    plt.figure(figsize=(10, 8))
-    transacoes[col_valor].plot(
-        kind="barh",
-        color=cor,
+    altura = 8 if max_categorias is None else max(4, 0.3 * len(dados) + 1.5)
+    fig, ax = criar_eixo(ax, (10, altura))
+    posicoes = np.arange(len(dados))
+    ax.barh(
+        posicoes,
+        dados["valor"].to_numpy(),
+        height=0.5,
+        color=dados["cor"].tolist(),
         edgecolor="black" if contorno_barras else None
     )
+    ax.set_yticks(posicoes, dados["label"].tolist())
+    ax.set_ylim(-0.5, len(dados) - 0.5)
 
-    ax = plt.gca()
     for spine in ax.spines.values():
         spine.set_visible(False)
 
@@ -128,16 +398,17 @@ def plot_barh(
     ax.xaxis.set_tick_params(which='minor', bottom=False)
 
     if log:
-        plt.xscale("log")
+        ax.set_xscale("log")
 
     if not titulo:
         titulo = f"{col_valor} por {col_categoria}"
 
-    plt.title(titulo, fontsize=14)
-    plt.xlabel("")
-    plt.ylabel("")
-    plt.grid(False)
-    plt.tight_layout()
+    ax.set_title(titulo, fontsize=14)
+    ax.set_xlabel("")
+    ax.set_ylabel("")
+    ax.grid(False)
+    fig.tight_layout()
+    return fig
 
 
 
@@ -157,85 +428,64 @@ def plot_barv(
     usar_cores=True,
     decimais=True,
     milhar=False,
-    simbolo=""
+    simbolo="",
+    max_categorias=None,
+    rotulo_outros="Outros",
+    ax=None
 ):
     """
     Plota um gráfico de barras verticais com:
     - rótulos personalizados acima das barras
     - suporte a múltiplas cores por categoria
     - formato monetário com símbolo e abreviação visual (k, kk)
+
+    Aceita os mesmos parâmetros de plot_barh (exceto cor), além de compacto
+    (barras sem espaçamento) e usar_cores (uma cor por categoria, com legenda).
+    Com max_categorias, a barra rotulo_outros fica no fim e a largura da
+    figura acompanha o número de barras. Com ax, desenha no Axes recebido;
+    retorna a Figure com o gráfico.
     """
    
-    # Agrupa os dados por categoria ao exibir percentuais
-    if exibir_percentual:
-        agrupado = transacoes.groupby(col_categoria, as_index=False)[col_valor].sum()
-        agrupado[col_valor] = agrupado[col_valor]
-        agrupado["label"] = agrupado[col_categoria]
-        transacoes = agrupado
-        format_valor = lambda v: f"{v:,.0%}" if not decimais else f"{v:,.2%}"
-    else:
-        if milhar:
-            format_valor = lambda v: format_milhar(v, decimais=decimais, simbolo=simbolo)
-        else:
-            def format_valor(v):
-                base = Decimal(v)
-                if decimais:
-                    base = base.quantize(Decimal("0.01"), rounding=ROUND_DOWN)
-                    return f"{simbolo}{base:,.2f}".replace(",", ".")
-                else:
-                    return f"{simbolo}{int(round(base + Decimal('1e-6'))):,}".replace(",", ".")
-
-        if col_rotulo:
-            transacoes["label"] = transacoes.apply(
-                lambda row: f"{row[col_rotulo]} ({row[col_categoria]})", axis=1
-            )
-        else:
-            transacoes["label"] = transacoes[col_categoria]
-
-    if ordenar_por_valor:
-        transacoes = transacoes.sort_values(by=col_valor, ascending=False)
-    else:
-        transacoes = transacoes.sort_values(by=col_categoria)
-
-    if usar_cores:
-        categorias = transacoes[col_categoria].unique()
-        cmap = plt.get_cmap("Set2")
-        cores = {cat: cmap(i) for i, cat in enumerate(categorias)}
-        cores_barras = transacoes[col_categoria].map(cores)
-    else:
-        cores_barras = "steelblue"
-
-    transacoes = transacoes.set_index("label")
+    dados = dados_barv(
+        transacoes, col_valor, col_categoria, col_rotulo, exibir_percentual,
+        ordenar_por_valor, usar_cores, decimais, milhar, simbolo, max_categorias, rotulo_outros
+    )
 
-    plt.figure(figsize=(12, 6))
-    ax = transacoes[col_valor].plot(
-        kind="bar",
-        color=cores_barras,
-        edgecolor="black" if contorno_barras else None,
-        width=0.8 if not compacto else 1.0
+    largura_figura = 12 if max_categorias is None else max(6, 0.5 * len(dados) + 2)
+    fig, ax = criar_eixo(ax, (largura_figura, 6))
+    largura = 0.8 if not compacto else 1.0
+    posicoes = np.arange(len(dados))
+    ax.bar(
+        posicoes,
+        dados["valor"].to_numpy(),
+        width=largura,
+        color=dados["cor"].tolist(),
+        edgecolor="black" if contorno_barras else None
     )
+    ax.set_xticks(posicoes, dados["label"].tolist(), rotation=0, ha="center")
+    ax.set_xlim(-0.25 - largura / 2, len(dados) - 0.75 + largura / 2)
 
     for spine in ax.spines.values():
         spine.set_visible(False)
-    ax.set_xticklabels(ax.get_xticklabels(), rotation=0, ha="center")
     ax.tick_params(axis='y', which='both', left=False, labelleft=False)
 
-    for i, v in enumerate(transacoes[col_valor]):
-        ax.text(i, v, format_valor(v), ha="center", va="bottom", fontsize=10)
+    for i, (v, rotulo) in enumerate(zip(dados["valor"], dados["rotulo"])):
+        ax.text(i, v, rotulo, ha="center", va="bottom", fontsize=10)
 
     if usar_cores:
         legendas = [
-            plt.Line2D([0], [0], marker='s', color='none', label=cat, markerfacecolor=cor, markersize=10)
-            for cat, cor in cores.items()
+            Line2D([0], [0], marker='s', color='none', label=cat, markerfacecolor=cor, markersize=10)
+            for cat, cor in dict(zip(dados["categoria"], dados["cor"])).items()
         ]
         ax.legend(handles=legendas, loc='upper right', title=col_categoria)
 
     if not titulo:
         titulo = f"{col_valor} por {col_categoria}"
-    plt.title(titulo, fontsize=14)
-    plt.xlabel("")
-    plt.ylabel("")
-    plt.tight_layout()
+    ax.set_title(titulo, fontsize=14)
+    ax.set_xlabel("")
+    ax.set_ylabel("")
+    fig.tight_layout()
+    return fig
 
 
 ######################################
@@ -250,7 +500,8 @@ def plot_pizza(
     decimais=True,
     ordenar_por_valor=True,
     milhar=False,
-    simbolo=""
+    simbolo="",
+    ax=None
 ):
     """
     Plota um gráfico de pizza com:
@@ -268,45 +519,22 @@ def plot_pizza(
     - decimais: se False, remove casas decimais dos rótulos
     - milhar: se True, formata os valores como k / kk
     - simbolo: string prefixada aos valores (ex: "R$")
+    - ax: Axes onde desenhar (opcional); se omitido, cria uma Figure própria
+
+    Retorna:
+    - Figure do matplotlib com o gráfico
     """    
     
-    if ordenar_por_valor:
-        transacoes = transacoes.sort_values(by=col_valor, ascending=False)
-    else:
-        transacoes = transacoes.sort_values(by=col_categoria)
-
-    valores = transacoes[col_valor].values
-    categorias = transacoes[col_categoria].values
-
-    if exibir_percentual:
-        proporcoes = valores
-        format_valor = lambda v: f"{v:,.0%}" if not decimais else f"{v:,.2%}"
-        labels = [f"{cat} ({format_valor(p)})" for cat, p in zip(categorias, proporcoes)]
-    else:
-        if milhar:
-            labels = [f"{cat} ({format_milhar(v, decimais=decimais, simbolo=simbolo)})"
-                      for cat, v in zip(categorias, valores)]
-        else:
-            def format_valor(v):
-                base = Decimal(v)
-                if decimais:
-                    base = base.quantize(Decimal("0.01"), rounding=ROUND_DOWN)
-                    return f"{simbolo}{base:,.2f}".replace(",", ".")
-                else:
-                    return f"{simbolo}{int(round(base + Decimal('1e-6'))):,}".replace(",", ".")
-            labels = [f"{cat} ({format_valor(v)})" for cat, v in zip(categorias, valores)]
-
-    if usar_cores:
-        cmap = plt.get_cmap("Set2")
-        cores = [cmap(i % cmap.N) for i in range(len(categorias))]
-    else:
-        cores = ["steelblue"] * len(categorias)
+    dados = dados_pizza(
+        transacoes, col_valor, col_categoria, exibir_percentual,
+        usar_cores, decimais, ordenar_por_valor, milhar, simbolo
+    )
 
-    plt.figure(figsize=(8, 8))
-    plt.pie(
-        valores,
-        labels=labels,
-        colors=cores,
+    fig, ax = criar_eixo(ax, (8, 8))
+    ax.pie(
+        dados["valor"].to_numpy(),
+        labels=dados["label"].tolist(),
+        colors=dados["cor"].tolist(),
         startangle=90,
         counterclock=False,
         wedgeprops={"edgecolor": "black"}
@@ -315,5 +543,145 @@ def plot_pizza(
     if not titulo:
         titulo = f"{col_valor} por {col_categoria}"
 
-    plt.title(titulo, fontsize=14)
-    plt.tight_layout()
\ No newline at end of file
+    ax.set_title(titulo, fontsize=14)
+    fig.tight_layout()
+    return fig
+
+
+######################################
+# Saída Vega-Lite: o navegador desenha o gráfico, sem renderização no servidor
+
+def vega_barh(
+    transacoes,
+    col_valor,
+    col_categoria,
+    titulo=None,
+    log=True,
+    contorno_barras=True,
+    ax=None,
+    **parametros
+):
+    """
+    Mesmo gráfico de plot_barh, como especificação Vega-Lite (dicionário
+    serializável em JSON, ex: para st.vega_lite_chart). Aceita os mesmos
+    parâmetros de plot_barh; ax é ignorado.
+    """
+    dados = dados_barh(transacoes, col_valor, col_categoria, **parametros)
+    return {
+        "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
+        "title": titulo or f"{col_valor} por {col_categoria}",
+        # matplotlib desenha de baixo para cima; no Vega-Lite a primeira linha fica no topo
+        "data": {"values": dados.iloc[::-1].to_dict("records")},
+        "height": {"step": 20},
+        "mark": {
+            "type": "bar", "height": {"band": 0.5},
+            "stroke": "black" if contorno_barras else None,
+        },
+        "encoding": {
+            "y": {"field": "label", "type": "nominal", "sort": None, "title": None},
+            "x": {
+                "field": "valor", "type": "quantitative", "axis": None,
+                "scale": {"type": "log" if log else "linear"},
+            },
+            "color": {"field": "cor", "type": "nominal", "scale": None},
+            "tooltip": [{"field": "label", "type": "nominal"}],
+        },
+    }
+
+
+def vega_barv(
+    transacoes,
+    col_valor,
+    col_categoria,
+    titulo=None,
+    log=True,
+    compacto=False,
+    contorno_barras=True,
+    usar_cores=True,
+    ax=None,
+    **parametros
+):
+    """
+    Mesmo gráfico de plot_barv, como especificação Vega-Lite. Aceita os
+    mesmos parâmetros de plot_barv; ax e log são ignorados.
+    """
+    dados = dados_barv(transacoes, col_valor, col_categoria, usar_cores=usar_cores, **parametros)
+
+    if usar_cores:
+        # Legenda por categoria, com as mesmas cores da versão matplotlib
+        paleta = dict(zip(dados["categoria"], dados["cor"]))
+        cor = {
+            "field": "categoria", "type": "nominal", "title": col_categoria,
+            "scale": {"domain": list(paleta), "range": list(paleta.values())},
+        }
+    else:
+        cor = {"field": "cor", "type": "nominal", "scale": None}
+
+    return {
+        "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
+        "title": titulo or f"{col_valor} por {col_categoria}",
+        "data": {"values": dados.to_dict("records")},
+        "width": {"step": 60},
+        "encoding": {
+            "x": {"field": "label", "type": "nominal", "sort": None, "title": None, "axis": {"labelAngle": 0}},
+            # Eixo linear, como em plot_barv (que também ignora log): barras zero continuam visíveis
+            "y": {"field": "valor", "type": "quantitative", "axis": None},
+        },
+        "layer": [
+            {
+                "mark": {
+                    "type": "bar", "width": {"band": 1.0 if compacto else 0.8},
+                    "stroke": "black" if contorno_barras else None,
+                },
+                "encoding": {"color": cor},
+            },
+            {
+                "mark": {"type": "text", "baseline": "bottom", "dy": -2},
+                "encoding": {"text": {"field": "rotulo", "type": "nominal"}},
+            },
+        ],
+    }
+
+
+def vega_pizza(
+    transacoes,
+    col_valor,
+    col_categoria,
+    titulo=None,
+    ax=None,
+    **parametros
+):
+    """
+    Mesmo gráfico de plot_pizza, como especificação Vega-Lite. Aceita os
+    mesmos parâmetros de plot_pizza; ax é ignorado.
+    """
+    dados = dados_pizza(transacoes, col_valor, col_categoria, **parametros)
+    dados["ordem"] = np.arange(len(dados))
+    return {
+        "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
+        "title": titulo or f"{col_valor} por {col_categoria}",
+        "data": {"values": dados.to_dict("records")},
+        "encoding": {
+            # Fatias a partir do topo, em sentido horário, como em plot_pizza
+            "theta": {"field": "valor", "type": "quantitative", "stack": True},
+            "order": {"field": "ordem", "type": "quantitative"},
+        },
+        "layer": [
+            {
+                "mark": {"type": "arc", "outerRadius": 140, "stroke": "black"},
+                "encoding": {"color": {"field": "cor", "type": "nominal", "scale": None}},
+            },
+            {
+                "mark": {"type": "text", "radius": 175},
+                "encoding": {"text": {"field": "label", "type": "nominal"}},
+            },
+        ],
+    }
+
+
+# Versão Vega-Lite de cada função de plot (mesmos parâmetros)
+VEGA_LITE = {
+    plot_barh: vega_barh,
+    plot_barv: vega_barv,
+    plot_pizza: vega_pizza,
+}
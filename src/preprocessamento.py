@@ -1,11 +1,128 @@
 import pandas as pd
 import numpy as np
+from pandas.api.types import union_categoricals
+
+from src.cache import carregar_com_cache
+from src.funcoes import media_ponderada_por_linha
+
+# Tipos usados na leitura em blocos: numéricos já nascem tipados e colunas
+# repetitivas viram categorias, evitando uma string Python por linha
+TIPOS_COLUNAS = {
+    "InvoiceNo": str,
+    "StockCode": "category",
+    "Description": str,
+    "Quantity": np.int64,
+    "InvoiceDate": str,
+    "UnitPrice": np.float64,
+    "CustomerID": str,
+    "Country": "category",
+}
 
 def carregar_dados(caminho):
     df = pd.read_csv(caminho, encoding="ISO-8859-1", dtype=str, low_memory=False)
     return df
 
 
+def carregar_dados_em_blocos(caminho, tamanho_bloco=500_000, tipos=None):
+    """
+    Lê o CSV bruto em blocos de tamanho limitado, já com os tipos corretos.
+
+    Parâmetros:
+        caminho (str): Caminho do arquivo CSV bruto.
+        tamanho_bloco (int): Número máximo de linhas por bloco (default=500_000).
+        tipos (dict): Tipos por coluna (default=TIPOS_COLUNAS).
+
+    Retorna:
+        Iterator[DataFrame]: Blocos tipados, um de cada vez.
+    """
+    leitor = pd.read_csv(
+        caminho,
+        encoding="ISO-8859-1",
+        dtype=tipos or TIPOS_COLUNAS,
+        chunksize=tamanho_bloco,
+    )
+    with leitor:
+        for bloco in leitor:
+            yield bloco
+
+
+def filtrar_transacoes_validas(df):
+    """
+    Aplica os filtros de limpeza do notebook: remove linhas sem cliente,
+    país não especificado e quantidades ou preços não positivos.
+
+    Parâmetros:
+        df (DataFrame): DataFrame (ou bloco) com Quantity e UnitPrice numéricos.
+
+    Retorna:
+        DataFrame: Somente as transações válidas.
+    """
+    filtro = (
+        df["CustomerID"].notna()
+        & (df["Country"] != "Unspecified")
+        & (df["Quantity"] > 0)
+        & (df["UnitPrice"] > 0)
+    )
+    return df[filtro]
+
+
+def limpar_em_blocos(caminho, tamanho_bloco=500_000, compacto=False, k=None, casas_decimais=None):
+    """
+    Pipeline de limpeza em memória constante: lê, filtra e corrige tipos bloco a bloco.
+
+    Com k informado, os outliers são removidos com a mesma regra de
+    limpar_dados (primeiro Quantity, depois UnitPrice, com os quartis de
+    UnitPrice calculados só sobre as linhas que passaram no filtro de
+    Quantity). Os limites saem de uma única leitura prévia do arquivo (ver
+    limites_iqr_encadeados_em_blocos) e são aplicados com uma máscara
+    combinada na leitura que gera os blocos: o arquivo é lido duas vezes.
+
+    Parâmetros:
+        caminho (str): Caminho do arquivo CSV bruto.
+        tamanho_bloco (int): Número máximo de linhas por bloco.
+        compacto (bool): Repassado para corrigir_tipos_e_datas.
+        k (float): Multiplicador do IQR; None (padrão) não remove outliers.
+        casas_decimais (dict | int): Arredondamento do esboço de quantis. Com o
+            padrão (None) os limites são exatos, mas a memória do esboço NÃO é
+            limitada: cresce com o número de pares (Quantity, UnitPrice)
+            distintos. Use 2 (centavos) para limitá-la.
+
+    Retorna:
+        Iterator[DataFrame]: Blocos limpos no formato de corrigir_tipos_e_datas.
+    """
+    limites = {}
+    if k is not None:
+        validos = (filtrar_transacoes_validas(bloco) for bloco in carregar_dados_em_blocos(caminho, tamanho_bloco))
+        limites = limites_iqr_encadeados_em_blocos(validos, ["Quantity", "UnitPrice"], k=k, casas_decimais=casas_decimais)
+
+    for bloco in carregar_dados_em_blocos(caminho, tamanho_bloco):
+        bloco = filtrar_por_limites(filtrar_transacoes_validas(bloco), limites)
+        yield corrigir_tipos_e_datas(bloco, compacto=compacto)
+
+
+def concatenar_blocos(blocos):
+    """
+    Junta blocos em um único DataFrame, unificando as categorias de cada coluna
+    categórica (um concat simples voltaria essas colunas para object).
+
+    Parâmetros:
+        blocos (Iterable[DataFrame]): Blocos com as mesmas colunas.
+
+    Retorna:
+        DataFrame: Todos os blocos concatenados.
+    """
+    blocos = list(blocos)
+    if not blocos:
+        return pd.DataFrame()
+
+    for coluna in blocos[0].columns:
+        if isinstance(blocos[0][coluna].dtype, pd.CategoricalDtype):
+            categorias = union_categoricals([b[coluna] for b in blocos]).categories
+            blocos = [b.assign(**{coluna: b[coluna].cat.set_categories(categorias)}) for b in blocos]
+
+    return pd.concat(blocos, ignore_index=True)
+
+
 def remover_outliers_iqr(df, coluna, k=1.5):
     """
     Remove outliers de uma coluna numérica com base na regra do IQR (Intervalo Interquartil).
@@ -25,61 +142,333 @@ def remover_outliers_iqr(df, coluna, k=1.5):
     return df[filtro]
 
 
-def corrigir_tipos_e_datas(df):
+def limites_iqr(df, colunas, k=1.5):
+    """
+    Calcula os limites da regra do IQR de várias colunas de uma vez.
+
+    Parâmetros:
+        df (DataFrame): DataFrame original.
+        colunas (list): Colunas numéricas a serem avaliadas.
+        k (float): Multiplicador do IQR para definir os limites (default=1.5).
+
+    Retorna:
+        dict: {coluna: (limite_inferior, limite_superior)}
+    """
+    quartis = df[colunas].quantile([0.25, 0.75])
+    limites = {}
+    for coluna in colunas:
+        Q1, Q3 = quartis.loc[0.25, coluna], quartis.loc[0.75, coluna]
+        IQR = Q3 - Q1
+        limites[coluna] = (Q1 - k * IQR, Q3 + k * IQR)
+    return limites
+
+
+def filtrar_por_limites(df, limites):
+    """
+    Mantém somente as linhas dentro dos limites de todas as colunas (máscara única).
+
+    Parâmetros:
+        df (DataFrame): DataFrame (ou bloco) a ser filtrado.
+        limites (dict): {coluna: (limite_inferior, limite_superior)}
+
+    Retorna:
+        DataFrame: Linhas dentro de todos os limites.
+    """
+    filtro = np.ones(len(df), dtype=bool)
+    for coluna, (inferior, superior) in limites.items():
+        filtro &= ((df[coluna] >= inferior) & (df[coluna] <= superior)).to_numpy()
+    return df[filtro]
+
+
+def remover_outliers_iqr_multiplo(df, colunas, k=1.5):
+    """
+    Remove outliers de várias colunas com uma única passada: todos os limites são
+    calculados sobre a mesma base e aplicados com uma máscara combinada.
+
+    Diferente de chamar remover_outliers_iqr coluna a coluna, os quartis da
+    segunda coluna não dependem do filtro aplicado à primeira.
+
+    Parâmetros:
+        df (DataFrame): DataFrame original.
+        colunas (list): Colunas numéricas a serem filtradas.
+        k (float): Multiplicador do IQR para definir os limites (default=1.5).
+
+    Retorna:
+        DataFrame: DataFrame sem os outliers de nenhuma das colunas.
+    """
+    return filtrar_por_limites(df, limites_iqr(df, colunas, k=k))
+
+
+def esboco_quantis(serie, casas_decimais=None):
+    """
+    Resume uma coluna numérica em um esboço de quantis combinável: a contagem de
+    cada valor distinto. Esboços de blocos diferentes são somados com
+    combinar_esbocos e dão os mesmos quantis da coluna inteira.
+
+    O esboço é um histograma exato: seu tamanho é o número de valores
+    distintos da coluna, que sem arredondamento pode crescer até o número de
+    linhas. Com casas_decimais, fica limitado à faixa de valores dividida pela
+    resolução (ex: preços em centavos), e os quantis passam a ser os dos
+    valores arredondados.
+
+    Parâmetros:
+        serie (Series): Valores numéricos (nulos são ignorados).
+        casas_decimais (int): Se informado, arredonda os valores antes de contar,
+            limitando o tamanho do esboço (ex: 2 para preços).
+
+    Retorna:
+        Series: Contagem por valor, ordenada pelo valor.
+    """
+    serie = serie.dropna()
+    if casas_decimais is not None:
+        serie = serie.round(casas_decimais)
+    return serie.value_counts(sort=False).sort_index()
+
+
+def combinar_esbocos(esboco, outro):
+    """Soma dois esboços gerados por esboco_quantis."""
+    if esboco is None:
+        return outro
+    return esboco.add(outro, fill_value=0).astype(np.int64)
+
+
+def quantil_do_esboco(esboco, q):
+    """
+    Calcula o quantil q de um esboço com interpolação linear (mesma regra do
+    Series.quantile do pandas).
+
+    Parâmetros:
+        esboco (Series): Contagem por valor, ordenada pelo valor.
+        q (float): Quantil desejado, entre 0 e 1.
+
+    Retorna:
+        float: Valor do quantil.
+    """
+    if esboco.empty:
+        return np.nan
+    valores = esboco.index.to_numpy(dtype=np.float64)
+    acumulado = np.cumsum(esboco.to_numpy())
+    posicao = (acumulado[-1] - 1) * q
+    abaixo, acima = np.searchsorted(acumulado, [np.floor(posicao), np.ceil(posicao)], side="right")
+    return valores[abaixo] + (posicao - np.floor(posicao)) * (valores[acima] - valores[abaixo])
+
+
+def limites_iqr_em_blocos(blocos, colunas, k=1.5, casas_decimais=None):
+    """
+    Calcula os limites do IQR de várias colunas em uma única leitura dos blocos,
+    sem manter a tabela inteira em memória (só um esboço por coluna, ver
+    esboco_quantis). Todas as colunas usam a mesma base, como em limites_iqr.
+
+    Parâmetros:
+        blocos (Iterable[DataFrame]): Blocos da base (ex: limpar_em_blocos).
+        colunas (list): Colunas numéricas a serem avaliadas.
+        k (float): Multiplicador do IQR para definir os limites (default=1.5).
+        casas_decimais (dict | int): Arredondamento do esboço, geral ou por coluna.
+
+    Retorna:
+        dict: {coluna: (limite_inferior, limite_superior)}
+    """
+    if not isinstance(casas_decimais, dict):
+        casas_decimais = {coluna: casas_decimais for coluna in colunas}
+
+    esbocos = dict.fromkeys(colunas)
+    for bloco in blocos:
+        for coluna in colunas:
+            esboco = esboco_quantis(bloco[coluna], casas_decimais.get(coluna))
+            esbocos[coluna] = combinar_esbocos(esbocos[coluna], esboco)
+
+    limites = {}
+    for coluna, esboco in esbocos.items():
+        Q1, Q3 = quantil_do_esboco(esboco, 0.25), quantil_do_esboco(esboco, 0.75)
+        IQR = Q3 - Q1
+        limites[coluna] = (Q1 - k * IQR, Q3 + k * IQR)
+    return limites
+
+
+def limites_iqr_encadeados_em_blocos(blocos, colunas, k=1.5, casas_decimais=None):
+    """
+    Limites do IQR com a regra sequencial de limpar_dados (os quartis de cada
+    coluna são calculados só sobre as linhas dentro dos limites das colunas
+    anteriores) em uma única leitura dos blocos: acumula um esboço conjunto
+    (contagem de cada combinação de valores das colunas) e aplica os filtros
+    sobre o esboço, não sobre os dados.
+
+    O esboço conjunto cresce com o número de combinações distintas, que sem
+    arredondamento pode chegar ao número de linhas: a memória não é limitada.
+    Com casas_decimais, fica limitada pelo produto das faixas de valores
+    divididas pela resolução.
+
+    Parâmetros:
+        blocos (Iterable[DataFrame]): Blocos da base (ex: carregar_dados_em_blocos).
+        colunas (list): Colunas numéricas, na ordem em que os filtros são aplicados.
+        k (float): Multiplicador do IQR para definir os limites (default=1.5).
+        casas_decimais (dict | int): Arredondamento do esboço, geral ou por coluna.
+
+    Retorna:
+        dict: {coluna: (limite_inferior, limite_superior)}
+    """
+    if not isinstance(casas_decimais, dict):
+        casas_decimais = {coluna: casas_decimais for coluna in colunas}
+
+    esboco = None
+    for bloco in blocos:
+        valores = pd.DataFrame({
+            coluna: bloco[coluna] if casas_decimais.get(coluna) is None else bloco[coluna].round(casas_decimais[coluna])
+            for coluna in colunas
+        })
+        contagem = valores.value_counts(sort=False, dropna=True)
+        esboco = contagem if esboco is None else esboco.add(contagem, fill_value=0).astype(np.int64)
+
+    limites = {}
+    for coluna in colunas:
+        if esboco is None or esboco.empty:
+            limites[coluna] = (np.nan, np.nan)
+            continue
+        marginal = esboco.groupby(level=coluna).sum().sort_index()
+        Q1, Q3 = quantil_do_esboco(marginal, 0.25), quantil_do_esboco(marginal, 0.75)
+        IQR = Q3 - Q1
+        limites[coluna] = (Q1 - k * IQR, Q3 + k * IQR)
+        nivel = esboco.index.get_level_values(coluna)
+        esboco = esboco[(nivel >= limites[coluna][0]) & (nivel <= limites[coluna][1])]
+    return limites
+
+
+def corrigir_tipos_e_datas(df, compacto=False):
     """
     Corrige tipos de dados e extrai data e hora da coluna InvoiceDate.
 
+    No modo compacto, Country, StockCode e Description viram categorias e a hora
+    é guardada em InvoiceSeconds (segundos desde a meia-noite, int32) no lugar
+    de InvoiceTime, que guarda um objeto datetime.time por linha.
+
     Parâmetros:
         df (DataFrame): DataFrame original com colunas brutas.
+        compacto (bool): Se True, usa a representação compacta (default=False).
 
     Retorna:
-        DataFrame: DataFrame com tipos corrigidos e colunas InvoiceDate e InvoiceTime separadas.
+        DataFrame: DataFrame com tipos corrigidos e colunas InvoiceDate e InvoiceTime
+        (ou InvoiceSeconds) separadas.
     """
-    df = df.copy()
+    categoricas = ["StockCode", "Description", "Country"] if compacto else []
 
-    # Conversões de tipo
-    df["InvoiceNo"] = df["InvoiceNo"].astype(str)
-    df["StockCode"] = df["StockCode"].astype(str)
-    df["Description"] = df["Description"].astype(str)
-    df["Quantity"] = df["Quantity"].astype(np.int64)
-    df["UnitPrice"] = df["UnitPrice"].astype(np.float64)
-    df["CustomerID"] = df["CustomerID"].astype(str)
-    df["Country"] = df["Country"].astype(str)
+    def texto(coluna):
+        serie = df[coluna]
+        if coluna in categoricas:
+            return serie.astype("category")
+        # Colunas já categóricas, vindas da leitura em blocos, são mantidas
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            return serie
+        return serie.astype(str)
 
-    # Conversão de data e extração de hora
-    df["InvoiceDate"] = pd.to_datetime(df["InvoiceDate"], format="%d-%m-%Y %H:%M")
-    df["InvoiceTime"] = df["InvoiceDate"].dt.time
-    df["InvoiceDate"] = pd.to_datetime(df["InvoiceDate"], format="%d/%m/%Y %H:%M")
+    # Conversão de data (uma única leitura) e extração de hora
+    datas = pd.to_datetime(df["InvoiceDate"], format="%d-%m-%Y %H:%M")
 
+    # Monta o resultado coluna a coluna, sem copiar o DataFrame inteiro antes
+    colunas = {
+        "InvoiceNo": texto("InvoiceNo"),
+        "StockCode": texto("StockCode"),
+        "Description": texto("Description"),
+        "Quantity": df["Quantity"].astype(np.int64),
+        "InvoiceDate": datas,
+    }
+    if compacto:
+        colunas["InvoiceSeconds"] = (
+            datas.dt.hour * 3600 + datas.dt.minute * 60 + datas.dt.second
+        ).astype(np.int32)
+    else:
+        colunas["InvoiceTime"] = datas.dt.time
+    colunas["UnitPrice"] = df["UnitPrice"].astype(np.float64)
+    colunas["CustomerID"] = texto("CustomerID")
+    colunas["Country"] = texto("Country")
 
+    return pd.DataFrame(colunas)
 
-    # Reorganização das colunas
-    colunas = [
-        "InvoiceNo", "StockCode", "Description", "Quantity",
-        "InvoiceDate", "InvoiceTime", "UnitPrice", "CustomerID", "Country"
-    ]
-    df = df[colunas]
 
-    return df
+def relatorio_memoria(antes, depois):
+    """
+    Compara o consumo de memória (bytes por linha) de duas versões de uma base,
+    por coluna e no total. Útil para medir o ganho do modo compacto.
 
-def preparar_dados_para_graficos(caminho):
-    df = carregar_dados(caminho)
-    df = corrigir_tipos_e_datas(df)
-    df["Valor"] = df["UnitPrice"].astype(float) * df["Quantity"].astype(float)
+    Parâmetros:
+        antes (DataFrame): Versão original.
+        depois (DataFrame): Versão otimizada.
 
-    # Calcula o preço médio ponderado por país
-    df_filtrado = df[df["Quantity"] > 0].copy()
-    df_filtrado["ValorTotal"] = df_filtrado["UnitPrice"] * df_filtrado["Quantity"]
+    Retorna:
+        DataFrame: Bytes por linha de cada coluna antes e depois, e a redução (antes / depois).
+    """
+    def bytes_por_linha(df):
+        return df.memory_usage(index=False, deep=True) / max(len(df), 1)
 
-    preco_medio_por_pais = (
-        df_filtrado.groupby("Country", group_keys=False)
-        .apply(lambda x: x["ValorTotal"].sum() / x["Quantity"].sum())
-        .sort_values(ascending=False)
-        .reset_index(name="PrecoUnitarioMedio")
+    relatorio = pd.concat(
+        [bytes_por_linha(antes), bytes_por_linha(depois)],
+        axis=1, keys=["BytesPorLinhaAntes", "BytesPorLinhaDepois"],
     )
+    relatorio.loc["Total"] = relatorio.sum()
+    relatorio["Reducao"] = relatorio["BytesPorLinhaAntes"] / relatorio["BytesPorLinhaDepois"]
+    return relatorio
 
-    df = df.merge(preco_medio_por_pais, on="Country", how="left")
-    return df
 
+def limpar_dados(df, k=1.5, compacto=False):
+    """
+    Executa a limpeza completa do notebook sobre a base bruta: filtros de
+    transações válidas, remoção de outliers (Quantity e UnitPrice) e correção de tipos.
+
+    Parâmetros:
+        df (DataFrame): DataFrame bruto, como retornado por carregar_dados.
+        k (float): Multiplicador do IQR usado na remoção de outliers (default=1.5).
+        compacto (bool): Repassado para corrigir_tipos_e_datas.
+
+    Retorna:
+        DataFrame: Base tratada, pronta para as análises.
+    """
+    df = df.assign(
+        Quantity=df["Quantity"].astype(np.int64),
+        UnitPrice=df["UnitPrice"].astype(np.float64),
+    )
+    df = filtrar_transacoes_validas(df)
+    df = remover_outliers_iqr(df, "Quantity", k=k)
+    df = remover_outliers_iqr(df, "UnitPrice", k=k)
+    return corrigir_tipos_e_datas(df, compacto=compacto).reset_index(drop=True)
+
+
+def carregar_e_corrigir(caminho):
+    return corrigir_tipos_e_datas(carregar_dados(caminho))
+
+
+def carregar_e_limpar(caminho, k=1.5, compacto=False):
+    return limpar_dados(carregar_dados(caminho), k=k, compacto=compacto)
+
+
+def carregar_dados_limpos(caminho, k=1.5, compacto=False, usar_cache=True, diretorio_cache=None):
+    """
+    Retorna a base tratada a partir do CSV bruto. Com cache ativo, a primeira
+    execução grava o resultado em disco (formato colunar) e as seguintes apenas
+    mapeiam esse arquivo, desde que o CSV e o k não tenham mudado.
+
+    Parâmetros:
+        caminho (str): Caminho do arquivo CSV bruto.
+        k (float): Multiplicador do IQR usado na remoção de outliers (default=1.5).
+        compacto (bool): Se True, usa a representação compacta de corrigir_tipos_e_datas.
+        usar_cache (bool): Se False, sempre reprocessa o CSV.
+        diretorio_cache (str): Raiz do cache (default=data/clean/cache).
+
+    Retorna:
+        DataFrame: Base tratada.
+    """
+    if not usar_cache:
+        return carregar_e_limpar(caminho, k=k, compacto=compacto)
+    return carregar_com_cache(caminho, carregar_e_limpar, diretorio_cache, k=k, compacto=compacto)
 
 
+def preparar_dados_para_graficos(caminho, usar_cache=True, diretorio_cache=None):
+    if usar_cache:
+        df = carregar_com_cache(caminho, carregar_e_corrigir, diretorio_cache)
+    else:
+        df = carregar_e_corrigir(caminho)
+    df["Valor"] = df["UnitPrice"].astype(float) * df["Quantity"].astype(float)
+
+    # Calcula o preço médio ponderado por país (somente quantidades positivas)
+    df["PrecoUnitarioMedio"] = media_ponderada_por_linha(
+        df, "Country", col_valor="UnitPrice", col_peso="Quantity", mascara=df["Quantity"] > 0
+    )
+    return df
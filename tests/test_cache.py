@@ -0,0 +1,88 @@
+import os
+from datetime import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.cache import carregar_colunar, carregar_com_cache, garantir_cache, salvar_colunar
+
+def test_salvar_e_carregar_colunar_preserva_dados(tmp_path):
+    df = pd.DataFrame({
+        "InvoiceNo": ["536365", "536366", None],
+        "Quantity": np.array([6, 2, 32], dtype=np.int64),
+        "UnitPrice": [2.55, 1.85, 1.69],
+        "InvoiceDate": pd.to_datetime(["2010-12-01 08:26", "2010-12-01 08:28", "2010-12-02 09:00"]),
+        "InvoiceTime": [time(8, 26), time(8, 28), time(9, 0)],
+        "Country": pd.Categorical(["France", "EIRE", "France"]),
+    })
+    salvar_colunar(df, tmp_path / "tabela")
+    lido = carregar_colunar(tmp_path / "tabela")
+    pd.testing.assert_frame_equal(lido, df, check_dtype=False)
+    assert isinstance(lido["Country"].dtype, pd.CategoricalDtype)
+
+    # Texto como categoria: categorias ordenadas sobre os códigos mapeados em memória
+    categorias = carregar_colunar(tmp_path / "tabela", texto_como_categoria=True)["InvoiceNo"]
+    assert categorias.cat.categories.tolist() == ["536365", "536366"]
+    assert categorias.astype(object).tolist()[:2] == ["536365", "536366"] and pd.isna(categorias.iloc[2])
+    base = categorias.values.codes
+    while not isinstance(base, np.memmap) and base.base is not None:
+        base = base.base
+    assert isinstance(base, np.memmap)
+
+def test_carregar_com_cache_reaproveita_e_invalida_por_parametro(tmp_path):
+    origem = tmp_path / "origem.csv"
+    origem.write_text("a\n1\n2\n3\n")
+    chamadas = []
+
+    def gerar(caminho, k=1):
+        chamadas.append(k)
+        return pd.read_csv(caminho) * k
+
+    cache = tmp_path / "cache"
+    primeiro = carregar_com_cache(origem, gerar, cache, k=2)
+    segundo = carregar_com_cache(origem, gerar, cache, k=2)
+    carregar_com_cache(origem, gerar, cache, k=3)
+
+    assert chamadas == [2, 3]
+    assert segundo["a"].tolist() == primeiro["a"].tolist() == [2, 4, 6]
+    assert len(os.listdir(cache)) == 2
+
+def test_garantir_cache_grava_sem_carregar(tmp_path):
+    origem = tmp_path / "origem.csv"
+    origem.write_text("a\n1\n2\n")
+    chamadas = []
+
+    def gerar(caminho, k=1):
+        chamadas.append(k)
+        return pd.read_csv(caminho) * k
+
+    destino = garantir_cache(origem, gerar, tmp_path / "cache", k=2)
+    assert garantir_cache(origem, gerar, tmp_path / "cache", k=2) == destino
+    # carregar_com_cache lê o mesmo diretório sem chamar a função de novo
+    assert carregar_com_cache(origem, gerar, tmp_path / "cache", k=2)["a"].tolist() == [2, 4]
+    assert carregar_colunar(destino)["a"].tolist() == [2, 4]
+    assert chamadas == [2]
+
+def test_salvar_colunar_recusa_objetos_que_nao_sao_texto(tmp_path):
+    # dtypes do pandas gravados como texto são refeitos pelo dtype registrado
+    meses = pd.DataFrame({"Month": pd.period_range("2011-01", periods=3, freq="M")})
+    salvar_colunar(meses, tmp_path / "meses")
+    pd.testing.assert_frame_equal(carregar_colunar(tmp_path / "meses"), meses)
+
+    for valores in ([1, "a", None], [1, 2, 3.5]):
+        with pytest.raises(TypeError, match="misturados"):
+            salvar_colunar(pd.DataFrame({"Mista": pd.Series(valores, dtype=object)}), tmp_path / "tabela")
+
+def test_garantir_cache_repassa_falha_de_gravacao(tmp_path, monkeypatch):
+    origem = tmp_path / "origem.csv"
+    origem.write_text("a\n1\n")
+
+    def disco_cheio(df, diretorio):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr("src.cache.salvar_colunar", disco_cheio)
+    with pytest.raises(OSError, match="No space"):
+        garantir_cache(origem, pd.read_csv, tmp_path / "cache")
+    # Nenhum diretório temporário fica para trás
+    assert os.listdir(tmp_path / "cache") == []
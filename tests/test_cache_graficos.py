@@ -0,0 +1,45 @@
+import os
+
+import pandas as pd
+import pytest
+
+import src.cache_graficos as cache_graficos
+from src.cache_graficos import chave_grafico, grafico_em_cache
+from src.plots import plot_barh, plot_pizza
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({"Country": ["UK", "France", "EIRE"], "Quantity": [300, 120, 45]})
+
+def test_grafico_em_cache_renderiza_uma_vez(df, tmp_path, monkeypatch):
+    chamadas = []
+    renderizar = cache_graficos.renderizar
+    monkeypatch.setattr(cache_graficos, "renderizar", lambda *a, **k: chamadas.append(1) or renderizar(*a, **k))
+
+    primeira = grafico_em_cache(plot_barh, df, diretorio=tmp_path, col_categoria="Country", col_valor="Quantity")
+    segunda = grafico_em_cache(plot_barh, df, diretorio=tmp_path, col_categoria="Country", col_valor="Quantity")
+    assert primeira == segunda and primeira.startswith(b"\x89PNG")
+    assert len(chamadas) == 1
+    assert len(list(tmp_path.glob("*.png"))) == 1
+
+    svg = grafico_em_cache(plot_pizza, df, formato="svg", diretorio=tmp_path, col_categoria="Country", col_valor="Quantity")
+    assert b"<svg" in svg
+
+def test_chave_grafico_muda_com_dados_e_parametros(df):
+    chave = chave_grafico(plot_barh, df, col_categoria="Country", col_valor="Quantity")
+    assert chave == chave_grafico(plot_barh, df.copy(), col_categoria="Country", col_valor="Quantity")
+    assert chave != chave_grafico(plot_barh, df, col_categoria="Country", col_valor="Quantity", decimais=False)
+    assert chave != chave_grafico(plot_barh, df.assign(Quantity=[300, 121, 45]), col_categoria="Country", col_valor="Quantity")
+    assert chave != chave_grafico(plot_barh, df, formato="svg", col_categoria="Country", col_valor="Quantity")
+
+def test_grafico_em_cache_respeita_o_limite_de_tamanho(df, tmp_path):
+    parametros = dict(diretorio=tmp_path, col_categoria="Country", col_valor="Quantity", dpi=30)
+    primeira = grafico_em_cache(plot_barh, df, **parametros)
+    antiga = next(tmp_path.glob("*.png"))
+    os.utime(antiga, (0, 0))
+
+    # Dados novos: a imagem anterior é a menos usada e sai para caber no limite;
+    # a recém-gravada fica mesmo se sozinha passar do limite
+    segunda = grafico_em_cache(plot_barh, df.assign(Quantity=[1, 2, 3]), limite_bytes=len(primeira), **parametros)
+    assert not antiga.exists()
+    assert [p.read_bytes() for p in tmp_path.glob("*.png")] == [segunda]
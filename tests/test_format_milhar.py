@@ -1,9 +1,10 @@
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 import pytest
 
 # Importa a função a ser testada e ferramentas para arredondamento preciso
-from src.plots import format_milhar
+from src.plots import format_milhar, formatar_valor, formatar_valores
 from decimal import Decimal, ROUND_DOWN
 
 # Função que reduz valores numéricos e acrescenta sufixos ("k", "kk") para facilitar leitura
@@ -26,7 +27,7 @@ def format_milhar(valor, decimais=True, simbolo=""):
         return f"{simbolo}{base:,.2f}{sufixo}".replace(",", ".")  # Ajusta formatação para estilo com ponto
     else:
         # Arredonda normalmente e remove casas decimais
-        return f"{simbolo}{int(round(base + Decimal("1e-6"))):,}{sufixo}".replace(",", ".")
+        return f"{simbolo}{int(round(base + Decimal('1e-6'))):,}{sufixo}".replace(",", ".")
 
 # Testes automatizados cobrindo cenários de limite (bordas)
 @pytest.mark.parametrize("valor, decimais, esperado", [
@@ -43,3 +44,21 @@ def format_milhar(valor, decimais=True, simbolo=""):
 def test_format_milhar_casos_de_borda(valor, decimais, esperado):
     # Compara o resultado da função com o resultado esperado em cada caso
     assert format_milhar(valor, decimais=decimais) == esperado
+
+# A versão vetorizada deve reproduzir o arredondamento da versão com Decimal
+def test_formatar_valores_igual_a_versao_com_decimal():
+    rng = np.random.default_rng(0)
+    valores = np.concatenate([
+        [0, -0.0, -0.001, 0.29, 2.5, -2.5, 999.995, 999_999.999, 1_000_001, 1250.75, 123456789.125],
+        np.arange(0, 100_000) / 100,
+        rng.uniform(-5e6, 5e7, 5_000),
+    ])
+    for decimais in (True, False):
+        esperado = [format_milhar(v, decimais=decimais, simbolo="£") for v in valores.tolist()]
+        assert formatar_valores(valores, decimais=decimais, milhar=True, simbolo="£") == esperado
+
+        esperado = [formatar_valor(v, decimais=decimais) for v in valores.tolist()]
+        assert formatar_valores(valores, decimais=decimais) == esperado
+
+    assert formatar_valores([-0.001, -0.0]) == ["-0.00", "-0.00"]
+    assert formatar_valores([0.1234], percentual=True) == ["12.34%"]
@@ -0,0 +1,338 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.funcoes import (
+    agregar_ponderado,
+    atualizar_estado_rfv,
+    calc_migracoes_rfv,
+    calc_retencao_rfv,
+    calc_margem_lucro,
+    calc_top_vendas_pais,
+    calc_transacoes,
+    calc_transicoes_rfv,
+    calc_rfv_mensal,
+    criar_rfv,
+    criar_rfv_em_datas,
+    matriz_coortes,
+    media_ponderada_por_linha,
+    projetar_perfis,
+    rfv_do_estado,
+    top_k_por_grupo,
+)
+
+# Base sintética no formato de corrigir_tipos_e_datas (uma data por nota fiscal)
+@pytest.fixture
+def transacoes():
+    rng = np.random.default_rng(42)
+    notas = pd.DataFrame({
+        "InvoiceNo": [str(536000 + i) for i in range(400)],
+        "CustomerID": [str(12000 + c) for c in rng.integers(0, 60, 400)],
+        "InvoiceDate": pd.Timestamp("2010-12-01") + pd.to_timedelta(rng.integers(0, 365 * 24, 400), unit="h"),
+    })
+    linhas = notas.loc[rng.integers(0, 400, 2_000)].reset_index(drop=True)
+    linhas["Quantity"] = rng.integers(1, 20, len(linhas))
+    linhas["UnitPrice"] = rng.gamma(2, 1.5, len(linhas)).round(2)
+    return linhas.sort_values("InvoiceDate", ignore_index=True)
+
+@pytest.fixture
+def vendas():
+    return pd.DataFrame({
+        "Country": ["UK", "UK", "France", "France", None, "EIRE"],
+        "Month": [1, 2, 1, 1, 1, 2],
+        "Quantity": [2, 6, 1, 3, 5, -4],
+        "UnitPrice": [1.0, 3.0, 10.0, 2.0, 7.0, 9.0],
+    })
+
+def test_agregar_ponderado_por_varias_chaves(vendas):
+    resumo, codigos = agregar_ponderado(vendas, ["Country", "Month"], "UnitPrice", "Quantity")
+    resumo = resumo.set_index(["Country", "Month"])
+    assert resumo.loc[("France", 1), "MediaPonderada"] == pytest.approx((10 + 6) / 4)
+    assert resumo.loc[("UK", 2), "SomaPesos"] == 6
+    assert len(resumo) == 4
+    assert codigos[4] == -1  # chave nula fica fora dos grupos
+
+def test_media_ponderada_por_linha_equivale_ao_groupby_apply(vendas):
+    mascara = vendas["Quantity"] > 0
+    filtrado = vendas[mascara]
+    esperado = (
+        filtrado.groupby("Country")
+        .apply(lambda x: (x["UnitPrice"] * x["Quantity"]).sum() / x["Quantity"].sum())
+        .rename("Media")
+    )
+    esperado = vendas.merge(esperado, on="Country", how="left")["Media"]
+
+    obtido = media_ponderada_por_linha(vendas, "Country", "UnitPrice", "Quantity", mascara=mascara)
+    np.testing.assert_allclose(obtido.to_numpy(), esperado.to_numpy())
+    assert np.isnan(obtido.iloc[5])  # EIRE só tem quantidade negativa
+
+def test_calc_transacoes_une_estatisticas_pela_chave():
+    df = pd.DataFrame({
+        "Country": ["UK", "UK", "UK", "France", "France", "France", "France"],
+        "InvoiceNo": ["1", "1", "1", "2", "3", "4", "5"],
+        "Quantity": [1, 2, 3, 4, 5, 6, 7],
+        "UnitPrice": [1.0, 1.0, 1.0, 2.0, 2.0, 2.0, 2.0],
+        "InvoiceDate": pd.to_datetime(["2011-01-05"] * 3 + ["2011-01-06", "2011-02-01", "2011-02-02", "2011-02-03"]),
+    })
+    transacoes = calc_transacoes(df).set_index("Country")
+    # O mais frequente em linhas (France) também tem mais notas: nada de alinhar por posição
+    assert transacoes.loc["UK", ["Unique", "Total", "Quantity"]].tolist() == [1, 3, 6]
+    assert transacoes.loc["France", ["Unique", "Total", "Quantity"]].tolist() == [4, 4, 22]
+    assert transacoes.loc["France", "Revenue"] == pytest.approx(44.0)
+    assert transacoes.loc["UK", "Media"] == 3
+
+    mensal = calc_transacoes(df, por_mes=True).set_index(["Country", "MonthReference"])
+    assert mensal.loc[("France", pd.Period("2011-02", "M")), "Unique"] == 3
+
+def test_top_vendas_pais_usa_o_produto_mais_vendido():
+    df = pd.DataFrame({
+        "Country": ["UK", "UK", "UK", "France", "France"],
+        "Description": ["ZEBRA", "ALARM", "ALARM", "BIRD", "CANDLE"],
+        "Quantity": [5, 3, 4, 1, 2],
+        "UnitPrice": [1.0, 9.0, 7.0, 2.0, 3.0],
+    })
+    # O max por coluna daria UK -> (5, "ZEBRA"); o produto mais vendido é ALARM (7)
+    top = calc_top_vendas_pais(df).set_index("Country")
+    assert top.loc["UK", "Description"] == "ALARM" and top.loc["UK", "Quantity"] == 7
+    assert top.loc["France", "Description"] == "CANDLE"
+
+    margem = calc_margem_lucro(df)
+    assert margem["Country"].tolist() == ["UK", "France"]
+    assert margem.loc[0, "UnitPrice"] == pytest.approx(8.0)
+
+    # Empate de preço no país: fica o primeiro em ordem alfabética, como no notebook
+    empate = pd.DataFrame({"Country": ["UK", "UK"], "Description": ["ZEBRA", "ALARM"], "UnitPrice": [7.5, 7.5]})
+    assert calc_margem_lucro(empate)["Description"].tolist() == ["ALARM"]
+    assert calc_margem_lucro(empate.astype({"Description": pd.CategoricalDtype(["ZEBRA", "ALARM"])}))["Description"].tolist() == ["ALARM"]
+
+def test_criar_rfv_igual_a_versao_original(transacoes):
+    from benchmarks.bench_rfv import criar_rfv_original
+
+    # Empates (mesma data e valor em várias notas) e linhas sem cliente
+    transacoes.loc[::7, "InvoiceDate"] = transacoes["InvoiceDate"].iloc[0]
+    transacoes.loc[::5, ["Quantity", "UnitPrice"]] = [2, 1.5]
+    transacoes["CustomerID"] = transacoes["CustomerID"].mask(transacoes.index % 11 == 0)
+    colunas = transacoes.columns.tolist()
+
+    obtido = criar_rfv(transacoes)
+    assert transacoes.columns.tolist() == colunas
+    esperado = criar_rfv_original(transacoes.copy())
+    pd.testing.assert_frame_equal(obtido, esperado, check_dtype=False)
+
+def test_top_k_por_grupo_igual_ao_sort_completo(transacoes):
+    rfv = criar_rfv(transacoes)
+    perfil = transacoes["CustomerID"].map(rfv.set_index("CustomerID")["Profile"]).rename("Profile")
+    transacoes["Item"] = (transacoes["Quantity"] % 7).astype(str)
+
+    top = top_k_por_grupo(transacoes, perfil, "Item", "Quantity", k=3)
+    esperado = (
+        transacoes.groupby([perfil, "Item"])["Quantity"].sum()
+        .sort_values(ascending=False, kind="stable")
+        .groupby(level="Profile").head(3)
+    )
+    assert len(top) == len(esperado) == 3 * perfil.nunique()
+    for (grupo, item), valor in esperado.items():
+        linha = top[(top["Profile"] == grupo) & (top["Item"] == item)]
+        assert linha["Quantity"].item() == valor
+    assert (top.groupby("Profile")["Rank"].max() == 3).all()
+
+def test_top_k_por_grupo_media_ignora_nan():
+    df = pd.DataFrame({
+        "Country": ["UK", "UK", "UK", "UK", "France"],
+        "Description": ["A", "A", "B", "C", "A"],
+        "UnitPrice": [4.0, np.nan, 3.0, np.nan, 2.0],
+    })
+    top = top_k_por_grupo(df, "Country", "Description", "UnitPrice", k=3, agregacao="mean")
+    esperado = df.groupby(["Country", "Description"])["UnitPrice"].mean()
+
+    # A média de A no UK é 4 (não 2): a linha NaN não entra no denominador
+    uk = top[top["Country"] == "UK"]
+    assert uk["Description"].tolist() == ["A", "B", "C"]
+    np.testing.assert_array_equal(uk["UnitPrice"], esperado["UK"][["A", "B", "C"]])
+
+def test_rfv_incremental_igual_ao_calculo_completo(transacoes):
+    esperado = criar_rfv(transacoes.copy())
+
+    estado = None
+    for _, lote in transacoes.groupby(transacoes["InvoiceDate"].dt.to_period("M")):
+        estado = atualizar_estado_rfv(estado, lote)
+
+    pd.testing.assert_frame_equal(rfv_do_estado(estado), esperado, check_dtype=False)
+
+def test_rfv_incremental_conta_cada_nota_uma_vez(transacoes):
+    esperado = criar_rfv(transacoes.copy())
+
+    # Lotes de tamanho fixo dividem várias notas fiscais entre lotes consecutivos
+    estado = None
+    for inicio in range(0, len(transacoes), 150):
+        estado = atualizar_estado_rfv(estado, transacoes.iloc[inicio:inicio + 150])
+    pd.testing.assert_frame_equal(rfv_do_estado(estado), esperado, check_dtype=False)
+
+    # Reenviar um lote não soma as notas de novo na Frequency
+    frequencia = estado["Frequency"][:estado["n"]].copy()
+    atualizar_estado_rfv(estado, transacoes.iloc[:150])
+    np.testing.assert_array_equal(estado["Frequency"][:estado["n"]], frequencia)
+
+def test_rfv_mensal_igual_ao_rfv_de_cada_mes(transacoes):
+    mensal = calc_rfv_mensal(transacoes)
+    meses = transacoes["InvoiceDate"].dt.to_period("M")
+
+    for mes in meses.unique()[:3]:
+        esperado = criar_rfv(transacoes[meses == mes])
+        obtido = mensal[mensal["MonthReference"] == mes].reset_index(drop=True)
+        pd.testing.assert_frame_equal(obtido[esperado.columns], esperado, check_dtype=False)
+
+def test_rfv_em_processos_igual_ao_serial(transacoes):
+    pd.testing.assert_frame_equal(criar_rfv(transacoes, n_processos=2), criar_rfv(transacoes))
+    pd.testing.assert_frame_equal(calc_rfv_mensal(transacoes, n_processos=2), calc_rfv_mensal(transacoes))
+
+def perfis_mensais_por_loop(df, pontuar):
+    # Referência: versão anterior, com um groupby por mês
+    df = df.assign(MonthReference=df["InvoiceDate"].dt.to_period("M"), TotalPrice=df["Quantity"] * df["UnitPrice"])
+    resultados = []
+    for mes in sorted(df["MonthReference"].unique()):
+        df_mes = df[df["MonthReference"] == mes]
+        rfv = df_mes.groupby("CustomerID").agg({
+            "InvoiceDate": lambda x: (df_mes["InvoiceDate"].max() - x.max()).days,
+            "InvoiceNo": "nunique",
+            "TotalPrice": "sum",
+        }).reset_index()
+        rfv.columns = ["CustomerID", "Recency", "Frequency", "Value"]
+        rfv["Profile"] = pontuar(rfv)
+        rfv["MonthReference"] = mes
+        resultados.append(rfv[["CustomerID", "MonthReference", "Profile"]])
+    return pd.concat(resultados, ignore_index=True)
+
+def perfil_migracao(rfv):
+    rfv_str = (
+        pd.qcut(rfv["Recency"], 3, labels=[3, 2, 1]).astype(str)
+        + pd.qcut(rfv["Frequency"].rank(method="first"), 3, labels=[1, 2, 3]).astype(str)
+        + pd.qcut(rfv["Value"], 3, labels=[1, 2, 3]).astype(str)
+    )
+    return rfv_str.map(lambda s: "Clientes VIP" if s == "333"
+                       else "Clientes Emergentes" if s.startswith("3") or s.endswith("3")
+                       else "Clientes Churn" if s.startswith("1") and s.endswith("1")
+                       else "Clientes Regulares")
+
+def perfil_retencao(rfv):
+    score = (
+        pd.qcut(rfv["Recency"], 3, labels=[3, 2, 1]).astype(int)
+        + rfv["Frequency"].map(lambda f: 3 if f > 5 else 2 if f >= 3 else 1)
+        + pd.qcut(rfv["Value"], 3, labels=[1, 2, 3]).astype(int)
+    )
+    return score.map(lambda s: "Clientes VIP" if s >= 8 else "Clientes Emergentes" if s >= 5 else "Clientes Churn")
+
+def test_migracoes_e_retencao_iguais_ao_loop_mensal(transacoes):
+    mensal = calc_rfv_mensal(transacoes)
+
+    perfis = perfis_mensais_por_loop(transacoes, perfil_migracao).sort_values(["CustomerID", "MonthReference"])
+    perfis["PreviousProfile"] = perfis.groupby("CustomerID")["Profile"].shift(1)
+    migracoes = perfis[(perfis["PreviousProfile"] == "Clientes Emergentes") & (perfis["Profile"] == "Clientes VIP")]
+    esperado = migracoes.groupby("MonthReference")["CustomerID"].nunique().reset_index()
+    esperado.columns = ["Month", "NumMigrations"]
+    assert len(esperado) > 0
+    pd.testing.assert_frame_equal(calc_migracoes_rfv(transacoes, mensal), esperado, check_dtype=False)
+
+    # Retenção: presença cliente × mês agrupada pelo perfil do primeiro mês
+    perfis = perfis_mensais_por_loop(transacoes, perfil_retencao)
+    presenca = pd.crosstab(perfis["CustomerID"], perfis["MonthReference"])
+    inicial = perfis.sort_values("MonthReference").groupby("CustomerID")["Profile"].first()
+    esperado = presenca.groupby(inicial.reindex(presenca.index)).mean().T
+    obtido = calc_retencao_rfv(transacoes, mensal).set_index("Month")
+    assert obtido.index.tolist() == esperado.index.tolist()
+    assert obtido.columns.tolist() == esperado.columns.tolist()
+    np.testing.assert_allclose(obtido.to_numpy(dtype=float), esperado.to_numpy(dtype=float))
+    assert list(transacoes.columns) == ["InvoiceNo", "CustomerID", "InvoiceDate", "Quantity", "UnitPrice"]
+
+def test_matriz_coortes_igual_a_matriz_densa(transacoes):
+    mensal = calc_rfv_mensal(transacoes)
+
+    # Referência: matriz densa clientes × meses
+    presenca = pd.crosstab(mensal["CustomerID"], mensal["MonthReference"])
+    primeiras = mensal.sort_values("MonthReference").groupby("CustomerID").first()
+    for por, coorte in [("perfil", primeiras["Profile"]), ("mes", primeiras["MonthReference"])]:
+        esperado = presenca.groupby(coorte.reindex(presenca.index)).mean()
+        obtido = matriz_coortes(mensal, por=por)
+        np.testing.assert_allclose(obtido.to_numpy(), esperado.to_numpy())
+        assert obtido.index.tolist() == esperado.index.tolist()
+
+    # Coortes por mês de entrada, em meses relativos: a coluna 0 é sempre o cliente inteiro
+    contagens = matriz_coortes(mensal, por="mes", relativo=True, proporcao=False)
+    np.testing.assert_array_equal(contagens[0], primeiras.groupby("MonthReference").size())
+    assert contagens.to_numpy().sum() == len(mensal)
+
+    with pytest.raises(ValueError):
+        matriz_coortes(mensal, por="pais")
+
+def test_transicoes_rfv_igual_a_comparacao_mes_a_mes(transacoes):
+    mensal = calc_rfv_mensal(transacoes)
+    transicoes = calc_transicoes_rfv(transacoes, mensal)
+
+    # Referência: perfil de cada cliente já visto nos dois meses, "Sem compra" se não comprou
+    perfis = mensal.pivot(index="CustomerID", columns="MonthReference", values="MigrationProfile")
+    primeiro = mensal.groupby("CustomerID")["MonthReference"].min()
+    meses = perfis.columns
+    assert transicoes["Month"].unique().tolist() == meses[1:].tolist()
+    for anterior, mes in zip(meses[:-1], meses[1:]):
+        vistos = perfis[primeiro <= mes]
+        esperado = pd.crosstab(vistos[anterior].fillna("Sem compra"), vistos[mes].fillna("Sem compra"))
+        obtido = transicoes[transicoes["Month"] == mes].pivot(index="FromProfile", columns="ToProfile", values="Customers")
+        esperado = esperado.reindex(index=obtido.index, columns=obtido.columns, fill_value=0)
+        np.testing.assert_array_equal(obtido.to_numpy(), esperado.to_numpy())
+
+    # A projeção conserva o total de clientes
+    projecao = projetar_perfis(transicoes)
+    assert projecao["Profile"].tolist()[-1] == "Sem compra"
+    assert np.isclose(projecao["Projected"].sum(), projecao["Customers"].sum())
+
+def test_transicoes_rfv_com_mes_sem_compras(transacoes):
+    meses = transacoes["InvoiceDate"].dt.to_period("M")
+    lacuna = pd.Period("2011-03", "M")
+    mensal = calc_rfv_mensal(transacoes[meses != lacuna])
+    transicoes = calc_transicoes_rfv(None, mensal)
+
+    # O mês sem compras continua no calendário: nenhum par salta dois meses
+    assert transicoes["Month"].unique().tolist() == list(pd.period_range(meses.min() + 1, meses.max(), freq="M"))
+    def matriz(mes):
+        return transicoes[transicoes["Month"] == mes].pivot(index="FromProfile", columns="ToProfile", values="Customers")
+    assert (matriz(lacuna).drop(columns="Sem compra").to_numpy() == 0).all()
+    assert (matriz(lacuna + 1).drop(index="Sem compra").to_numpy() == 0).all()
+    # Quem comprou em fevereiro e em abril sai para "Sem compra" e volta, sem perfil → perfil
+    fevereiro = set(mensal.loc[mensal["MonthReference"] == lacuna - 1, "CustomerID"])
+    assert matriz(lacuna)["Sem compra"].drop("Sem compra").sum() == len(fevereiro)
+
+def test_projetar_perfis_com_um_unico_mes(transacoes):
+    um_mes = transacoes[transacoes["InvoiceDate"].dt.to_period("M") == transacoes["InvoiceDate"].dt.to_period("M").min()]
+    transicoes = calc_transicoes_rfv(um_mes)
+
+    # Sem nenhum par de meses não há transições nem projeção
+    assert transicoes.empty
+    projecao = projetar_perfis(transicoes)
+    assert projecao.empty and projecao.columns.tolist() == ["Profile", "Customers", "Projected"]
+
+def test_rfv_em_datas_igual_ao_recalculo_filtrado(transacoes):
+    # Preços em múltiplos de 0,25 tornam as somas exatas em ponto flutuante
+    transacoes["UnitPrice"] = (transacoes["UnitPrice"] * 4).round() / 4 + 0.25
+    datas = pd.to_datetime(["2000-01-01 00:00:00", "2011-03-15 00:00:00", "2011-07-01 12:00:00", "2011-12-31 00:00:00"])
+
+    snapshots = criar_rfv_em_datas(transacoes, datas)
+
+    assert set(snapshots["ReferenceDate"]) == set(datas[1:])
+    for data in datas[1:]:
+        esperado = criar_rfv(transacoes[transacoes["InvoiceDate"] <= data])
+        obtido = snapshots[snapshots["ReferenceDate"] == data].drop(columns="ReferenceDate")
+        pd.testing.assert_frame_equal(obtido.reset_index(drop=True), esperado, check_dtype=False)
+
+def test_rfv_em_datas_ignora_notas_nulas_na_frequencia():
+    # O cliente 2 tem uma linha sem nota: não pode colidir com a última nota do cliente 1
+    df = pd.DataFrame({
+        "InvoiceNo": ["A", "B", None, "C", "D", "E"],
+        "CustomerID": ["1", "1", "2", "2", "3", "3"],
+        "InvoiceDate": pd.to_datetime(["2011-01-01", "2011-01-02", "2011-01-01", "2011-01-03", "2011-01-02", "2011-01-04"]),
+        "Quantity": [1, 2, 3, 4, 5, 6],
+        "UnitPrice": [1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
+    })
+    obtido = criar_rfv_em_datas(df, ["2011-01-04"]).drop(columns="ReferenceDate")
+    esperado = criar_rfv(df)
+    assert esperado["Frequency"].tolist() == [2, 1, 2]
+    pd.testing.assert_frame_equal(obtido.reset_index(drop=True), esperado, check_dtype=False)
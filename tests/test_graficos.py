@@ -0,0 +1,30 @@
+import json
+import os
+
+import pandas as pd
+
+from src.graficos import GRAFICOS, especificacao_vega, nome_arquivo, renderizar_todos
+
+DIRETORIO_DADOS = os.path.join(os.path.dirname(__file__), "..", "data", "dashboards")
+
+def test_registro_aponta_para_csvs_existentes():
+    for definicao in GRAFICOS.values():
+        assert os.path.exists(os.path.join(DIRETORIO_DADOS, f"{definicao['dados']}.csv"))
+    assert len({nome_arquivo(nome) for nome in GRAFICOS}) == len(GRAFICOS)
+    assert nome_arquivo("Média de preços por país") == "media_de_precos_por_pais"
+
+def test_especificacao_vega_de_cada_grafico():
+    for nome, definicao in GRAFICOS.items():
+        assert definicao["modo"] in ("imagem", "vega")
+        df = pd.read_csv(os.path.join(DIRETORIO_DADOS, f"{definicao['dados']}.csv"))
+        spec = json.loads(json.dumps(especificacao_vega(nome, df)))
+        assert spec["title"] == definicao["parametros"]["titulo"]
+        assert spec["data"]["values"]
+
+def test_renderizar_todos_em_paralelo(tmp_path):
+    resultados = renderizar_todos(DIRETORIO_DADOS, tmp_path, dpi=30, n_processos=2, log=None)
+    assert list(resultados) == list(GRAFICOS)
+    for caminho, segundos in resultados.values():
+        with open(caminho, "rb") as f:
+            assert f.read(4) == b"\x89PNG"
+        assert segundos > 0
@@ -0,0 +1,85 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.indice_clientes import abrir_indice, buscar_cliente, construir_indice, gravar_indice, versao_atual
+
+# RFV e histórico mensal no formato de criar_rfv / calc_rfv_mensal, fora de ordem
+@pytest.fixture
+def indice(tmp_path):
+    rfv = pd.DataFrame({
+        "CustomerID": ["12350.0", "12347.0", "12400.0", "12348.0"],
+        "Recency": [310, 1, 20, 248],
+        "Frequency": [1, 7, 2, 3],
+        "Value": [334.4, 3314.73, 120.0, 90.2],
+        "Profile": ["Clientes Churn", "Clientes VIP", "Clientes Emergentes", "Clientes Churn"],
+    })
+    mensal = pd.DataFrame({
+        "CustomerID": ["12347.0", "12348.0", "12347.0", "12350.0", "12347.0"],
+        "MonthReference": pd.PeriodIndex(["2010-12", "2010-12", "2011-01", "2011-02", "2011-04"], freq="M"),
+        "Value": [711.79, 90.2, 475.39, 334.4, 636.25],
+        "Profile": ["Clientes VIP", "Clientes Churn", "Clientes Emergentes", "Clientes Churn", "Clientes VIP"],
+    })
+    gravar_indice(construir_indice(rfv, mensal), tmp_path / "indice")
+    return abrir_indice(tmp_path / "indice")
+
+@pytest.fixture
+def rfv():
+    return pd.DataFrame({"CustomerID": [12347.0, 12346.0], "Recency": [1, 325], "Profile": ["Clientes VIP", "Clientes Churn"]})
+
+def test_buscar_cliente_retorna_perfil_e_historico(indice):
+    assert list(indice["ids"]) == ["12347", "12348", "12350", "12400"]
+
+    cliente, historico = buscar_cliente(indice, 12347)
+    assert cliente["Profile"] == "Clientes VIP"
+    assert cliente["Value"] == 3314.73
+    assert historico["MonthReference"].tolist() == ["2010-12", "2011-01", "2011-04"]
+    np.testing.assert_allclose(historico["Value"], [711.79, 475.39, 636.25])
+
+    # Cliente sem histórico mensal e cliente inexistente
+    cliente, historico = buscar_cliente(indice, "12400")
+    assert cliente["Recency"] == 20 and historico.empty
+    assert buscar_cliente(indice, "12349") is None
+    assert buscar_cliente(indice, "99999") is None
+
+def test_abrir_indice_inexistente(tmp_path):
+    assert abrir_indice(tmp_path / "nada") is None
+
+def test_regravar_troca_a_versao_sem_afetar_leitores_abertos(rfv, tmp_path):
+    destino = tmp_path / "indice"
+    gravar_indice(construir_indice(rfv), destino)
+    antigo = abrir_indice(destino)
+
+    gravar_indice(construir_indice(rfv.assign(Recency=[2, 326])), destino)
+    novo = abrir_indice(destino)
+
+    # O leitor aberto continua na versão anterior; a nova versão substitui a antiga no disco
+    assert buscar_cliente(antigo, "12347")[0]["Recency"] == 1
+    assert buscar_cliente(novo, "12347")[0]["Recency"] == 2
+    assert [nome for nome in os.listdir(destino) if nome.startswith("v-")] == [os.path.basename(versao_atual(destino))]
+
+def test_indice_sem_historico_mensal(rfv, tmp_path):
+    gravar_indice(construir_indice(rfv), tmp_path / "indice")
+    cliente, historico = buscar_cliente(abrir_indice(tmp_path / "indice"), 12346)
+    assert cliente["Profile"] == "Clientes Churn" and historico.empty
+
+def test_regravar_preserva_gravacao_concorrente_e_abre_versao_pedida(rfv, tmp_path):
+    destino = tmp_path / "indice"
+    gravar_indice(construir_indice(rfv), destino)
+    primeira = versao_atual(destino)
+    # Versão de outra gravação ainda em andamento (sem ATUAL apontando para ela)
+    (destino / "v-concorrente").mkdir()
+
+    gravar_indice(construir_indice(rfv.assign(Recency=[2, 326])), destino)
+    assert sorted(nome for nome in os.listdir(destino) if nome.startswith("v-")) == sorted(
+        ["v-concorrente", os.path.basename(versao_atual(destino))]
+    )
+    assert not os.path.exists(primeira)
+
+    # abrir_indice usa a versão recebida, não a apontada por ATUAL
+    segunda = versao_atual(destino)
+    gravar_indice(construir_indice(rfv.assign(Recency=[3, 327])), destino)
+    assert abrir_indice(destino, versao=segunda) is None
+    assert buscar_cliente(abrir_indice(destino, versao=versao_atual(destino)), "12347")[0]["Recency"] == 3
@@ -0,0 +1,124 @@
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.indice_clientes import versao_atual
+from src.pipeline import NOS, construir
+
+# CSV bruto sintético com clientes suficientes para os tercis do RFV
+@pytest.fixture
+def csv_bruto(tmp_path):
+    rng = np.random.default_rng(7)
+    n = 600
+    datas = pd.Timestamp("2010-12-01") + pd.to_timedelta(rng.integers(0, 300 * 24, 150), unit="h")
+    nota = rng.integers(0, 150, n)
+    df = pd.DataFrame({
+        "InvoiceNo": (536000 + nota).astype(str),
+        "StockCode": rng.choice(["85123A", "71053", "22633", "84879"], n),
+        "Description": rng.choice(["HEART", "LANTERN", "HAND WARMER", "BIRD"], n),
+        "Quantity": rng.integers(1, 12, n),
+        "InvoiceDate": datas[nota].strftime("%d-%m-%Y %H:%M"),
+        "UnitPrice": rng.gamma(2, 1.5, n).round(2) + 0.01,
+        "CustomerID": (12000 + nota % 40).astype(str),
+        "Country": np.where(nota % 3 == 0, "France", "United Kingdom"),
+    })
+    caminho = tmp_path / "OnlineRetail.csv"
+    df.to_csv(caminho, index=False, encoding="ISO-8859-1")
+    return caminho
+
+def test_construir_gera_todos_os_csvs_e_reaproveita(csv_bruto, tmp_path):
+    saida, cache = tmp_path / "dashboards", tmp_path / "cache"
+    exportados = {nome for nome, (_, _, exporta) in NOS.items() if exporta}
+    csvs = {nome for nome, (_, _, exporta) in NOS.items() if exporta is True}
+
+    status = construir(csv_bruto, saida, diretorio_cache=cache, log=None)
+    assert set(status) == exportados
+    assert set(status.values()) == {"reconstruído"}
+    assert {p.stem for p in saida.glob("*.csv")} == csvs
+    assert versao_atual(saida / "indice_clientes") is not None
+
+    status = construir(csv_bruto, saida, diretorio_cache=cache, log=None)
+    assert set(status.values()) == {"atualizado"}
+
+def test_construir_refaz_somente_o_que_mudou(csv_bruto, tmp_path):
+    saida, cache = tmp_path / "dashboards", tmp_path / "cache"
+    construir(csv_bruto, saida, diretorio_cache=cache, log=None)
+
+    (saida / "proporcao_rfv.csv").unlink()
+    status = construir(csv_bruto, saida, diretorio_cache=cache, log=None)
+    assert [nome for nome, s in status.items() if s == "reconstruído"] == ["proporcao_rfv"]
+
+    # Mudança no CSV bruto invalida a base tratada e todos os dependentes
+    df = pd.read_csv(csv_bruto, encoding="ISO-8859-1")
+    df.iloc[:-1].to_csv(csv_bruto, index=False, encoding="ISO-8859-1")
+    status = construir(csv_bruto, saida, diretorio_cache=cache, log=None)
+    assert set(status.values()) == {"reconstruído"}
+
+def test_construir_alvos_com_dependencias(csv_bruto, tmp_path):
+    saida = tmp_path / "dashboards"
+    status = construir(csv_bruto, saida, alvos=["faturamento_rfv"], usar_cache=False, log=None)
+    assert status == {"rfv": "reconstruído", "faturamento_rfv": "reconstruído"}
+
+    with pytest.raises(ValueError):
+        construir(csv_bruto, saida, alvos=["inexistente"], log=None)
+
+def test_construir_paralelo_igual_ao_serial(csv_bruto, tmp_path):
+    serial, paralelo = tmp_path / "serial", tmp_path / "paralelo"
+    construir(csv_bruto, serial, diretorio_cache=tmp_path / "cache", log=None)
+    status = construir(csv_bruto, paralelo, diretorio_cache=tmp_path / "cache", n_processos=3, log=None)
+    assert set(status.values()) == {"reconstruído"}
+
+    for arquivo in serial.glob("*.csv"):
+        pd.testing.assert_frame_equal(pd.read_csv(paralelo / arquivo.name), pd.read_csv(arquivo))
+    indice_serial, indice_paralelo = versao_atual(serial / "indice_clientes"), versao_atual(paralelo / "indice_clientes")
+    for arquivo in sorted(os.listdir(indice_serial)):
+        if arquivo.endswith(".npy"):
+            np.testing.assert_array_equal(np.load(os.path.join(indice_paralelo, arquivo)), np.load(os.path.join(indice_serial, arquivo)))
+
+# Módulo de agregados gravado em disco, para simular a edição de uma função
+AGREGADOS = """
+def contar(df):
+    return df.groupby("Country").size().reset_index(name="{coluna}")
+
+def total_paises(df):
+    return contar(df)[["{coluna}"]].sum().to_frame().T{ajuste}
+
+def dobro(contagem):
+    return contagem * 2
+
+def clientes(df):
+    # Não depende de contar
+    return df[["CustomerID"]].drop_duplicates()
+"""
+
+def carregar_agregados(pasta, coluna="N", ajuste=""):
+    caminho = pasta / "agregados.py"
+    caminho.write_text(AGREGADOS.replace("{coluna}", coluna).replace("{ajuste}", ajuste))
+    spec = importlib.util.spec_from_file_location("agregados", caminho)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return {
+        "contagem": (modulo.contar, ["limpo"], True),
+        "total": (modulo.total_paises, ["limpo"], True),
+        "dobro": (modulo.dobro, ["contagem"], True),
+        "clientes": (modulo.clientes, ["limpo"], True),
+    }
+
+def test_editar_uma_funcao_refaz_so_o_no_e_dependentes(csv_bruto, tmp_path):
+    saida, cache = tmp_path / "dashboards", tmp_path / "cache"
+
+    def reconstruidos(nos):
+        status = construir(csv_bruto, saida, diretorio_cache=cache, nos=nos, log=None)
+        return sorted(nome for nome, s in status.items() if s == "reconstruído")
+
+    assert reconstruidos(carregar_agregados(tmp_path)) == ["clientes", "contagem", "dobro", "total"]
+    assert reconstruidos(carregar_agregados(tmp_path)) == []
+
+    # Editar total_paises refaz só o nó "total"
+    assert reconstruidos(carregar_agregados(tmp_path, ajuste=" * 1")) == ["total"]
+
+    # Editar o auxiliar contar refaz quem o chama e os dependentes, mas não "clientes"
+    assert reconstruidos(carregar_agregados(tmp_path, coluna="Linhas", ajuste=" * 1")) == ["contagem", "dobro", "total"]
@@ -4,6 +4,7 @@ matplotlib.use("Agg")
 import pytest
 import pandas as pd
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 
 from src.plots import (
     plot_barv,
@@ -34,3 +35,79 @@ def test_plot_pizza_executa_sem_erro():
     })
     plot_pizza(df, col_valor="Fatia", col_categoria="Categoria", exibir_percentual=True)
     plt.close()
+
+def test_plots_retornam_figure_sem_usar_pyplot():
+    df = pd.DataFrame({
+        "Perfil": ["A", "B", "C"],
+        "Valor": [100, 200, 300]
+    })
+    plt.close("all")
+    for plot in (plot_barh, plot_barv, plot_pizza):
+        fig = plot(df, col_valor="Valor", col_categoria="Perfil")
+        assert isinstance(fig, Figure)
+    assert plt.get_fignums() == []  # nenhuma figura presa no estado global
+
+def test_plots_desenham_no_axes_recebido():
+    df = pd.DataFrame({
+        "Perfil": ["A", "B", "C"],
+        "Valor": [100, 200, 300]
+    })
+    fig = Figure()
+    esquerda, direita = fig.subplots(1, 2)
+    assert plot_barv(df, col_valor="Valor", col_categoria="Perfil", ax=esquerda) is fig
+    plot_pizza(df, col_valor="Valor", col_categoria="Perfil", ax=direita)
+    assert len(esquerda.patches) == 3 and direita.get_title() == "Valor por Perfil"
+
+def test_max_categorias_agrupa_restante_em_outros():
+    df = pd.DataFrame({
+        "Produto": [f"P{i}" for i in range(100)],
+        "Qtd": list(range(100))
+    })
+    fig = plot_barh(df, col_valor="Qtd", col_categoria="Produto", max_categorias=10)
+    barras = fig.axes[0].patches
+    assert len(barras) == 11
+    # "Outros" fica na base, com a soma das 90 menores
+    assert barras[0].get_width() == sum(range(90))
+    assert [b.get_width() for b in barras[1:]] == list(range(90, 100))
+    assert fig.get_figheight() < 8
+
+    fig = plot_barv(df, col_valor="Qtd", col_categoria="Produto", usar_cores=False, max_categorias=5)
+    barras = fig.axes[0].patches
+    assert len(barras) == 6
+    assert barras[-1].get_height() == sum(range(95))
+    assert fig.axes[0].get_xticklabels()[-1].get_text() == "Outros (95)"
+
+    # Sem excedente, nada é agrupado
+    fig = plot_barh(df, col_valor="Qtd", col_categoria="Produto", max_categorias=100)
+    assert len(fig.axes[0].patches) == 100
+
+def test_especificacao_vega_tem_os_mesmos_rotulos_da_figura():
+    import json
+    from src.plots import VEGA_LITE
+
+    df = pd.DataFrame({
+        "Perfil": ["A", "B", "C"],
+        "Valor": [1500.0, 200.5, 30.0]
+    })
+    parametros = dict(col_valor="Valor", col_categoria="Perfil", milhar=True, simbolo="£")
+
+    fig = plot_barh(df, **parametros)
+    spec = VEGA_LITE[plot_barh](df, **parametros)
+    json.dumps(spec)
+    rotulos = [t.get_text() for t in fig.axes[0].get_yticklabels()]
+    assert [linha["label"] for linha in spec["data"]["values"]] == rotulos[::-1]
+    assert spec["encoding"]["x"]["scale"]["type"] == "log"
+
+    fig = plot_barv(df, **parametros)
+    spec = VEGA_LITE[plot_barv](df, **parametros)
+    json.dumps(spec)
+    textos = [t.get_text() for t in fig.axes[0].texts]
+    assert [linha["rotulo"] for linha in spec["data"]["values"]] == textos == ["£1.50k", "£200.50", "£30.00"]
+    # Escala linear nas duas versões
+    assert fig.axes[0].get_yscale() == "linear" and "scale" not in spec["encoding"]["y"]
+
+    fig = plot_pizza(df, exibir_percentual=False, **parametros)
+    spec = VEGA_LITE[plot_pizza](df, exibir_percentual=False, **parametros)
+    json.dumps(spec)
+    textos = [t.get_text() for t in fig.axes[0].texts]
+    assert [linha["label"] for linha in spec["data"]["values"]] == textos
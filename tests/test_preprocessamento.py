@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import preprocessamento
+from src.preprocessamento import (
+    carregar_dados_em_blocos,
+    carregar_dados,
+    carregar_e_limpar,
+    concatenar_blocos,
+    corrigir_tipos_e_datas,
+    limites_iqr,
+    limites_iqr_em_blocos,
+    limpar_em_blocos,
+    relatorio_memoria,
+)
+
+# Pequena amostra no mesmo formato do OnlineRetail.csv
+@pytest.fixture
+def csv_bruto(tmp_path):
+    df = pd.DataFrame({
+        "InvoiceNo": ["536365", "536365", "536366", "536367", "536368", "536369"],
+        "StockCode": ["85123A", "71053", "22633", "84879", "22960", "21756"],
+        "Description": ["HEART", "LANTERN", "HAND WARMER", "BIRD", "JAM", "BATH"],
+        "Quantity": [6, 6, -2, 32, 6, 3],
+        "InvoiceDate": ["01-12-2010 08:26", "01-12-2010 08:26", "01-12-2010 08:28",
+                        "01-12-2010 08:34", "01-12-2010 08:35", "01-12-2010 08:45"],
+        "UnitPrice": [2.55, 3.39, 1.85, 1.69, 4.25, 5.95],
+        "CustomerID": ["17850", "17850", "17850", "13047", "", "13047"],
+        "Country": ["United Kingdom", "United Kingdom", "United Kingdom",
+                    "France", "France", "Unspecified"],
+    })
+    caminho = tmp_path / "OnlineRetail.csv"
+    df.to_csv(caminho, index=False, encoding="ISO-8859-1")
+    return caminho
+
+def test_carregar_dados_em_blocos_respeita_tamanho_e_tipos(csv_bruto):
+    blocos = list(carregar_dados_em_blocos(csv_bruto, tamanho_bloco=4))
+    assert [len(b) for b in blocos] == [4, 2]
+    assert blocos[0]["Quantity"].dtype == np.int64
+    assert blocos[0]["UnitPrice"].dtype == np.float64
+    assert isinstance(blocos[0]["Country"].dtype, pd.CategoricalDtype)
+
+def test_limpar_em_blocos_filtra_e_mantem_categorias(csv_bruto):
+    df = concatenar_blocos(limpar_em_blocos(csv_bruto, tamanho_bloco=2))
+    # Restam as linhas com cliente, país conhecido e quantidade positiva
+    assert df["InvoiceNo"].tolist() == ["536365", "536365", "536367"]
+    assert isinstance(df["Country"].dtype, pd.CategoricalDtype)
+    assert df["InvoiceDate"].iloc[0] == pd.Timestamp("2010-12-01 08:26")
+
+def test_corrigir_tipos_e_datas_compacto(csv_bruto):
+    bruto = carregar_dados(csv_bruto)
+    padrao = corrigir_tipos_e_datas(bruto)
+    compacto = corrigir_tipos_e_datas(bruto, compacto=True)
+
+    assert "InvoiceTime" not in compacto.columns
+    assert compacto["InvoiceSeconds"].iloc[0] == 8 * 3600 + 26 * 60
+    for coluna in ["StockCode", "Description", "Country"]:
+        assert isinstance(compacto[coluna].dtype, pd.CategoricalDtype)
+        assert compacto[coluna].astype(str).tolist() == padrao[coluna].tolist()
+    assert compacto["InvoiceDate"].equals(padrao["InvoiceDate"])
+
+    relatorio = relatorio_memoria(padrao, compacto)
+    assert relatorio.loc["Total", "BytesPorLinhaDepois"] < relatorio.loc["Total", "BytesPorLinhaAntes"]
+
+def test_limites_iqr_em_blocos_igual_ao_calculo_exato():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "Quantity": rng.integers(1, 50, 1_000),
+        "UnitPrice": rng.gamma(2, 1.5, 1_000).round(2),
+    })
+    blocos = (df.iloc[i:i + 137] for i in range(0, len(df), 137))
+
+    em_blocos = limites_iqr_em_blocos(blocos, ["Quantity", "UnitPrice"])
+    exato = limites_iqr(df, ["Quantity", "UnitPrice"])
+    for coluna in exato:
+        assert em_blocos[coluna] == pytest.approx(exato[coluna])
+
+def test_limpar_em_blocos_igual_a_limpeza_em_memoria(tmp_path, monkeypatch):
+    # Outliers nas duas colunas: a ordem Quantity → UnitPrice muda os quartis de UnitPrice
+    rng = np.random.default_rng(3)
+    n = 3_000
+    quantidade = rng.integers(1, 13, n)
+    quantidade[rng.choice(n, 150, replace=False)] = rng.integers(200, 5_000, 150)
+    preco = rng.gamma(2, 1.5, n).round(2) + 0.01
+    preco[quantidade > 100] *= 40
+    df = pd.DataFrame({
+        "InvoiceNo": (536000 + rng.integers(0, 400, n)).astype(str),
+        "StockCode": rng.choice(["85123A", "71053", "22633"], n),
+        "Description": rng.choice(["HEART", "LANTERN", "BIRD"], n),
+        "Quantity": quantidade,
+        "InvoiceDate": "01-12-2010 08:26",
+        "UnitPrice": preco,
+        "CustomerID": (12000 + rng.integers(0, 80, n)).astype(str),
+        "Country": rng.choice(["France", "United Kingdom"], n),
+    })
+    caminho = tmp_path / "OnlineRetail.csv"
+    df.to_csv(caminho, index=False, encoding="ISO-8859-1")
+
+    em_memoria = carregar_e_limpar(caminho, k=1.5)
+    em_blocos = concatenar_blocos(limpar_em_blocos(caminho, tamanho_bloco=700, k=1.5))
+    assert len(em_blocos) < n
+    pd.testing.assert_frame_equal(
+        em_blocos.astype({c: object for c in ["StockCode", "Country"]}),
+        em_memoria.astype({c: object for c in ["StockCode", "Country"]}),
+        check_dtype=False,
+    )
+
+    # Uma leitura para os limites e outra para os blocos
+    leituras = []
+    original = preprocessamento.carregar_dados_em_blocos
+    monkeypatch.setattr(preprocessamento, "carregar_dados_em_blocos", lambda *a, **kw: leituras.append(1) or original(*a, **kw))
+    concatenar_blocos(limpar_em_blocos(caminho, tamanho_bloco=700, k=1.5))
+    assert len(leituras) == 2
+
+    # Sem k, nenhum outlier é removido
+    assert len(concatenar_blocos(limpar_em_blocos(caminho, tamanho_bloco=700))) == n